@@ -1,94 +1,400 @@
-import dns.resolver
-import time
-from collections import defaultdict
-from ping3 import ping, verbose_ping
-import os
-
-def limpar_tela():
-    """Limpa a tela no terminal."""
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-# Use a função para limpar a tela
-limpar_tela()
-
-# Lista dos servidores DNS a serem testados
-dns_servers = ["8.8.8.8", "8.8.4.4", "1.1.1.1", "1.0.0.1", "208.67.222.222", "208.67.220.220", 
-               "216.146.35.35", "216.146.36.36", "8.26.56.26", "8.20.247.20", "156.154.70.22", 
-               "156.154.71.22", "9.9.9.9", "9.9.9.10"]
-
-# Domínios a serem consultados
-domains = ["www.google.com", "www.amazon.com", "www.facebook.com", "www.instagram.com", 
-           "www.linkedin.com", "www.microsoft.com", "www.reddit.com", "www.twitter.com", 
-           "www.netflix.com", "www.apple.com"]
-
-# Dicionários para armazenar os tempos de resposta e contagens para cada servidor
-dns_times = defaultdict(float)
-ping_times = defaultdict(float)
-counts = defaultdict(int)
-
-# Valor alto para o tempo de ping quando o servidor não responde
-unreachable_ping_time = 10.0 * 1000
-unresolvable_dns_time = 10.0 * 1000
-
-for server in dns_servers:
-    resolver = dns.resolver.Resolver()
-    resolver.nameservers = [server]
-    
-    for domain in domains:
-        try:
-            # Calcula o tempo de resolução de DNS
-            start_time = time.time()
-            resolver.resolve(domain)
-            end_time = time.time()
-            dns_time = (end_time - start_time) * 1000  # converte para milissegundos
-            dns_times[server] += dns_time
-        except Exception as e:
-            print(f"O servidor DNS {server} falhou ao consultar {domain}. Erro: {e}")
-            dns_times[server] += unresolvable_dns_time
-            
-        # Calcula o tempo de ping
-        try:
-            ping_time = ping(server)
-            if ping_time is not None:
-                ping_times[server] += ping_time * 1000  # converte para milissegundos
-            else:
-                print(f"Não foi possível pingar o servidor DNS {server}")
-                ping_times[server] += unreachable_ping_time  # adiciona o tempo de "punição"
-        except Exception as e:
-            print(f"O servidor DNS {server} falhou ao fazer ping. Erro: {e}")
-            
-        counts[server] += 1
-
-# Calcula e imprime as médias
-averages = [(server, dns_times[server] / counts[server], ping_times[server] / counts[server]) 
-            for server in dns_servers]
-averages.sort(key=lambda x: (x[1] + x[2]) / 2)  # Ordena pela média dos tempos de DNS e ping
-
-averages_dns = [(server, dns_times[server] / counts[server]) for server in dns_servers]
-averages_dns.sort(key=lambda x: x[1])  # Ordena pela média dos tempos de DNS
-
-averages_ping = [(server, ping_times[server] / counts[server]) for server in dns_servers]
-averages_ping.sort(key=lambda x: x[1])  # Ordena pela média dos tempos de ping
-
-limpar_tela()
-print("\nTempo médio de resolução de nomes (ms):")
-for server, avg_dns_time in averages_dns:
-    print(f"{server} - {avg_dns_time:.4f} ms")
-
-print("\n")
-print(",".join(server for server, _ in averages_dns))
-
-print("\nTempo médio de ping (ms):")
-for server, avg_ping_time in averages_ping:
-    print(f"{server} - {avg_ping_time:.4f} ms")
-    
-print("\n")
-print(",".join(server for server, _ in averages_ping))
-
-print("\nMédia geral (resolução de nomes + ping) (ms):")
-for server, avg_dns_time, avg_ping_time in averages:
-    print(f"{server} - {(avg_dns_time + avg_ping_time) / 2:.4f} ms")
-
-# Imprime a lista de DNS ordenada por melhor tempo
-print("\nLista de servidores DNS ordenada por melhor tempo:")
-print(",".join(server for server, _, _ in averages))
+import dns.resolver
+import time
+import random
+import string
+import argparse
+import statistics
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from ping3 import ping, verbose_ping
+import os
+
+import historico_dns
+from dns_comum import DOMINIOS_PADRAO, parse_servidor
+
+def limpar_tela():
+    """Limpa a tela no terminal."""
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+# Lista dos servidores DNS a serem testados
+dns_servers = ["8.8.8.8", "8.8.4.4", "1.1.1.1", "1.0.0.1", "208.67.222.222", "208.67.220.220",
+               "216.146.35.35", "216.146.36.36", "8.26.56.26", "8.20.247.20", "156.154.70.22",
+               "156.154.71.22", "9.9.9.9", "9.9.9.10"]
+
+# Domínios a serem consultados
+domains = DOMINIOS_PADRAO
+
+# Valor alto para o tempo de ping quando o servidor não responde
+unreachable_ping_time = 10.0 * 1000
+unresolvable_dns_time = 10.0 * 1000
+
+# Fase de ping: todos os servidores são pingados em paralelo, ao lado da fase de
+# DNS, em vez de um ping por domínio intercalado com as consultas.
+PINGS_PADRAO = 10
+INTERVALO_PING_PADRAO = 0.5  # Segundos entre pings do mesmo servidor
+TIMEOUT_PING_PADRAO = 2.0
+MAX_THREADS_PING = 32
+
+# Modo frio: cada consulta usa um rótulo aleatório sob esta zona, então nenhum
+# resolvedor tem a resposta em cache e precisa recursar até o autoritativo.
+# Zonas com curinga (*.zona) respondem NOERROR; as demais respondem NXDOMAIN.
+# Em zonas assinadas com DNSSEC o resolvedor pode sintetizar o NXDOMAIN a partir
+# do cache de NSEC (RFC 8198), por isso prefira zonas sem DNSSEC ou com curinga.
+ZONA_FRIA_PADRAO = "example.com"
+CONSULTAS_FRIAS_PADRAO = 10
+TAMANHO_ROTULO_FRIO = 16
+
+# Modo adaptativo: cada resolvedor começa com poucas consultas e só continua
+# sendo amostrado enquanto seu intervalo de confiança ainda se sobrepõe ao do
+# líder. O orçamento que sobra vai para separar os concorrentes próximos.
+AMOSTRAS_MINIMAS_ADAPTATIVO = 2
+
+# Quantil 97,5% da t de Student por graus de liberdade (IC de 95%)
+T_STUDENT_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+                8: 2.306, 9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 30: 2.042}
+
+def criar_resolver(servidor):
+    """Cria um resolvedor que consulta apenas o servidor informado."""
+    host, porta = parse_servidor(servidor)
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = [host]
+    resolver.port = porta
+    return resolver
+
+def medir_resolucao(resolver, nome, aceitar_nxdomain=False):
+    """Resolve o nome e devolve o tempo gasto em milissegundos.
+
+    Com aceitar_nxdomain=True, NXDOMAIN/NoAnswer contam como resposta válida
+    (é o resultado esperado para rótulos aleatórios no modo frio).
+    """
+    inicio = time.perf_counter()
+    try:
+        resolver.resolve(nome)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        if not aceitar_nxdomain:
+            raise
+    return (time.perf_counter() - inicio) * 1000
+
+def rotulo_aleatorio(zona):
+    """Gera um nome único sob a zona, que não pode estar em cache."""
+    rotulo = ''.join(random.choices(string.ascii_lowercase + string.digits, k=TAMANHO_ROTULO_FRIO))
+    return f"{rotulo}.{zona}"
+
+def registrar_dns(historico, servidor, metrica, valor=None):
+    """Guarda uma consulta no histórico; metrica None registra uma falha."""
+    if historico is None:
+        return
+    historico.registrar(servidor, 'dns_falha', 0 if metrica else 1)
+    if metrica:
+        historico.registrar(servidor, metrica, valor)
+
+def media_com_punicao(amostras, falhas, punicao):
+    """Média das amostras contando cada falha com o tempo de punição."""
+    total = len(amostras) + falhas
+    if total == 0:
+        return punicao
+    return (sum(amostras) + falhas * punicao) / total
+
+def intervalo_confianca(amostras):
+    """Devolve (média, meia-largura do IC de 95%) das amostras."""
+    media = statistics.fmean(amostras)
+    if len(amostras) < 2:
+        return media, float('inf')
+    graus = len(amostras) - 1
+    t = next((T_STUDENT_95[g] for g in sorted(T_STUDENT_95, reverse=True) if g <= graus), 1.96)
+    if graus > 30:
+        t = 1.96
+    return media, t * statistics.stdev(amostras) / len(amostras) ** 0.5
+
+def executar_modo_adaptativo(servidores, dominios, orcamento, historico=None):
+    """Ranking por DNS com parada antecipada dos resolvedores fora de disputa.
+
+    A cada rodada todos os resolvedores ainda ativos recebem uma consulta.
+    Um resolvedor é eliminado quando o limite inferior do seu IC passa do
+    limite superior do líder. Para quando o orçamento acaba, quando sobra um
+    único ativo ou quando os ICs dos ativos já não se sobrepõem.
+    Devolve [(servidor, média, meia_largura, consultas, eliminado)].
+    """
+    resolvers = {server: criar_resolver(server) for server in servidores}
+    amostras = {server: [] for server in servidores}
+    ativos = list(servidores)
+    usadas = 0
+
+    while ativos and usadas < orcamento:
+        for server in list(ativos):
+            if usadas >= orcamento:
+                break
+            domain = dominios[len(amostras[server]) % len(dominios)]
+            try:
+                amostras[server].append(medir_resolucao(resolvers[server], domain))
+                registrar_dns(historico, server, 'dns_ms', amostras[server][-1])
+            except Exception as e:
+                print(f"O servidor DNS {server} falhou ao consultar {domain}. Erro: {e}")
+                amostras[server].append(unresolvable_dns_time)
+                registrar_dns(historico, server, None)
+            usadas += 1
+
+        if min(len(amostras[server]) for server in ativos) < AMOSTRAS_MINIMAS_ADAPTATIVO:
+            continue
+        intervalos = {server: intervalo_confianca(amostras[server]) for server in ativos}
+        melhor_superior = min(media + meia for media, meia in intervalos.values())
+        eliminados = [server for server in ativos
+                      if intervalos[server][0] - intervalos[server][1] > melhor_superior]
+        for server in eliminados:
+            ativos.remove(server)
+            print(f"{server} fora de disputa após {len(amostras[server])} consultas "
+                  f"({intervalos[server][0]:.1f} ms)")
+
+        faixas = sorted((intervalos[s][0] - intervalos[s][1], intervalos[s][0] + intervalos[s][1])
+                        for s in ativos)
+        if len(ativos) <= 1 or all(a[1] < b[0] for a, b in zip(faixas, faixas[1:])):
+            break
+
+    resultados = []
+    for server in servidores:
+        if not amostras[server]:
+            continue
+        media, meia = intervalo_confianca(amostras[server])
+        resultados.append((server, media, meia, len(amostras[server]), server not in ativos))
+    return resultados, usadas
+
+def pingar_servidor(host, contagem, intervalo, timeout):
+    """Pinga o host `contagem` vezes e devolve (média em ms, pings perdidos).
+
+    Cada ping sem resposta entra na média com o tempo de punição.
+    """
+    total = 0.0
+    perdidos = 0
+    for i in range(contagem):
+        if i:
+            time.sleep(intervalo)
+        try:
+            ping_time = ping(host, timeout=timeout)
+        except Exception as e:
+            print(f"O servidor DNS {host} falhou ao fazer ping. Erro: {e}")
+            ping_time = None
+        if ping_time is None or ping_time is False:
+            perdidos += 1
+            total += unreachable_ping_time  # adiciona o tempo de "punição"
+        else:
+            total += ping_time * 1000  # converte para milissegundos
+    return total / contagem, perdidos
+
+def iniciar_fase_ping(servidores, contagem, intervalo, timeout):
+    """Dispara a fase de ping de todos os servidores em paralelo, sem bloquear.
+
+    Devolve {host: Future}; a fase roda ao lado da fase de DNS, e como cada
+    thread passa quase todo o tempo esperando resposta ou dormindo no
+    intervalo, ela não disputa CPU com as medições de resolução.
+    """
+    hosts = list(dict.fromkeys(parse_servidor(server)[0] for server in servidores))
+    if not hosts:
+        return {}
+    executor = ThreadPoolExecutor(max_workers=min(MAX_THREADS_PING, len(hosts)))
+    futuros = {host: executor.submit(pingar_servidor, host, contagem, intervalo, timeout) for host in hosts}
+    executor.shutdown(wait=False)
+    return futuros
+
+def executar_benchmark(servidores, dominios, contagem_ping=PINGS_PADRAO,
+                       intervalo_ping=INTERVALO_PING_PADRAO, timeout_ping=TIMEOUT_PING_PADRAO, historico=None):
+    """Mede resolução de nomes de cada servidor enquanto a fase de ping roda em paralelo."""
+    dns_amostras = defaultdict(list)
+    dns_falhas = defaultdict(int)
+
+    futuros_ping = iniciar_fase_ping(servidores, contagem_ping, intervalo_ping, timeout_ping)
+
+    for server in servidores:
+        resolver = criar_resolver(server)
+
+        for domain in dominios:
+            try:
+                # Calcula o tempo de resolução de DNS
+                dns_amostras[server].append(medir_resolucao(resolver, domain))
+                registrar_dns(historico, server, 'dns_ms', dns_amostras[server][-1])
+            except Exception as e:
+                print(f"O servidor DNS {server} falhou ao consultar {domain}. Erro: {e}")
+                dns_falhas[server] += 1
+                registrar_dns(historico, server, None)
+
+    ping_medias = {}
+    for host, futuro in futuros_ping.items():
+        ping_medias[host], perdidos = futuro.result()
+        if historico:
+            if perdidos < contagem_ping:
+                # Média só dos pings respondidos; as perdas vão em métrica própria
+                respondidos = contagem_ping - perdidos
+                historico.registrar(host, 'rtt_ms',
+                                    (ping_medias[host] * contagem_ping - perdidos * unreachable_ping_time) / respondidos)
+            historico.registrar(host, 'ping_perda', perdidos / contagem_ping)
+        if perdidos:
+            print(f"Não foi possível pingar o servidor DNS {host} ({perdidos}/{contagem_ping} sem resposta)")
+
+    return [(server,
+             media_com_punicao(dns_amostras[server], dns_falhas[server], unresolvable_dns_time),
+             ping_medias[parse_servidor(server)[0]])
+            for server in servidores]
+
+def executar_modo_frio(servidores, dominios, zona, consultas, historico=None):
+    """Mede separadamente a latência com cache e a latência de recursão completa.
+
+    Os domínios populares são consultados uma vez para aquecer o cache e depois
+    medidos (latência com cache). Em seguida cada servidor recebe `consultas`
+    nomes únicos sob a zona, o que obriga a recursão até o autoritativo.
+    """
+    resultados = []
+    for server in servidores:
+        resolver = criar_resolver(server)
+        cache, cache_falhas = [], 0
+        frio, frio_falhas = [], 0
+
+        for domain in dominios:
+            try:
+                medir_resolucao(resolver, domain)
+            except Exception:
+                pass  # O aquecimento só serve para popular o cache
+        for domain in dominios:
+            try:
+                cache.append(medir_resolucao(resolver, domain))
+                registrar_dns(historico, server, 'dns_ms', cache[-1])
+            except Exception as e:
+                print(f"O servidor DNS {server} falhou ao consultar {domain}. Erro: {e}")
+                cache_falhas += 1
+                registrar_dns(historico, server, None)
+
+        for _ in range(consultas):
+            nome = rotulo_aleatorio(zona)
+            try:
+                frio.append(medir_resolucao(resolver, nome, aceitar_nxdomain=True))
+                registrar_dns(historico, server, 'dns_frio_ms', frio[-1])
+            except Exception as e:
+                print(f"O servidor DNS {server} falhou ao consultar {nome}. Erro: {e}")
+                frio_falhas += 1
+                registrar_dns(historico, server, None)
+
+        resultados.append((server,
+                           media_com_punicao(cache, cache_falhas, unresolvable_dns_time),
+                           media_com_punicao(frio, frio_falhas, unresolvable_dns_time)))
+    return resultados
+
+def imprimir_resultados(resultados):
+    averages_dns = sorted(((server, avg_dns) for server, avg_dns, _ in resultados), key=lambda x: x[1])  # Ordena pela média dos tempos de DNS
+    averages_ping = sorted(((server, avg_ping) for server, _, avg_ping in resultados), key=lambda x: x[1])  # Ordena pela média dos tempos de ping
+    averages = sorted(resultados, key=lambda x: (x[1] + x[2]) / 2)  # Ordena pela média dos tempos de DNS e ping
+
+    print("\nTempo médio de resolução de nomes (ms):")
+    for server, avg_dns_time in averages_dns:
+        print(f"{server} - {avg_dns_time:.4f} ms")
+
+    print("\n")
+    print(",".join(server for server, _ in averages_dns))
+
+    print("\nTempo médio de ping (ms):")
+    for server, avg_ping_time in averages_ping:
+        print(f"{server} - {avg_ping_time:.4f} ms")
+
+    print("\n")
+    print(",".join(server for server, _ in averages_ping))
+
+    print("\nMédia geral (resolução de nomes + ping) (ms):")
+    for server, avg_dns_time, avg_ping_time in averages:
+        print(f"{server} - {(avg_dns_time + avg_ping_time) / 2:.4f} ms")
+
+    # Imprime a lista de DNS ordenada por melhor tempo
+    print("\nLista de servidores DNS ordenada por melhor tempo:")
+    print(",".join(server for server, _, _ in averages))
+
+def imprimir_resultados_frio(resultados, zona):
+    por_recursao = sorted(resultados, key=lambda x: x[2])
+
+    print(f"\nLatência de recursão completa - nomes únicos sob {zona} (ms):")
+    for server, _, avg_frio in por_recursao:
+        print(f"{server} - {avg_frio:.4f} ms")
+
+    print("\nLatência de resposta em cache (ms):")
+    for server, avg_cache, _ in sorted(resultados, key=lambda x: x[1]):
+        print(f"{server} - {avg_cache:.4f} ms")
+
+    print("\nLista de servidores DNS ordenada por latência de recursão:")
+    print(",".join(server for server, _, _ in por_recursao))
+
+def imprimir_resultados_adaptativo(resultados, usadas, consultas_fixas):
+    ordenados = sorted(resultados, key=lambda x: x[1])
+
+    print("\nRanking adaptativo de resolução de nomes (média ± IC 95%):")
+    for server, media, meia, consultas, eliminado in ordenados:
+        marca = " [eliminado]" if eliminado else ""
+        print(f"{server} - {media:.4f} ± {meia:.4f} ms ({consultas} consultas){marca}")
+
+    print("\nLista de servidores DNS ordenada por melhor tempo:")
+    print(",".join(server for server, *_ in ordenados))
+    print(f"\nConsultas usadas: {usadas} (o modo fixo usaria {consultas_fixas})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de servidores DNS.")
+    parser.add_argument('--servidores', help="Servidores separados por vírgula (aceita host:porta).")
+    parser.add_argument('--frio', action='store_true',
+                        help="Consulta rótulos aleatórios para medir a recursão completa, sem cache.")
+    parser.add_argument('--zona', default=ZONA_FRIA_PADRAO,
+                        help=f"Zona usada no modo frio (padrão: {ZONA_FRIA_PADRAO}).")
+    parser.add_argument('--consultas-frias', type=int, default=CONSULTAS_FRIAS_PADRAO,
+                        help="Quantidade de nomes únicos por servidor no modo frio.")
+    parser.add_argument('--adaptativo', action='store_true',
+                        help="Para de amostrar resolvedores que já estão fora de disputa.")
+    parser.add_argument('--orcamento', type=int,
+                        help="Total de consultas do modo adaptativo (padrão: o mesmo do modo fixo).")
+    parser.add_argument('--lista-completa', action='store_true',
+                        help="Usa a lista ampliada de servidores do dns_rout2.py.")
+    parser.add_argument('--pings', type=int, default=PINGS_PADRAO, help="Pings por servidor.")
+    parser.add_argument('--intervalo-ping', type=float, default=INTERVALO_PING_PADRAO,
+                        help="Segundos entre pings do mesmo servidor.")
+    parser.add_argument('--timeout-ping', type=float, default=TIMEOUT_PING_PADRAO,
+                        help="Segundos de espera por cada resposta de ping.")
+    historico_dns.adicionar_argumentos(parser)
+    parser.add_argument('--carga', metavar='QPS',
+                        help="Teste de carga na taxa alvo ou rampa inicio:fim:passo (veja dns_carga.py).")
+    parser.add_argument('--duracao', type=float, default=5.0, help="Segundos por degrau no teste de carga.")
+    parser.add_argument('--protocolo', choices=['udp', 'tcp'], default='udp',
+                        help="Transporte do teste de carga (TCP usa pipeline).")
+    parser.add_argument('--sockets', type=int, default=1, help="Sockets em paralelo no teste de carga.")
+    args = parser.parse_args()
+
+    if args.servidores:
+        servidores = args.servidores.split(',')
+    elif args.lista_completa:
+        import dns_rout2
+        servidores = list(dict.fromkeys(dns_rout2.dns_servers))  # a lista tem repetidos
+    else:
+        servidores = dns_servers
+
+    limpar_tela()
+    if args.carga:
+        import dns_carga
+        taxas = dns_carga.parse_qps(args.carga)
+        for server in servidores:
+            dns_carga.imprimir_curva(server, dns_carga.executar_carga(
+                server, taxas, args.duracao, args.protocolo, args.sockets, dominios=domains))
+        return
+
+    historico = historico_dns.abrir('benchmark_dns', args)
+    try:
+        if args.adaptativo:
+            consultas_fixas = len(servidores) * len(domains)
+            resultados, usadas = executar_modo_adaptativo(servidores, domains, args.orcamento or consultas_fixas,
+                                                          historico)
+            limpar_tela()
+            imprimir_resultados_adaptativo(resultados, usadas, consultas_fixas)
+        elif args.frio:
+            resultados = executar_modo_frio(servidores, domains, args.zona, args.consultas_frias, historico)
+            limpar_tela()
+            imprimir_resultados_frio(resultados, args.zona)
+        else:
+            resultados = executar_benchmark(servidores, domains, args.pings, args.intervalo_ping,
+                                            args.timeout_ping, historico)
+            limpar_tela()
+            imprimir_resultados(resultados)
+    finally:
+        if historico:
+            historico.fechar()
+
+if __name__ == "__main__":
+    main()
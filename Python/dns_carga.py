@@ -0,0 +1,194 @@
+"""Teste de carga de resolvedores DNS, no estilo do dnsperf.
+
+Envia consultas em malha aberta numa taxa alvo (ou numa rampa de taxas) por um
+ou vários sockets, em UDP ou TCP com pipeline, e mede a vazão respondida, a
+perda e a curva de latência por carga de cada resolvedor.
+
+Exemplos:
+    python dns_carga.py --servidores 127.0.0.1:5301 --qps 100:2000:100
+    python dns_carga.py --servidores 10.0.0.53 --qps 500 --protocolo tcp --sockets 4
+"""
+import argparse
+import asyncio
+import itertools
+import struct
+import time
+
+import dns.message
+
+from dns_comum import DOMINIOS_PADRAO, parse_servidor, percentil
+
+DURACAO_PADRAO = 5.0     # Segundos em cada degrau de carga
+TIMEOUT_PADRAO = 2.0     # Respostas que chegam depois disso contam como perdidas
+
+def parse_qps(texto):
+    """Converte 'qps' ou 'inicio:fim:passo' na lista de taxas da rampa."""
+    partes = [float(p) for p in texto.split(':')]
+    if len(partes) == 1:
+        return partes
+    if len(partes) != 3 or partes[2] <= 0:
+        raise ValueError(f"Rampa de QPS inválida: {texto}")
+    inicio, fim, passo = partes
+    passos = int(round((fim - inicio) / passo))
+    return [inicio + i * passo for i in range(passos + 1)]
+
+class _Canal:
+    """Um socket de envio com sua própria tabela de consultas pendentes por ID."""
+    def __init__(self):
+        self.pendentes = {}  # id -> instante de envio
+        self.latencias = []
+        self.ids = itertools.cycle(range(65536))
+
+    def registrar_resposta(self, wire):
+        if len(wire) < 2:
+            return
+        enviado = self.pendentes.pop(struct.unpack('!H', wire[:2])[0], None)
+        if enviado is not None:
+            self.latencias.append((time.perf_counter() - enviado) * 1000)
+
+    def proximo_id(self):
+        # Pula IDs ainda pendentes para não confundir respostas atrasadas
+        for _ in range(65536):
+            qid = next(self.ids)
+            if qid not in self.pendentes:
+                return qid
+        return None
+
+class _CanalUDP(_Canal, asyncio.DatagramProtocol):
+    def __init__(self):
+        _Canal.__init__(self)
+        self.transporte = None
+
+    def connection_made(self, transport):
+        self.transporte = transport
+
+    def datagram_received(self, data, addr):
+        self.registrar_resposta(data)
+
+    def enviar(self, wire):
+        self.transporte.sendto(wire)
+
+    def fechar(self):
+        self.transporte.close()
+
+class _CanalTCP(_Canal):
+    def __init__(self, leitor, escritor):
+        super().__init__()
+        self.leitor = leitor
+        self.escritor = escritor
+        self.tarefa_leitura = asyncio.get_running_loop().create_task(self._ler())
+
+    async def _ler(self):
+        try:
+            while True:
+                tamanho = struct.unpack('!H', await self.leitor.readexactly(2))[0]
+                self.registrar_resposta(await self.leitor.readexactly(tamanho))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def enviar(self, wire):
+        self.escritor.write(struct.pack('!H', len(wire)) + wire)
+
+    def fechar(self):
+        self.tarefa_leitura.cancel()
+        self.escritor.close()
+
+async def _abrir_canais(host, porta, protocolo, sockets):
+    loop = asyncio.get_running_loop()
+    canais = []
+    for _ in range(sockets):
+        if protocolo == 'tcp':
+            leitor, escritor = await asyncio.open_connection(host, porta)
+            canais.append(_CanalTCP(leitor, escritor))
+        else:
+            _, canal = await loop.create_datagram_endpoint(_CanalUDP, remote_addr=(host, porta))
+            canais.append(canal)
+    return canais
+
+async def _degrau(host, porta, qps, duracao, protocolo, sockets, timeout, consultas):
+    """Mantém a taxa alvo por `duracao` segundos e devolve as métricas do degrau."""
+    canais = await _abrir_canais(host, porta, protocolo, sockets)
+    total = int(qps * duracao)
+    agendadas = enviadas = descartadas = 0
+    inicio = time.perf_counter()
+    try:
+        while agendadas < total:
+            # Malha aberta: envia tudo o que já venceu, mesmo sem resposta das anteriores
+            devidas = min(total, int((time.perf_counter() - inicio) * qps) + 1)
+            while agendadas < devidas:
+                canal = canais[agendadas % len(canais)]
+                qid = canal.proximo_id()
+                if qid is None:
+                    # Todos os IDs do canal estão pendentes: a consulta nem sai, não é perda do servidor
+                    descartadas += 1
+                else:
+                    wire = consultas[agendadas % len(consultas)]
+                    canal.pendentes[qid] = time.perf_counter()
+                    canal.enviar(struct.pack('!H', qid) + wire[2:])
+                    enviadas += 1
+                agendadas += 1
+            await asyncio.sleep(max(0.0, inicio + agendadas / qps - time.perf_counter()))
+        tempo_envio = time.perf_counter() - inicio
+
+        limite = time.perf_counter() + timeout
+        while any(c.pendentes for c in canais) and time.perf_counter() < limite:
+            await asyncio.sleep(0.01)
+    finally:
+        for canal in canais:
+            canal.fechar()
+
+    latencias = [lat for c in canais for lat in c.latencias if lat <= timeout * 1000]
+    respondidas = len(latencias)
+    return {
+        'qps_alvo': qps,
+        'enviadas': enviadas,
+        'descartadas_cliente': descartadas,
+        'respondidas': respondidas,
+        'qps_respondido': respondidas / tempo_envio if tempo_envio > 0 else 0.0,
+        'perda': 100.0 * (enviadas - respondidas) / enviadas if enviadas else 0.0,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'p99': percentil(latencias, 99),
+    }
+
+def executar_carga(servidor, taxas, duracao=DURACAO_PADRAO, protocolo='udp', sockets=1,
+                   timeout=TIMEOUT_PADRAO, dominios=DOMINIOS_PADRAO):
+    """Roda a rampa de taxas contra um servidor 'host' ou 'host:porta'.
+
+    Devolve uma lista de dicionários, um por degrau, com QPS alvo, enviadas,
+    descartadas no cliente (sem ID livre), respondidas, QPS respondido, perda
+    (%) das enviadas e p50/p95/p99 da latência (ms).
+    """
+    host, porta = parse_servidor(servidor)
+    consultas = [dns.message.make_query(d, 'A').to_wire() for d in dominios]
+    return [asyncio.run(_degrau(host, porta, qps, duracao, protocolo, sockets, timeout, consultas))
+            for qps in taxas]
+
+def imprimir_curva(servidor, degraus):
+    print(f"\nCurva de latência por carga - {servidor}:")
+    print(f"{'QPS alvo':>9} {'enviadas':>9} {'descart.':>9} {'respond.':>9} {'QPS resp.':>10} {'perda %':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for d in degraus:
+        print(f"{d['qps_alvo']:>9.0f} {d['enviadas']:>9} {d['descartadas_cliente']:>9} {d['respondidas']:>9} "
+              f"{d['qps_respondido']:>10.1f} {d['perda']:>8.2f} {d['p50']:>8.2f} {d['p95']:>8.2f} {d['p99']:>8.2f}")
+    if any(d['descartadas_cliente'] for d in degraus):
+        print("(descart.: consultas não enviadas por falta de ID livre; use mais --sockets)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga de resolvedores DNS.")
+    parser.add_argument('--servidores', required=True, help="Servidores separados por vírgula (aceita host:porta).")
+    parser.add_argument('--qps', default="100", help="Taxa alvo ou rampa inicio:fim:passo (padrão: 100).")
+    parser.add_argument('--duracao', type=float, default=DURACAO_PADRAO, help="Segundos por degrau.")
+    parser.add_argument('--protocolo', choices=['udp', 'tcp'], default='udp')
+    parser.add_argument('--sockets', type=int, default=1, help="Sockets/conexões usados em paralelo.")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_PADRAO,
+                        help="Tempo máximo de resposta antes de contar como perda.")
+    args = parser.parse_args()
+
+    taxas = parse_qps(args.qps)
+    for servidor in args.servidores.split(','):
+        imprimir_curva(servidor, executar_carga(servidor, taxas, args.duracao, args.protocolo,
+                                                args.sockets, args.timeout))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Pedaços comuns às ferramentas de DNS desta pasta.
+
+Lista padrão de domínios consultados, leitura de 'host:porta' e percentil,
+usados pelo 'Benchmark DNS.py', dns_carga.py, dns_servidor_local.py e
+dns_forwarder.py.
+"""
+
+# Domínios consultados quando nenhum outro é informado
+DOMINIOS_PADRAO = ["www.google.com", "www.amazon.com", "www.facebook.com", "www.instagram.com",
+                   "www.linkedin.com", "www.microsoft.com", "www.reddit.com", "www.twitter.com",
+                   "www.netflix.com", "www.apple.com"]
+
+def parse_servidor(servidor):
+    """Separa 'host' ou 'host:porta' em (host, porta)."""
+    if servidor.count(':') == 1:
+        host, porta = servidor.split(':')
+        return host, int(porta)
+    return servidor, 53
+
+def percentil(amostras, p):
+    """Percentil p (0-100) por interpolação linear."""
+    ordenadas = sorted(amostras)
+    if not ordenadas:
+        return float('nan')
+    pos = (len(ordenadas) - 1) * p / 100.0
+    baixo = int(pos)
+    alto = min(baixo + 1, len(ordenadas) - 1)
+    return ordenadas[baixo] + (ordenadas[alto] - ordenadas[baixo]) * (pos - baixo)
@@ -0,0 +1,275 @@
+"""Encaminhador DNS local que corre as consultas entre os melhores resolvedores.
+
+Carrega o ranking gerado pelo 'Benchmark DNS.py' ou pelo dns_rout2.py (a linha
+de servidores separados por vírgula, salva num arquivo ou passada direto),
+envia cada consulta ao mesmo tempo para os K primeiros e devolve a primeira
+resposta válida. A latência de cada resolvedor é acompanhada ao vivo: quem
+degrada é rebaixado e o ranking é refeito em segundo plano.
+
+Exemplos:
+    python "Benchmark DNS.py" | tail -n 1 > ranking.txt
+    python dns_forwarder.py --arquivo ranking.txt --porta 53 --top 3
+    python dns_forwarder.py --ranking 1.1.1.1,9.9.9.9,8.8.8.8 --porta 5353
+"""
+import argparse
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+import struct
+import time
+
+import dns.asyncquery
+import dns.exception
+import dns.flags
+import dns.message
+import dns.rcode
+
+from dns_comum import parse_servidor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TOP_K_PADRAO = 3
+TIMEOUT_PADRAO = 2.0
+INTERVALO_REORDENAR = 10.0   # Segundos entre as reordenações em segundo plano
+ALFA_EWMA = 0.2              # Peso da amostra nova na latência móvel
+FALHAS_PARA_REBAIXAR = 3     # Falhas seguidas que mandam o resolvedor para o fim da fila
+LATENCIA_DESCONHECIDA = 1000.0  # ms por posição no ranking, até haver medição real
+NOME_SONDA = "www.google.com"   # Consulta usada para medir quem está fora do top K
+RCODES_VALIDOS = (dns.rcode.NOERROR, dns.rcode.NXDOMAIN)
+
+def ler_ranking(texto):
+    """Extrai a lista ordenada de servidores de um texto (vírgulas, espaços ou linhas)."""
+    servidores = []
+    for token in re.split(r'[,\s]+', texto):
+        try:
+            ipaddress.ip_address(parse_servidor(token)[0])
+        except ValueError:
+            continue
+        if token not in servidores:
+            servidores.append(token)
+    return servidores
+
+def carregar_ranking(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return ler_ranking(arquivo.read())
+
+class Upstream:
+    """Estado ao vivo de um resolvedor de destino."""
+    def __init__(self, endereco, posicao):
+        self.endereco = endereco
+        self.host, self.porta = parse_servidor(endereco)
+        self.posicao = posicao          # Posição no ranking carregado
+        self.latencia = None            # Média móvel exponencial em ms
+        self.falhas_seguidas = 0
+        self.consultas = 0
+        self.vitorias = 0
+
+    def registrar_sucesso(self, ms):
+        self.latencia = ms if self.latencia is None else ALFA_EWMA * ms + (1 - ALFA_EWMA) * self.latencia
+        self.falhas_seguidas = 0
+
+    def registrar_falha(self):
+        self.falhas_seguidas += 1
+
+    @property
+    def pontuacao(self):
+        """Menor é melhor: latência móvel penalizada pelas falhas seguidas."""
+        base = self.latencia if self.latencia is not None else LATENCIA_DESCONHECIDA * (self.posicao + 1)
+        return base * (1 + self.falhas_seguidas)
+
+class ForwarderDNS:
+    def __init__(self, servidores, top_k=TOP_K_PADRAO, timeout=TIMEOUT_PADRAO, arquivo_ranking=None):
+        self.top_k = top_k
+        self.timeout = timeout
+        self.arquivo_ranking = arquivo_ranking
+        self.mtime_ranking = os.path.getmtime(arquivo_ranking) if arquivo_ranking else None
+        self.upstreams = [Upstream(s, i) for i, s in enumerate(servidores)]
+        self.proxima_sonda = 0
+        self.tarefas = set()            # Tarefas em andamento, para não serem coletadas no meio
+
+    def acompanhar(self, tarefa):
+        """Guarda a referência da tarefa até ela terminar."""
+        self.tarefas.add(tarefa)
+        tarefa.add_done_callback(self.tarefas.discard)
+        return tarefa
+
+    async def _perguntar(self, upstream, consulta, tcp=False):
+        """Consulta um upstream e atualiza suas estatísticas; devolve a resposta ou None."""
+        upstream.consultas += 1
+        inicio = time.perf_counter()
+        try:
+            if tcp:
+                resposta = await dns.asyncquery.tcp(consulta, upstream.host, timeout=self.timeout,
+                                                    port=upstream.porta)
+            else:
+                resposta = await dns.asyncquery.udp(consulta, upstream.host, timeout=self.timeout,
+                                                    port=upstream.porta, ignore_unexpected=True)
+        except (dns.exception.DNSException, OSError):
+            self._falhou(upstream)
+            return None
+        if resposta.rcode() not in RCODES_VALIDOS:
+            self._falhou(upstream)
+            return resposta
+        upstream.registrar_sucesso((time.perf_counter() - inicio) * 1000)
+        return resposta
+
+    def _falhou(self, upstream):
+        upstream.registrar_falha()
+        if upstream.falhas_seguidas == FALHAS_PARA_REBAIXAR and upstream in self.upstreams:
+            # Rebaixa na hora; a reordenação periódica pode promovê-lo de volta
+            self.upstreams.remove(upstream)
+            self.upstreams.append(upstream)
+            logging.warning(f"{upstream.endereco} rebaixado após {FALHAS_PARA_REBAIXAR} falhas seguidas")
+
+    async def resolver(self, consulta, tcp=False):
+        """Corre a consulta entre os top K e devolve a primeira resposta válida."""
+        corrida = {asyncio.create_task(self._perguntar(u, consulta)): u for u in self.upstreams[:self.top_k]}
+        pendentes = set(corrida)
+        ultima_resposta = None
+        try:
+            while pendentes:
+                prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in prontas:
+                    resposta = tarefa.result()
+                    if resposta is None:
+                        continue
+                    ultima_resposta = resposta
+                    if resposta.rcode() in RCODES_VALIDOS:
+                        vencedor = corrida[tarefa]
+                        vencedor.vitorias += 1
+                        if tcp and resposta.flags & dns.flags.TC:
+                            resposta = await self._perguntar(vencedor, consulta, tcp=True) or resposta
+                        return resposta
+        finally:
+            # As perdedoras continuam até o fim para alimentar as estatísticas
+            for tarefa in pendentes:
+                self.acompanhar(tarefa)
+        if ultima_resposta is not None:
+            return ultima_resposta
+        falha = dns.message.make_response(consulta)
+        falha.set_rcode(dns.rcode.SERVFAIL)
+        return falha
+
+    async def responder(self, wire, tcp=False):
+        try:
+            consulta = dns.message.from_wire(wire)
+        except Exception:
+            return None
+        resposta = await self.resolver(consulta, tcp=tcp)
+        resposta.id = consulta.id
+        return resposta.to_wire()
+
+    def reordenar(self):
+        anteriores = [u.endereco for u in self.upstreams[:self.top_k]]
+        self.upstreams.sort(key=lambda u: u.pontuacao)
+        atuais = [u.endereco for u in self.upstreams[:self.top_k]]
+        if atuais != anteriores:
+            logging.info(f"Novo top {self.top_k}: {','.join(atuais)}")
+
+    def recarregar_ranking(self):
+        """Relê o arquivo de ranking se ele mudou, preservando as estatísticas já medidas."""
+        if not self.arquivo_ranking:
+            return
+        try:
+            mtime = os.path.getmtime(self.arquivo_ranking)
+            if mtime == self.mtime_ranking:
+                return
+            servidores = carregar_ranking(self.arquivo_ranking)
+        except OSError as e:
+            logging.error(f"Erro ao reler o ranking {self.arquivo_ranking}: {e}")
+            return
+        self.mtime_ranking = mtime
+        if not servidores:
+            return
+        conhecidos = {u.endereco: u for u in self.upstreams}
+        self.upstreams = []
+        for i, servidor in enumerate(servidores):
+            upstream = conhecidos.get(servidor) or Upstream(servidor, i)
+            upstream.posicao = i
+            self.upstreams.append(upstream)
+        logging.info(f"Ranking recarregado com {len(servidores)} servidores")
+
+    async def manter_ranking(self):
+        """Em segundo plano: sonda quem está fora do top K e reordena periodicamente."""
+        while True:
+            await asyncio.sleep(INTERVALO_REORDENAR)
+            self.recarregar_ranking()
+            reservas = self.upstreams[self.top_k:]
+            if reservas:
+                upstream = reservas[self.proxima_sonda % len(reservas)]
+                self.proxima_sonda += 1
+                await self._perguntar(upstream, dns.message.make_query(NOME_SONDA, 'A'))
+            self.reordenar()
+
+    async def servir(self, host, porta):
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: _ProtocoloUDP(self), local_addr=(host, porta))
+        servidor_tcp = await asyncio.start_server(self._atender_tcp, host, porta)
+        logging.info(f"Encaminhador DNS escutando em {host}:{porta} (UDP/TCP), top {self.top_k} de "
+                     f"{len(self.upstreams)} servidores")
+        async with servidor_tcp:
+            await self.manter_ranking()
+
+    async def _atender_tcp(self, leitor, escritor):
+        try:
+            while True:
+                tamanho = struct.unpack('!H', await leitor.readexactly(2))[0]
+                resposta = await self.responder(await leitor.readexactly(tamanho), tcp=True)
+                if resposta is not None:
+                    escritor.write(struct.pack('!H', len(resposta)) + resposta)
+                    await escritor.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    def resumo(self):
+        for i, u in enumerate(self.upstreams, start=1):
+            latencia = f"{u.latencia:.2f} ms" if u.latencia is not None else "sem medição"
+            print(f"{i}. {u.endereco} - {latencia}, {u.vitorias} vitórias em {u.consultas} consultas, "
+                  f"{u.falhas_seguidas} falhas seguidas")
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+    def __init__(self, forwarder):
+        self.forwarder = forwarder
+        self.transporte = None
+
+    def connection_made(self, transport):
+        self.transporte = transport
+
+    def datagram_received(self, data, addr):
+        self.forwarder.acompanhar(asyncio.get_running_loop().create_task(self._atender(data, addr)))
+
+    async def _atender(self, data, addr):
+        resposta = await self.forwarder.responder(data)
+        if resposta is not None:
+            self.transporte.sendto(resposta, addr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Encaminhador DNS local com corrida entre os melhores resolvedores.")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--arquivo', help="Arquivo com o ranking (relido automaticamente quando muda).")
+    origem.add_argument('--ranking', help="Servidores separados por vírgula, do melhor para o pior.")
+    parser.add_argument('--host', default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1).")
+    parser.add_argument('--porta', type=int, default=53, help="Porta de escuta (padrão: 53).")
+    parser.add_argument('--top', type=int, default=TOP_K_PADRAO, help="Quantos resolvedores disputam cada consulta.")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_PADRAO)
+    args = parser.parse_args()
+
+    servidores = carregar_ranking(args.arquivo) if args.arquivo else ler_ranking(args.ranking)
+    if not servidores:
+        parser.error("nenhum servidor válido no ranking")
+
+    forwarder = ForwarderDNS(servidores, args.top, args.timeout, args.arquivo)
+    try:
+        asyncio.run(forwarder.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nEstado final dos resolvedores:")
+        forwarder.resumo()
+
+if __name__ == "__main__":
+    main()
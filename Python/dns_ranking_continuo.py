@@ -0,0 +1,167 @@
+"""Ranking contínuo de servidores DNS com poucas sondas por minuto.
+
+Em vez de varrer todos os servidores de novo (como o dns_rout.py e o
+dns_rout2.py fazem a cada execução), mantém uma pontuação móvel de cada
+candidato e gasta um orçamento fixo de sondas por minuto: na maior parte das
+vezes remede os primeiros colocados e, de vez em quando, explora o resto.
+A lista ordenada é publicada num arquivo de forma atômica, no mesmo formato
+separado por vírgulas que o dns_forwarder.py lê (e relê quando muda).
+
+Exemplo:
+    python dns_ranking_continuo.py --saida ranking.txt --orcamento 30
+    python dns_forwarder.py --arquivo ranking.txt
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+import dns_rout2
+
+ORCAMENTO_PADRAO = 30        # Sondas por minuto
+TOP_K_PADRAO = 5             # Quantos primeiros colocados são remedidos com prioridade
+EXPLORACAO_PADRAO = 0.2      # Fração das sondas gasta fora do top K
+PINGS_POR_SONDA = 3
+ALFA_EWMA = 0.3              # Peso da sonda nova na latência móvel
+PUNICAO_MS = 10.0 * 1000     # Latência atribuída a uma sonda sem resposta
+SONDAS_POR_TRACEROUTE = 10   # A contagem de saltos é refeita a cada N sondas do candidato
+SONDAS_SIMULTANEAS = 4
+
+class Candidato:
+    """Pontuação móvel de um servidor."""
+    def __init__(self, endereco):
+        self.endereco = endereco
+        self.latencia = None     # Média móvel exponencial do ping em ms
+        self.saltos = None
+        self.sondas = 0
+        self.ultima_sonda = 0.0  # time.monotonic() da última sonda
+
+    def registrar(self, ping_ms, saltos):
+        amostra = PUNICAO_MS if ping_ms == float('inf') else ping_ms
+        self.latencia = amostra if self.latencia is None else ALFA_EWMA * amostra + (1 - ALFA_EWMA) * self.latencia
+        if saltos is not None or self.saltos is None:
+            self.saltos = saltos
+        self.sondas += 1
+        self.ultima_sonda = time.monotonic()
+
+    def chave(self):
+        """Mesmo critério do ranking combinado do dns_rout2: saltos e depois ping."""
+        return (self.saltos if self.saltos is not None else float('inf'),
+                self.latencia if self.latencia is not None else float('inf'))
+
+class RankingContinuo:
+    def __init__(self, servidores, saida, orcamento=ORCAMENTO_PADRAO, top_k=TOP_K_PADRAO,
+                 exploracao=EXPLORACAO_PADRAO, ignore_private_ips=False, semente=None):
+        self.candidatos = [Candidato(s) for s in dict.fromkeys(servidores)]
+        self.saida = saida
+        self.intervalo = 60.0 / orcamento
+        self.top_k = top_k
+        self.exploracao = exploracao
+        self.ignore_private_ips = ignore_private_ips
+        self.rnd = random.Random(semente)
+        self.lock = threading.Lock()
+        self.em_andamento = set()
+        self.running = True
+        self.ultima_publicacao = None
+
+    def ordenados(self):
+        return sorted(self.candidatos, key=Candidato.chave)
+
+    def escolher(self):
+        """Escolhe o próximo candidato a sondar (chamar com o lock)."""
+        livres = [c for c in self.candidatos if c.endereco not in self.em_andamento]
+        if not livres:
+            return None
+        # Quem nunca foi medido vem primeiro, para o ranking inicial ficar completo
+        nunca = [c for c in livres if c.sondas == 0]
+        if nunca:
+            return nunca[0]
+        ordem = [c for c in self.ordenados() if c.endereco not in self.em_andamento]
+        if self.rnd.random() < self.exploracao and len(ordem) > self.top_k:
+            grupo = ordem[self.top_k:]
+        else:
+            grupo = ordem[:self.top_k]
+        # Dentro do grupo, a medição mais antiga é a que mais precisa de atualização
+        return min(grupo, key=lambda c: c.ultima_sonda)
+
+    def sondar(self, candidato):
+        try:
+            saltos = None
+            if candidato.sondas % SONDAS_POR_TRACEROUTE == 0:
+                saltos = dns_rout2.get_hop_count(candidato.endereco, self.ignore_private_ips)
+            ping_ms = dns_rout2.ping_dns(candidato.endereco, count=PINGS_POR_SONDA)
+            with self.lock:
+                candidato.registrar(ping_ms, saltos)
+                self.publicar()
+            print(f'{candidato.endereco} - {candidato.saltos} saltos, ping {ping_ms:.2f} ms '
+                  f'(média móvel {candidato.latencia:.2f} ms, {candidato.sondas} sondas)')
+        except Exception as e:
+            # Conta como sonda sem resposta, para o candidato não travar a fila dos nunca medidos
+            logging.error(f'Erro ao sondar {candidato.endereco}: {e}')
+            with self.lock:
+                candidato.registrar(float('inf'), None)
+        finally:
+            with self.lock:
+                self.em_andamento.discard(candidato.endereco)
+
+    def publicar(self):
+        """Grava a lista ordenada num arquivo temporário e troca de uma vez (chamar com o lock)."""
+        lista = [c.endereco for c in self.ordenados() if c.sondas and c.saltos is not None]
+        if lista == self.ultima_publicacao:
+            return
+        diretorio = os.path.dirname(os.path.abspath(self.saida))
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix='.ranking-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(','.join(lista) + '\n')
+            os.replace(temporario, self.saida)
+            self.ultima_publicacao = lista
+        except OSError as e:
+            print(f'Erro ao publicar o ranking em {self.saida}: {e}')
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def executar(self):
+        """Dispara uma sonda a cada intervalo até ser interrompido."""
+        proxima = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SONDAS_SIMULTANEAS) as executor:
+            while self.running:
+                with self.lock:
+                    candidato = self.escolher()
+                    if candidato:
+                        self.em_andamento.add(candidato.endereco)
+                if candidato:
+                    executor.submit(self.sondar, candidato)
+                proxima += self.intervalo
+                time.sleep(max(0.0, proxima - time.monotonic()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantém o ranking de servidores DNS sempre atualizado.")
+    parser.add_argument('--saida', default="ranking_dns.txt", help="Arquivo onde a lista ordenada é publicada.")
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_PADRAO, help="Sondas por minuto.")
+    parser.add_argument('--top', type=int, default=TOP_K_PADRAO, help="Primeiros colocados remedidos com prioridade.")
+    parser.add_argument('--exploracao', type=float, default=EXPLORACAO_PADRAO,
+                        help="Fração das sondas usada para explorar o resto da lista.")
+    parser.add_argument('--ignorar-privados', action='store_true', help="Não conta saltos com IP privado.")
+    parser.add_argument('--servidores', help="Servidores separados por vírgula (padrão: lista do dns_rout2.py).")
+    args = parser.parse_args()
+
+    servidores = args.servidores.split(',') if args.servidores else dns_rout2.dns_servers
+    ranking = RankingContinuo(servidores, args.saida, args.orcamento, args.top, args.exploracao,
+                              args.ignorar_privados)
+    print(f"Ranking contínuo de {len(ranking.candidatos)} servidores, {args.orcamento:g} sondas/min, "
+          f"publicando em {args.saida}")
+    try:
+        ranking.executar()
+    except KeyboardInterrupt:
+        ranking.running = False
+        print("\nRanking final:")
+        for i, c in enumerate(ranking.ordenados(), start=1):
+            print(f'{i}. {c.endereco} - {c.saltos} saltos, ping médio {c.latencia} ms, {c.sondas} sondas')
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
+import argparse
 import subprocess
 import platform
 
+import historico_dns
+
 # Lista de servidores DNS
 dns_servers = [
     "1.0.0.1", "9.9.9.9", "9.9.9.10", "1.1.1.1",
@@ -32,32 +35,49 @@ def get_hop_count(dns_server):
         print(f'Erro ao executar {cmd[0]} para {dns_server}: {e}')
         return None
 
-# Inicializar variáveis para armazenar os resultados e o melhor servidor encontrado
-dns_hop_counts = {}
-min_hops = float('inf')
-fastest_dns = None
-
-# Testar todos os servidores DNS
-total_dns = len(dns_servers)
-for i, dns in enumerate(dns_servers, start=1):
-    print(f'Testando {dns} ({i}/{total_dns})...')
-    hop_count = get_hop_count(dns)
-    if hop_count is not None:
-        dns_hop_counts[dns] = hop_count
-        # Atualizar o melhor servidor encontrado, se necessário
-        if hop_count < min_hops:
-            min_hops = hop_count
-            fastest_dns = dns
-            print(f'Novo melhor servidor encontrado: {fastest_dns} com {min_hops} saltos.')
-
-# Ordenar os servidores DNS pelo número de saltos (ascendente)
-sorted_dns = sorted(dns_hop_counts.items(), key=lambda x: x[1])
-
-# Imprimir o ranking
-print('Ranking de servidores DNS (menos saltos primeiro):')
-for i, (dns, hops) in enumerate(sorted_dns, start=1):
-    print(f'{i}. {dns} - {hops} saltos')
+def main():
+    parser = argparse.ArgumentParser(description="Ranking de servidores DNS pelo número de saltos.")
+    historico_dns.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    historico = historico_dns.abrir('dns_rout', args)
+    try:
+        _ranking(historico)
+    finally:
+        if historico:
+            historico.fechar()
+
+def _ranking(historico):
+    # Inicializar variáveis para armazenar os resultados e o melhor servidor encontrado
+    dns_hop_counts = {}
+    min_hops = float('inf')
+    fastest_dns = None
+
+    # Testar todos os servidores DNS
+    total_dns = len(dns_servers)
+    for i, dns in enumerate(dns_servers, start=1):
+        print(f'Testando {dns} ({i}/{total_dns})...')
+        hop_count = get_hop_count(dns)
+        if hop_count is not None:
+            dns_hop_counts[dns] = hop_count
+            if historico:
+                historico.registrar(dns, 'saltos', hop_count)
+            # Atualizar o melhor servidor encontrado, se necessário
+            if hop_count < min_hops:
+                min_hops = hop_count
+                fastest_dns = dns
+                print(f'Novo melhor servidor encontrado: {fastest_dns} com {min_hops} saltos.')
+
+    # Ordenar os servidores DNS pelo número de saltos (ascendente)
+    sorted_dns = sorted(dns_hop_counts.items(), key=lambda x: x[1])
+
+    # Imprimir o ranking
+    print('Ranking de servidores DNS (menos saltos primeiro):')
+    for i, (dns, hops) in enumerate(sorted_dns, start=1):
+        print(f'{i}. {dns} - {hops} saltos')
     
-# Imprimir os servidores DNS ordenados, separados por vírgulas
-sorted_dns_addresses = [item[0] for item in sorted_dns]
-print(','.join(sorted_dns_addresses))
+    # Imprimir os servidores DNS ordenados, separados por vírgulas
+    sorted_dns_addresses = [item[0] for item in sorted_dns]
+    print(','.join(sorted_dns_addresses))
+
+if __name__ == "__main__":
+    main()
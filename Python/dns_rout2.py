@@ -1,225 +1,632 @@
-import subprocess
-import platform
-import ipaddress
-import concurrent.futures
-
-def is_private_ip(ip):
-    try:
-        return ipaddress.ip_address(ip).is_private
-    except ValueError:
-        return False
-
-# Lista atualizada de servidores DNS...
-dns_servers = [
-    # Google Public DNS
-    "8.8.8.8", "8.8.4.4",
-    # OpenDNS
-    "208.67.222.222", "208.67.220.220", "208.67.222.220", "208.67.220.222",
-    # Yandex
-    "77.88.8.1", "77.88.8.8",
-    # Cloudflare
-    "1.1.1.1", "1.0.0.1",
-    # Norton ConnectSafe Basic
-    "199.85.126.10", "199.85.127.10",
-    # Level 3
-    "209.244.0.3", "209.244.0.4",
-    "4.2.2.1", "4.2.2.2", "4.2.2.3", "4.2.2.4", "4.2.2.5", "4.2.2.6",
-    # Comodo
-    "8.26.56.26", "8.20.247.20", "156.154.70.22", "156.154.71.22",
-    # Dyn
-    "216.146.35.35", "216.146.36.36",
-    # Norton DNS
-    "198.153.192.1", "198.153.194.1",
-    # VeriSign
-    "64.6.64.6", "64.6.65.6",
-    # Qwest
-    "205.171.3.65", "205.171.2.65",
-    # Sprint
-    "204.97.212.10", "204.117.214.10",
-    # Censurfridns
-    "89.233.43.71", "91.239.100.100",
-    # Safe DNS
-    "195.46.39.39", "195.46.39.40",
-    # DNS WATCH
-    "84.200.69.80", "84.200.70.40",
-    # FreeDNS
-    "37.235.1.174", "37.235.1.177",
-    # Sprintlink
-    "199.2.252.10", "204.97.212.10",
-    # UltraDNS
-    "204.69.234.1", "204.74.101.1",
-    # Zen Internet
-    "212.23.8.1", "212.23.3.1",
-    # Orange DNS
-    "195.92.195.94", "195.92.195.95",
-    # Hurricane Electric
-    "74.82.42.42",
-    # puntCAT
-    "109.69.8.51",
-    # Freenom World
-    "80.80.80.80", "80.80.81.81",
-    # FDN
-    "80.67.169.12", "80.67.169.40",
-    # Neustar
-    "156.154.70.1", "156.154.71.1", "156.154.70.5", "156.154.71.5",
-    # AdGuard
-    "94.140.14.14", "94.140.15.15",
-    # Quad9
-    "9.9.9.9", "149.112.112.112", "9.9.9.10", "149.112.112.10",
-    # MegaLan
-    "95.111.55.251", "95.111.55.250"
-]
-
-def extract_ip_from_line(line):
-    """Extrai o IP de uma linha do traceroute/tracert."""
-    parts = line.split()
-    for part in parts:
-        if part.count('.') == 3:  # Formato básico de IPv4
-            try:
-                ipaddress.ip_address(part)
-                return part
-            except ValueError:
-                continue
-    return None
-
-def get_hop_count(dns_server, ignore_private_ips):
-    MAX_HOPS = 20
-    os_name = platform.system().lower()
-    
-    try:
-        # Configuração do comando com -d para Windows e sem para Linux, mas específico
-        if os_name == 'linux':
-            cmd = ['traceroute', dns_server]
-        elif os_name == 'windows':
-            cmd = ['tracert', '-d', dns_server]  # Adicionando -d aqui
-        else:
-            print(f'Sistema operacional {os_name} não suportado.')
-            return None
-
-        try:
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)
-            output_lines = result.stdout.strip().split('\n')
-            
-            valid_hops = 0
-            for line in output_lines[1:]:  # Pula a linha de cabeçalho
-                if valid_hops >= MAX_HOPS:  # Se ultrapassar 20 saltos, descarta o servidor
-                    print(f'Servidor {dns_server} ultrapassou {MAX_HOPS} saltos.')
-                    return None
-                
-                ip = extract_ip_from_line(line)
-                # Sempre conta a linha como um salto
-                if ip or '*' in line:  # Verifica se há IP ou um asterisco na linha
-                    if ip and ignore_private_ips and is_private_ip(ip):
-                        continue  # Ignora IPs privados
-                    valid_hops += 1
-
-            return valid_hops if valid_hops > 0 else None
-
-        except subprocess.CalledProcessError as e:
-            print(f'Erro ao executar {cmd[0]} para {dns_server}: {e}')
-            return None
-
-    except Exception as ex:
-        print(f'Ocorreu um erro: {ex}')
-        return None
-
-def ping_dns(dns_server, count=10, timeout=1):
-    """Executa múltiplos pings no servidor DNS e retorna a latência média em milissegundos."""
-    os_name = platform.system().lower()
-    cmd = (
-        ['ping', '-n', str(count), '-w', str(timeout), dns_server] if os_name == 'windows' 
-        else ['ping', '-c', str(count), '-W', str(timeout), dns_server]
-    )
-    
-    try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True, timeout=timeout + count)  # tempo total limite
-        total_time = 0
-        successful_pings = 0
-
-        if os_name == 'windows':
-            for line in result.stdout.splitlines():
-                if 'tempo=' in line:
-                    time_part = float(line.split('tempo=')[1].split('ms')[0])
-                    total_time += time_part
-                    successful_pings += 1
-        else:
-            for line in result.stdout.splitlines():
-                if 'time=' in line:
-                    time_part = float(line.split('time=')[1].split(' ')[0])
-                    total_time += time_part
-                    successful_pings += 1
-        
-        if successful_pings == 0:
-            return float('inf')  # Penaliza se nenhum ping foi bem sucedido
-        
-        return total_time / successful_pings  # Retorna a média dos tempos
-
-    except Exception as e:
-        print(f'Falha ao pingar {dns_server}: {e}')
-        return float('inf')  # Penaliza se o ping falhar
-
-def main():
-    # Perguntar se deseja ignorar IPs privados
-    ignore_private_ips = input("Deseja ignorar IPs privados? (s/n): ").lower() == 's'
-    print(f"Ignorar IPs privados: {'Sim' if ignore_private_ips else 'Não'}")
-    
-    dns_hop_counts = {}
-    speeds = {}
-    min_hops = float('inf')
-    fastest_dns = None
-
-    # Testar todos os servidores DNS usando threading
-    total_dns = len(dns_servers)
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_dns = {executor.submit(get_hop_count, dns, ignore_private_ips): dns for dns in dns_servers}
-        
-        for future in concurrent.futures.as_completed(future_to_dns):
-            dns = future_to_dns[future]
-            hop_count = future.result()
-            if hop_count is not None:
-                dns_hop_counts[dns] = hop_count
-                avg_ping = ping_dns(dns)
-                speeds[dns] = avg_ping
-
-                print(f'{dns} - {hop_count} saltos, tempo médio de ping: {avg_ping:.2f} ms')
-
-                # Lógica para determinar o melhor servidor
-                if hop_count < min_hops or (hop_count == min_hops and (fastest_dns is None or avg_ping < speeds[fastest_dns])):
-                    min_hops = hop_count
-                    fastest_dns = dns
-                    print(f'Novo melhor servidor encontrado: {fastest_dns} com {min_hops} saltos e ping médio de {avg_ping:.2f} ms.')
-
-    # Ranking dos menores saltos
-    if dns_hop_counts:
-        sorted_hops = sorted(dns_hop_counts.items(), key=lambda x: x[1])  # Ordena apenas por saltos
-        
-        print('\nRanking de servidores DNS (menos saltos primeiro):')
-        for i, (dns, hops) in enumerate(sorted_hops, start=1):
-            avg_ping = speeds[dns]
-            print(f'{i}. {dns} - {hops} saltos, tempo de ping médio: {avg_ping:.2f} ms')
-
-    # Ranking dos menores pings
-    if speeds:
-        sorted_ping = sorted(speeds.items(), key=lambda x: x[1])  # Ordena apenas por ping
-        
-        print('\nRanking de servidores DNS (menor ping primeiro):')
-        for i, (dns, ping) in enumerate(sorted_ping, start=1):
-            hops = dns_hop_counts[dns]
-            print(f'{i}. {dns} - {hops} saltos, tempo de ping: {ping:.2f} ms')
-
-    # Ranking combinado
-    if dns_hop_counts and speeds:
-        sorted_combined = sorted(dns_hop_counts.items(), key=lambda x: (x[1], speeds[x[0]]))  # Ordena por saltos e ping médio
-
-        print('\nRanking de servidores DNS (menor saltos e menor ping primeiro):')
-        for i, (dns, hops) in enumerate(sorted_combined, start=1):
-            avg_ping = speeds[dns]
-            print(f'{i}. {dns} - {hops} saltos, tempo de ping médio: {avg_ping:.2f} ms')
-            
-        print('\nServidores DNS ordenados (separados por vírgulas):\n')
-        # Cria uma lista de strings com os endereços DNS
-        dns_list = [dns for dns, _ in sorted_combined]
-        print(','.join(dns_list))
-        
-if __name__ == "__main__":
+import argparse
+import subprocess
+import platform
+import ipaddress
+import concurrent.futures
+import functools
+import json
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+
+import historico_dns
+
+MAX_HOPS = 20
+
+# Traceroute interno: uma sonda UDP por TTL, todas disparadas de uma vez. No
+# Linux, com IP_RECVERR, o ICMP de resposta (time exceeded / port unreachable)
+# cai na fila de erros do próprio socket da sonda, sem precisar de root e sem
+# ambiguidade sobre qual TTL ele responde.
+TRACE_BASE_PORT = 33434   # Mesma faixa de portas do traceroute tradicional
+TRACE_TIMEOUT = 2.0       # Segundos esperando respostas em cada rodada
+TRACE_ROUNDS = 2          # Rodadas extras só reenviam os TTLs sem resposta
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+
+# Traceroute externo (sistemas sem o traceroute interno)
+EXTERNAL_PROBE_WAIT = 1          # Segundos de espera por sonda
+EXTERNAL_MAX_TTL_PRIVATE = 30    # TTL máximo quando os IPs privados não contam
+EXTERNAL_TRACE_TIMEOUT = 60      # Segundos até matar um rastreio travado
+
+# Pipeline saltos -> ping do main()
+HOP_WORKERS = 16          # Traceroutes simultâneos
+PING_WORKERS = 8          # Pings simultâneos
+PING_COUNT = 10           # Pings por servidor
+PACKETS_PER_SECOND = 50   # Orçamento global de pacotes das duas etapas
+
+# Cache do trecho local do caminho (saltos comuns a todos os servidores)
+HOP_CACHE_PATH = "dns_rout2_cache.json"
+HOP_CACHE_TTL = 3600      # Segundos até o trecho local precisar ser redescoberto
+
+def is_private_ip(ip):
+    try:
+        return ipaddress.ip_address(ip).is_private
+    except ValueError:
+        return False
+
+# Lista atualizada de servidores DNS...
+dns_servers = [
+    # Google Public DNS
+    "8.8.8.8", "8.8.4.4",
+    # OpenDNS
+    "208.67.222.222", "208.67.220.220", "208.67.222.220", "208.67.220.222",
+    # Yandex
+    "77.88.8.1", "77.88.8.8",
+    # Cloudflare
+    "1.1.1.1", "1.0.0.1",
+    # Norton ConnectSafe Basic
+    "199.85.126.10", "199.85.127.10",
+    # Level 3
+    "209.244.0.3", "209.244.0.4",
+    "4.2.2.1", "4.2.2.2", "4.2.2.3", "4.2.2.4", "4.2.2.5", "4.2.2.6",
+    # Comodo
+    "8.26.56.26", "8.20.247.20", "156.154.70.22", "156.154.71.22",
+    # Dyn
+    "216.146.35.35", "216.146.36.36",
+    # Norton DNS
+    "198.153.192.1", "198.153.194.1",
+    # VeriSign
+    "64.6.64.6", "64.6.65.6",
+    # Qwest
+    "205.171.3.65", "205.171.2.65",
+    # Sprint
+    "204.97.212.10", "204.117.214.10",
+    # Censurfridns
+    "89.233.43.71", "91.239.100.100",
+    # Safe DNS
+    "195.46.39.39", "195.46.39.40",
+    # DNS WATCH
+    "84.200.69.80", "84.200.70.40",
+    # FreeDNS
+    "37.235.1.174", "37.235.1.177",
+    # Sprintlink
+    "199.2.252.10", "204.97.212.10",
+    # UltraDNS
+    "204.69.234.1", "204.74.101.1",
+    # Zen Internet
+    "212.23.8.1", "212.23.3.1",
+    # Orange DNS
+    "195.92.195.94", "195.92.195.95",
+    # Hurricane Electric
+    "74.82.42.42",
+    # puntCAT
+    "109.69.8.51",
+    # Freenom World
+    "80.80.80.80", "80.80.81.81",
+    # FDN
+    "80.67.169.12", "80.67.169.40",
+    # Neustar
+    "156.154.70.1", "156.154.71.1", "156.154.70.5", "156.154.71.5",
+    # AdGuard
+    "94.140.14.14", "94.140.15.15",
+    # Quad9
+    "9.9.9.9", "149.112.112.112", "9.9.9.10", "149.112.112.10",
+    # MegaLan
+    "95.111.55.251", "95.111.55.250"
+]
+
+def extract_ip_from_line(line):
+    """Extrai o IP de uma linha do traceroute/tracert."""
+    parts = line.split()
+    for part in parts:
+        if part.count('.') == 3:  # Formato básico de IPv4
+            try:
+                ipaddress.ip_address(part)
+                return part
+            except ValueError:
+                continue
+    return None
+
+def native_trace_supported():
+    """O traceroute interno depende da fila de erros de socket do Linux."""
+    return platform.system().lower() == 'linux'
+
+class HopGraph:
+    """Saltos já descobertos nesta execução, compartilhados entre as threads.
+
+    Segue a ideia do Doubletree: o trecho inicial do caminho (a rede local e o
+    provedor) é igual para todos os servidores, então cada traceroute começa
+    no fim desse trecho e só volta a sondar os TTLs baixos se o salto onde
+    começou for desconhecido. O trecho local fica num cache em disco com
+    validade, e servidores do mesmo /24 reaproveitam o resultado um do outro.
+    """
+    def __init__(self, cache_path=HOP_CACHE_PATH, cache_ttl=HOP_CACHE_TTL):
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+        self.local_path = None   # ttl -> ip (None para salto que não responde)
+        self.known = {}          # ip -> (ttl, {ttl: ip} dos saltos abaixo dele)
+        self.prefixes = {}       # (rede /24, ttl máximo) -> (hops, dest_ttl)
+        self.prefix_locks = {}
+        self.probes_sent = 0
+        self.restarts = 0        # Rastreios que não reconheceram o trecho local e voltaram ao TTL 1
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if time.time() - data.get('saved_at', 0) <= self.cache_ttl:
+                self.local_path = {int(ttl): ip for ttl, ip in data.get('local_path', {}).items()}
+                # Sem isto o salto em start_ttl() seria desconhecido e todo rastreio voltaria ao TTL 1
+                self._learn(self.local_path)
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        if self.local_path is None:
+            return
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'saved_at': time.time(), 'local_path': self.local_path}, f)
+        except OSError as e:
+            print(f'Não foi possível gravar o cache de saltos: {e}')
+
+    def start_ttl(self):
+        """TTL onde começa a sondagem: o último salto do trecho local conhecido."""
+        with self.lock:
+            return max(self.local_path) if self.local_path else 1
+
+    def prefix_below(self, ttl, hop_ip):
+        """Saltos abaixo de `ttl` se o salto já é conhecido nesse TTL; senão None."""
+        with self.lock:
+            if hop_ip is None:
+                # Salto silencioso: não há como conferir, assume o trecho local
+                return {t: ip for t, ip in self.local_path.items() if t < ttl}
+            entry = self.known.get(hop_ip)
+            if entry and entry[0] == ttl:
+                return dict(entry[1])
+            return None
+
+    def _learn(self, path):
+        for ttl, ip in path.items():
+            if ip and ip not in self.known:
+                self.known[ip] = (ttl, {t: path.get(t) for t in range(1, ttl)})
+
+    def record(self, hops, dest_ttl):
+        """Guarda um caminho completo e encolhe o trecho local ao prefixo comum."""
+        path = {ttl: hops.get(ttl) for ttl in range(1, dest_ttl)}
+        with self.lock:
+            self._learn(path)
+            if self.local_path is None:
+                self.local_path = path
+                return
+            common = {}
+            for ttl in sorted(self.local_path):
+                if ttl not in path or path[ttl] != self.local_path[ttl]:
+                    break
+                common[ttl] = path[ttl]
+            self.local_path = common
+
+    def prefix_lock(self, dns_server, max_hops):
+        prefix = (str(ipaddress.ip_network(f'{dns_server}/24', strict=False)), max_hops)
+        with self.lock:
+            return prefix, self.prefix_locks.setdefault(prefix, threading.Lock())
+
+def _read_probe_reply(sock, dns_server):
+    """Lê a resposta de uma sonda; devolve (ip_do_salto, chegou_ao_destino, caminho_interrompido)."""
+    try:
+        _, ancdata, _, _ = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+    except BlockingIOError:
+        # Sem erro na fila: o próprio destino respondeu na porta UDP
+        try:
+            sock.recv(512)
+            return dns_server, True, False
+        except OSError:
+            return None, False, False
+    for level, ctype, data in ancdata:
+        if level != socket.SOL_IP or ctype != IP_RECVERR:
+            continue
+        # struct sock_extended_err (16 bytes) seguida do sockaddr_in de quem respondeu
+        _, origin, icmp_type, _ = struct.unpack_from('=IBBB', data)
+        if origin != SO_EE_ORIGIN_ICMP:
+            continue
+        hop_ip = socket.inet_ntoa(data[20:24])
+        if icmp_type == ICMP_TIME_EXCEEDED:
+            return hop_ip, False, False
+        if icmp_type == ICMP_DEST_UNREACH:
+            reached = hop_ip == dns_server
+            return hop_ip, reached, not reached
+    return None, False, False
+
+def _probe_round(dns_server, ttls, timeout):
+    """Dispara uma sonda por TTL de uma vez; devolve ({ttl: ip}, ttl_do_destino, interrompido)."""
+    hops = {}
+    dest_ttl = None
+    probes = {}
+    poller = select.poll()
+    try:
+        for ttl in ttls:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            probes[sock.fileno()] = (sock, ttl)
+            sock.setblocking(False)
+            sock.setsockopt(socket.SOL_IP, socket.IP_TTL, ttl)
+            sock.setsockopt(socket.SOL_IP, IP_RECVERR, 1)
+            sock.connect((dns_server, TRACE_BASE_PORT + ttl))
+            try:
+                sock.send(b'\x00' * 32)
+            except OSError:
+                pass  # Erros de envio também chegam pela fila de erros
+            poller.register(sock, select.POLLIN | select.POLLERR)
+
+        deadline = time.monotonic() + timeout
+        while probes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for fd, _ in poller.poll(remaining * 1000):
+                sock, ttl = probes.pop(fd)
+                poller.unregister(fd)
+                hop_ip, reached, blocked = _read_probe_reply(sock, dns_server)
+                sock.close()
+                if hop_ip:
+                    hops[ttl] = hop_ip
+                if reached:
+                    dest_ttl = min(dest_ttl or ttl, ttl)
+                elif blocked:
+                    # Roteador avisou que o destino é inalcançável
+                    return hops, None, True
+            if dest_ttl and all(t in hops for t in ttls if t <= dest_ttl):
+                break
+    finally:
+        for sock, _ in probes.values():
+            sock.close()
+    return hops, dest_ttl, False
+
+def trace_hops_native(dns_server, max_hops=MAX_HOPS, timeout=TRACE_TIMEOUT, rounds=TRACE_ROUNDS, graph=None,
+                      budget=None):
+    """Traceroute em processo com todos os TTLs em paralelo.
+
+    Com um HopGraph, começa no último salto do trecho local e só sonda os
+    TTLs abaixo dele se esse salto ainda não for conhecido.
+    Devolve ({ttl: ip_do_salto}, ttl_do_destino); o ttl do destino é None
+    quando ele não foi alcançado em até max_hops saltos.
+    """
+    hops = {}
+    dest_ttl = None
+    first_ttl = graph.start_ttl() if graph else 1
+    pending = list(range(first_ttl, max_hops + 1))
+    for round_number in range(rounds):
+        if budget:
+            budget.acquire(len(pending))
+        replies, reached_ttl, blocked = _probe_round(dns_server, pending, timeout)
+        if graph:
+            with graph.lock:
+                graph.probes_sent += len(pending)
+        hops.update(replies)
+        if blocked:
+            return hops, None
+        if reached_ttl:
+            dest_ttl = min(dest_ttl or reached_ttl, reached_ttl)
+
+        if round_number == 0 and first_ttl > 1:
+            below = graph.prefix_below(first_ttl, hops.get(first_ttl))
+            if below is None:
+                first_ttl = 1  # Caminho desviou antes do trecho local: sonda para trás
+                with graph.lock:
+                    graph.restarts += 1
+            else:
+                hops.update({ttl: ip for ttl, ip in below.items() if ip})
+
+        limit = dest_ttl or max_hops
+        pending = [ttl for ttl in range(first_ttl, limit + 1) if ttl not in hops]
+        if not pending:
+            break
+    return hops, dest_ttl
+
+def get_hop_count_native(dns_server, ignore_private_ips, graph=None, budget=None):
+    """Conta os saltos até o servidor com o traceroute interno."""
+    # Mesmo limite de TTL do caminho externo: ignorando IPs privados, é preciso ir além de MAX_HOPS
+    max_hops = EXTERNAL_MAX_TTL_PRIVATE if ignore_private_ips else MAX_HOPS
+    if graph:
+        prefix, lock = graph.prefix_lock(dns_server, max_hops)
+        with lock:
+            # Servidores do mesmo /24 esperam o primeiro e reaproveitam o caminho dele
+            if prefix in graph.prefixes:
+                hops, dest_ttl = graph.prefixes[prefix]
+                print(f'{dns_server}: caminho reaproveitado de {prefix[0]}')
+            else:
+                hops, dest_ttl = trace_hops_native(dns_server, max_hops=max_hops, graph=graph, budget=budget)
+                graph.prefixes[prefix] = (hops, dest_ttl)
+                if dest_ttl:
+                    graph.record(hops, dest_ttl)
+    else:
+        hops, dest_ttl = trace_hops_native(dns_server, max_hops=max_hops, budget=budget)
+
+    if dest_ttl is None:
+        print(f'Servidor {dns_server} ultrapassou {MAX_HOPS} saltos.')
+        return None
+    # Saltos sem resposta (*) contam; IPs privados podem ser ignorados
+    private = sum(1 for ttl in range(1, dest_ttl + 1)
+                  if ignore_private_ips and ttl in hops and is_private_ip(hops[ttl]))
+    valid_hops = dest_ttl - private
+    # Como no caminho externo: descartado se precisaria de mais um salto válido além de MAX_HOPS
+    if valid_hops > MAX_HOPS:
+        print(f'Servidor {dns_server} ultrapassou {MAX_HOPS} saltos.')
+        return None
+    return valid_hops if valid_hops > 0 else None
+
+def get_hop_count(dns_server, ignore_private_ips, graph=None, budget=None):
+    if native_trace_supported():
+        try:
+            return get_hop_count_native(dns_server, ignore_private_ips, graph, budget)
+        except OSError as e:
+            print(f'Traceroute interno indisponível ({e}); usando a ferramenta do sistema.')
+    if budget:
+        budget.acquire(MAX_HOPS + 1)
+    return get_hop_count_external(dns_server, ignore_private_ips)
+
+def external_trace_command(dns_server, ignore_private_ips):
+    """Monta o traceroute/tracert com TTL máximo e espera por sonda ajustados ao limite de saltos."""
+    os_name = platform.system().lower()
+    # Um TTL a mais que o limite basta para saber que o servidor passou dele;
+    # ignorando IPs privados, os saltos locais não contam e é preciso ir além.
+    max_ttl = EXTERNAL_MAX_TTL_PRIVATE if ignore_private_ips else MAX_HOPS + 1
+    if os_name == 'linux':
+        return ['traceroute', '-n', '-q', '1', '-w', str(EXTERNAL_PROBE_WAIT), '-m', str(max_ttl), dns_server]
+    if os_name == 'windows':
+        return ['tracert', '-d', '-w', str(EXTERNAL_PROBE_WAIT * 1000), '-h', str(max_ttl), dns_server]
+    return None
+
+def get_hop_count_external(dns_server, ignore_private_ips):
+    """Conta os saltos lendo a saída do traceroute/tracert linha a linha.
+
+    O processo é encerrado assim que o destino aparece ou o limite de saltos
+    é ultrapassado, para não prender a thread do pool até o fim do rastreio.
+    """
+    cmd = external_trace_command(dns_server, ignore_private_ips)
+    if cmd is None:
+        print(f'Sistema operacional {platform.system().lower()} não suportado.')
+        return None
+
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                errors='replace')
+    except OSError as e:
+        print(f'Erro ao executar {cmd[0]} para {dns_server}: {e}')
+        return None
+
+    # Garante que um rastreio travado não segure a thread para sempre
+    watchdog = threading.Timer(EXTERNAL_TRACE_TIMEOUT, proc.kill)
+    watchdog.start()
+    try:
+        valid_hops = 0
+        header_skipped = False
+        for line in proc.stdout:
+            if not line.strip():
+                continue
+            if not header_skipped:  # Pula a linha de cabeçalho
+                header_skipped = True
+                continue
+            if valid_hops >= MAX_HOPS:  # Se ultrapassar 20 saltos, descarta o servidor
+                print(f'Servidor {dns_server} ultrapassou {MAX_HOPS} saltos.')
+                return None
+
+            ip = extract_ip_from_line(line)
+            # Sempre conta a linha como um salto
+            if ip or '*' in line:  # Verifica se há IP ou um asterisco na linha
+                if ip and ignore_private_ips and is_private_ip(ip):
+                    continue  # Ignora IPs privados
+                valid_hops += 1
+            if ip == dns_server:
+                break  # Chegou ao destino; o resto da saída não interessa
+
+        return valid_hops if valid_hops > 0 else None
+
+    except Exception as ex:
+        print(f'Ocorreu um erro: {ex}')
+        return None
+    finally:
+        watchdog.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+def ping_dns(dns_server, count=10, timeout=1):
+    """Executa múltiplos pings no servidor DNS e retorna a latência média em milissegundos."""
+    return ping_dns_loss(dns_server, count, timeout)[0]
+
+def ping_dns_loss(dns_server, count=10, timeout=1):
+    """Como ping_dns, mas devolve (latência média, fração de pings perdidos).
+
+    A perda é None quando o ping nem pôde ser executado.
+    """
+    os_name = platform.system().lower()
+    cmd = (
+        ['ping', '-n', str(count), '-w', str(timeout), dns_server] if os_name == 'windows' 
+        else ['ping', '-c', str(count), '-W', str(timeout), dns_server]
+    )
+    
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True, timeout=timeout + count)  # tempo total limite
+        total_time = 0
+        successful_pings = 0
+
+        if os_name == 'windows':
+            for line in result.stdout.splitlines():
+                if 'tempo=' in line:
+                    time_part = float(line.split('tempo=')[1].split('ms')[0])
+                    total_time += time_part
+                    successful_pings += 1
+        else:
+            for line in result.stdout.splitlines():
+                if 'time=' in line:
+                    time_part = float(line.split('time=')[1].split(' ')[0])
+                    total_time += time_part
+                    successful_pings += 1
+        
+        loss = (count - successful_pings) / count
+        if successful_pings == 0:
+            return float('inf'), loss  # Penaliza se nenhum ping foi bem sucedido
+        
+        return total_time / successful_pings, loss  # Retorna a média dos tempos
+
+    except subprocess.CalledProcessError:
+        print(f'Falha ao pingar {dns_server}: nenhuma resposta')
+        return float('inf'), 1.0  # O ping sai com erro quando nenhum pacote volta
+    except Exception as e:
+        print(f'Falha ao pingar {dns_server}: {e}')
+        return float('inf'), None  # Penaliza se o ping falhar
+
+class PacketBudget:
+    """Orçamento global de pacotes por segundo, compartilhado pelas duas etapas.
+
+    Cada tarefa reserva os pacotes que vai enviar e espera a sua vez; a taxa
+    média somada de todas as threads fica no limite, sem parecer um flood.
+    """
+    def __init__(self, packets_per_second):
+        self.rate = packets_per_second
+        self.lock = threading.Lock()
+        self.next_free = time.monotonic()
+
+    def acquire(self, packets):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_free)
+            self.next_free = start + packets / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+def hop_ping_pipeline(servers, ignore_private_ips, graph=None, budget=None,
+                      hop_workers=HOP_WORKERS, ping_workers=PING_WORKERS, ping_count=PING_COUNT):
+    """Roda traceroute e ping em duas etapas encadeadas, com concorrência limitada em cada uma.
+
+    Gera (servidor, saltos, ping_médio, perda, (saltos_prontos, pings_prontos, total))
+    na ordem em que cada servidor termina; servidores descartados na etapa de
+    saltos saem com saltos, ping e perda None.
+    """
+    results = queue.Queue()
+    lock = threading.Lock()
+    done = {'hops': 0, 'pings': 0}
+
+    def ping_stage(dns, hop_count):
+        if budget:
+            budget.acquire(ping_count)
+        avg_ping, loss = ping_dns_loss(dns, count=ping_count)
+        with lock:
+            done['pings'] += 1
+        results.put((dns, hop_count, avg_ping, loss))
+
+    def hop_done(dns, future):
+        try:
+            hop_count = future.result()
+        except Exception as ex:
+            print(f'Ocorreu um erro: {ex}')
+            hop_count = None
+        with lock:
+            done['hops'] += 1
+        if hop_count is None:
+            results.put((dns, None, None, None))
+        else:
+            ping_pool.submit(ping_stage, dns, hop_count)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=hop_workers) as hop_pool, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=ping_workers) as ping_pool:
+        for dns in servers:
+            future = hop_pool.submit(get_hop_count, dns, ignore_private_ips, graph, budget)
+            future.add_done_callback(functools.partial(hop_done, dns))
+        for _ in servers:
+            dns, hop_count, avg_ping, loss = results.get()
+            with lock:
+                progress = (done['hops'], done['pings'], len(servers))
+            yield dns, hop_count, avg_ping, loss, progress
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking de servidores DNS por saltos e ping.")
+    historico_dns.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    historico = historico_dns.abrir('dns_rout2', args)
+    try:
+        _main(historico)
+    finally:
+        if historico:
+            historico.fechar()
+
+def _main(historico):
+    # Perguntar se deseja ignorar IPs privados
+    ignore_private_ips = input("Deseja ignorar IPs privados? (s/n): ").lower() == 's'
+    print(f"Ignorar IPs privados: {'Sim' if ignore_private_ips else 'Não'}")
+    
+    dns_hop_counts = {}
+    speeds = {}
+    min_hops = float('inf')
+    fastest_dns = None
+
+    budget = PacketBudget(PACKETS_PER_SECOND)
+
+    # Descobre o trecho local com dois servidores antes de soltar os demais
+    graph = HopGraph()
+    if native_trace_supported() and graph.local_path is None:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            list(executor.map(lambda dns: get_hop_count(dns, ignore_private_ips, graph, budget),
+                              [dns_servers[0], dns_servers[-1]]))
+
+    # Saltos e ping em pipeline: o ping de cada servidor começa assim que
+    # o traceroute dele termina, dentro do orçamento global de pacotes
+    for dns, hop_count, avg_ping, loss, (hops_done, pings_done, total_dns) in hop_ping_pipeline(
+            dns_servers, ignore_private_ips, graph, budget):
+        progress = f'[saltos {hops_done}/{total_dns} | ping {pings_done}/{total_dns}]'
+        if hop_count is None:
+            print(f'{progress} {dns} descartado')
+            continue
+        dns_hop_counts[dns] = hop_count
+        speeds[dns] = avg_ping
+        if historico:
+            historico.registrar(dns, 'saltos', hop_count)
+            historico.registrar(dns, 'rtt_ms', avg_ping)
+            historico.registrar(dns, 'ping_perda', loss)
+
+        print(f'{progress} {dns} - {hop_count} saltos, tempo médio de ping: {avg_ping:.2f} ms')
+
+        # Lógica para determinar o melhor servidor
+        if hop_count < min_hops or (hop_count == min_hops and (fastest_dns is None or avg_ping < speeds[fastest_dns])):
+            min_hops = hop_count
+            fastest_dns = dns
+            print(f'Novo melhor servidor encontrado: {fastest_dns} com {min_hops} saltos e ping médio de {avg_ping:.2f} ms.')
+
+    graph.save()
+    if graph.probes_sent:
+        print(f'\nSondas de traceroute enviadas: {graph.probes_sent} '
+              f'({graph.restarts} rastreios recomeçaram do TTL 1)')
+
+    # Ranking dos menores saltos
+    if dns_hop_counts:
+        sorted_hops = sorted(dns_hop_counts.items(), key=lambda x: x[1])  # Ordena apenas por saltos
+        
+        print('\nRanking de servidores DNS (menos saltos primeiro):')
+        for i, (dns, hops) in enumerate(sorted_hops, start=1):
+            avg_ping = speeds[dns]
+            print(f'{i}. {dns} - {hops} saltos, tempo de ping médio: {avg_ping:.2f} ms')
+
+    # Ranking dos menores pings
+    if speeds:
+        sorted_ping = sorted(speeds.items(), key=lambda x: x[1])  # Ordena apenas por ping
+        
+        print('\nRanking de servidores DNS (menor ping primeiro):')
+        for i, (dns, ping) in enumerate(sorted_ping, start=1):
+            hops = dns_hop_counts[dns]
+            print(f'{i}. {dns} - {hops} saltos, tempo de ping: {ping:.2f} ms')
+
+    # Ranking combinado
+    if dns_hop_counts and speeds:
+        sorted_combined = sorted(dns_hop_counts.items(), key=lambda x: (x[1], speeds[x[0]]))  # Ordena por saltos e ping médio
+
+        print('\nRanking de servidores DNS (menor saltos e menor ping primeiro):')
+        for i, (dns, hops) in enumerate(sorted_combined, start=1):
+            avg_ping = speeds[dns]
+            print(f'{i}. {dns} - {hops} saltos, tempo de ping médio: {avg_ping:.2f} ms')
+            
+        print('\nServidores DNS ordenados (separados por vírgulas):\n')
+        # Cria uma lista de strings com os endereços DNS
+        dns_list = [dns for dns, _ in sorted_combined]
+        print(','.join(dns_list))
+        
+if __name__ == "__main__":
     main()
\ No newline at end of file
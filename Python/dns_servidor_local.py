@@ -0,0 +1,330 @@
+"""Servidor DNS local de mentira para testar os benchmarks sem internet.
+
+Sobe N instâncias em portas consecutivas do loopback, cada uma atendendo UDP e
+TCP na mesma porta, com distribuição de latência, taxa de descarte, taxa de
+SERVFAIL e comportamento de cache configuráveis.
+
+Exemplos:
+    python dns_servidor_local.py --instancias 3 --latencia normal:20:3
+    python dns_servidor_local.py --verificar
+"""
+import argparse
+import asyncio
+import collections
+import importlib.util
+import math
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+from dns_comum import percentil
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_BASE_PADRAO = 5301
+ENDERECO_RESPOSTA = "192.0.2.1"  # TEST-NET-1, nunca roteável
+TTL_RESPOSTA = 300
+ATRASOS_REGISTRADOS = 10000  # Últimos atrasos injetados guardados por instância
+
+def parse_distribuicao(texto):
+    """Converte 'tipo:param...' em uma função que sorteia a latência em ms.
+
+    Tipos aceitos: fixa:ms, uniforme:min:max, normal:media:desvio,
+    lognormal:mediana:sigma e exponencial:media.
+    """
+    tipo, *params = texto.split(':')
+    valores = [float(p) for p in params]
+    if tipo == 'fixa' and len(valores) == 1:
+        return lambda rnd: valores[0]
+    if tipo == 'uniforme' and len(valores) == 2:
+        return lambda rnd: rnd.uniform(valores[0], valores[1])
+    if tipo == 'normal' and len(valores) == 2:
+        return lambda rnd: max(0.0, rnd.gauss(valores[0], valores[1]))
+    if tipo == 'lognormal' and len(valores) == 2:
+        mu = math.log(valores[0])
+        return lambda rnd: rnd.lognormvariate(mu, valores[1])
+    if tipo == 'exponencial' and len(valores) == 1:
+        return lambda rnd: rnd.expovariate(1.0 / valores[0])
+    raise ValueError(f"Distribuição de latência inválida: {texto}")
+
+class ConfigInstancia:
+    """Comportamento de uma instância do servidor local."""
+    def __init__(self, latencia="fixa:20", latencia_cache="fixa:1", perda=0.0,
+                 servfail=0.0, ttl_cache=TTL_RESPOSTA, zona_nxdomain=None, semente=None):
+        self.latencia = latencia
+        self.latencia_cache = latencia_cache
+        self.perda = perda
+        self.servfail = servfail
+        self.ttl_cache = ttl_cache
+        self.zona_nxdomain = zona_nxdomain.strip('.').lower() if zona_nxdomain else None
+        self.semente = semente
+
+class InstanciaDNS:
+    """Uma instância escutando UDP e TCP na mesma porta."""
+    def __init__(self, config, host, porta):
+        self.config = config
+        self.host = host
+        self.porta = porta
+        self.rnd = random.Random(config.semente)
+        self.sorteia_latencia = parse_distribuicao(config.latencia)
+        self.sorteia_latencia_cache = parse_distribuicao(config.latencia_cache)
+        self.cache = {}  # nome -> instante em que expira
+        self.contadores = {'consultas': 0, 'descartadas': 0, 'servfail': 0, 'cache': 0}
+        self.atrasos = collections.deque(maxlen=ATRASOS_REGISTRADOS)  # ms, na ordem das respostas
+        self.transporte_udp = None
+        self.servidor_tcp = None
+
+    @property
+    def endereco(self):
+        return f"{self.host}:{self.porta}"
+
+    def preparar_resposta(self, dados):
+        """Decide o destino da consulta; devolve (atraso_s, wire) ou None para descartar."""
+        try:
+            consulta = dns.message.from_wire(dados)
+        except Exception:
+            return None
+        self.contadores['consultas'] += 1
+        if self.rnd.random() < self.config.perda:
+            self.contadores['descartadas'] += 1
+            return None
+
+        resposta = dns.message.make_response(consulta)
+        if not consulta.question:
+            resposta.set_rcode(dns.rcode.FORMERR)
+            return 0.0, resposta.to_wire()
+
+        pergunta = consulta.question[0]
+        nome = pergunta.name.to_text(omit_final_dot=True).lower()
+        agora = time.monotonic()
+        em_cache = self.cache.get(nome, 0) > agora
+        if em_cache:
+            self.contadores['cache'] += 1
+            atraso = self.sorteia_latencia_cache(self.rnd)
+        else:
+            atraso = self.sorteia_latencia(self.rnd)
+        self.atrasos.append(atraso)
+
+        if self.rnd.random() < self.config.servfail:
+            # Falhas de recursão não entram no cache
+            self.contadores['servfail'] += 1
+            resposta.set_rcode(dns.rcode.SERVFAIL)
+        else:
+            self.cache[nome] = agora + self.config.ttl_cache
+            zona = self.config.zona_nxdomain
+            if zona and (nome == zona or nome.endswith('.' + zona)):
+                resposta.set_rcode(dns.rcode.NXDOMAIN)
+            elif pergunta.rdtype == dns.rdatatype.A:
+                resposta.answer.append(
+                    dns.rrset.from_text(pergunta.name, TTL_RESPOSTA, 'IN', 'A', ENDERECO_RESPOSTA))
+        return atraso / 1000.0, resposta.to_wire()
+
+    async def iniciar(self):
+        loop = asyncio.get_running_loop()
+        self.transporte_udp, _ = await loop.create_datagram_endpoint(
+            lambda: _ProtocoloUDP(self), local_addr=(self.host, self.porta))
+        self.servidor_tcp = await asyncio.start_server(self._atender_tcp, self.host, self.porta)
+
+    async def _atender_tcp(self, leitor, escritor):
+        """Atende consultas em pipeline: cada resposta sai quando seu atraso vence."""
+        loop = asyncio.get_running_loop()
+        pendentes = set()
+        try:
+            while True:
+                cabecalho = await leitor.readexactly(2)
+                dados = await leitor.readexactly(struct.unpack('!H', cabecalho)[0])
+                decisao = self.preparar_resposta(dados)
+                if decisao is None:
+                    continue
+                atraso, wire = decisao
+                tarefa = loop.create_task(self._responder_tcp(escritor, atraso, wire))
+                pendentes.add(tarefa)
+                tarefa.add_done_callback(pendentes.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for tarefa in list(pendentes):
+                tarefa.cancel()
+            escritor.close()
+
+    async def _responder_tcp(self, escritor, atraso, wire):
+        await asyncio.sleep(atraso)
+        escritor.write(struct.pack('!H', len(wire)) + wire)
+
+    def fechar(self):
+        if self.transporte_udp:
+            self.transporte_udp.close()
+        if self.servidor_tcp:
+            self.servidor_tcp.close()
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+    def __init__(self, instancia):
+        self.instancia = instancia
+        self.transporte = None
+
+    def connection_made(self, transport):
+        self.transporte = transport
+
+    def datagram_received(self, data, addr):
+        decisao = self.instancia.preparar_resposta(data)
+        if decisao is None:
+            return
+        atraso, wire = decisao
+        asyncio.get_running_loop().call_later(atraso, self.transporte.sendto, wire, addr)
+
+class ServidoresLocais:
+    """Roda várias instâncias em um laço asyncio numa thread própria."""
+    def __init__(self, configs, host=HOST_PADRAO, porta_base=PORTA_BASE_PADRAO):
+        self.instancias = [InstanciaDNS(cfg, host, porta_base + i) for i, cfg in enumerate(configs)]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def enderecos(self):
+        return [inst.endereco for inst in self.instancias]
+
+    def iniciar(self):
+        self.thread.start()
+        for inst in self.instancias:
+            asyncio.run_coroutine_threadsafe(inst.iniciar(), self.loop).result()
+        return self
+
+    def parar(self):
+        for inst in self.instancias:
+            self.loop.call_soon_threadsafe(inst.fechar)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+def carregar_benchmark():
+    """Importa o 'Benchmark DNS.py' (o nome com espaço impede o import normal)."""
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Benchmark DNS.py')
+    spec = importlib.util.spec_from_file_location('benchmark_dns', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def verificar_benchmark(amostras=200, tolerancia_ms=3.0, tolerancia_rel=0.05):
+    """Roda as medições do benchmark contra instâncias locais e confere a precisão.
+
+    Cada percentil medido pelo benchmark é comparado ao mesmo percentil dos
+    atrasos que o servidor de fato injetou, somado ao custo fixo do caminho
+    (medido numa instância com latência zero). Devolve True se tudo ficar
+    dentro da tolerância (o maior entre tolerancia_ms e tolerancia_rel).
+    """
+    bench = carregar_benchmark()
+    casos = [
+        ("fixa 20 ms", ConfigInstancia("fixa:20", semente=1)),
+        ("uniforme 10-30 ms", ConfigInstancia("uniforme:10:30", semente=2)),
+        ("exponencial média 15 ms", ConfigInstancia("exponencial:15", semente=3)),
+        ("lognormal mediana 8 ms", ConfigInstancia("lognormal:8:0.5", semente=4)),
+    ]
+    configs = [ConfigInstancia("fixa:0")] + [cfg for _, cfg in casos]
+    configs.append(ConfigInstancia("fixa:1", servfail=0.3, semente=5))
+    configs.append(ConfigInstancia("fixa:1", perda=0.2, semente=6))
+    configs.append(ConfigInstancia("fixa:30", latencia_cache="fixa:2", zona_nxdomain="example.com", semente=7))
+
+    tudo_ok = True
+
+    def conferir(descricao, medido, esperado, limite):
+        nonlocal tudo_ok
+        ok = abs(medido - esperado) <= limite
+        tudo_ok = tudo_ok and ok
+        print(f"[{'OK' if ok else 'FALHA'}] {descricao}: medido {medido:.2f}, esperado {esperado:.2f} (±{limite:.2f})")
+
+    def medir(servidor, quantidade):
+        resolver = bench.criar_resolver(servidor)
+        return [bench.medir_resolucao(resolver, bench.rotulo_aleatorio("teste.local"))
+                for _ in range(quantidade)]
+
+    def contar_falhas(resolver, quantidade):
+        falhas = 0
+        for _ in range(quantidade):
+            try:
+                bench.medir_resolucao(resolver, bench.rotulo_aleatorio("teste.local"))
+            except Exception:
+                falhas += 1
+        return 100.0 * falhas / quantidade
+
+    with ServidoresLocais(configs) as servidores:
+        instancias = servidores.instancias
+        custo_fixo = percentil(medir(instancias[0].endereco, amostras), 50)
+        print(f"Custo fixo do caminho (p50 com latência zero): {custo_fixo:.2f} ms")
+
+        for (descricao, _), inst in zip(casos, instancias[1:]):
+            inst.atrasos.clear()
+            tempos = medir(inst.endereco, amostras)
+            for p in (50, 95):
+                esperado = percentil(inst.atrasos, p) + custo_fixo
+                conferir(f"{descricao} p{p}", percentil(tempos, p), esperado,
+                         max(tolerancia_ms, esperado * tolerancia_rel))
+
+        # Taxas: tolerância de 10 pontos percentuais
+        taxa = contar_falhas(bench.criar_resolver(instancias[-3].endereco), amostras)
+        conferir("taxa de SERVFAIL (%)", taxa, 30.0, 10.0)
+        resolver = bench.criar_resolver(instancias[-2].endereco)
+        resolver.lifetime = 0.2
+        taxa = contar_falhas(resolver, amostras // 2)
+        conferir("taxa de descarte (%)", taxa, 20.0, 10.0)
+
+        # Modo frio do benchmark: recursão e cache devem sair separados
+        _, media_cache, media_frio = bench.executar_modo_frio(
+            [instancias[-1].endereco], bench.domains, "example.com", amostras // 4)[0]
+        conferir("modo frio - latência com cache (ms)", media_cache, 2.0 + custo_fixo, tolerancia_ms)
+        conferir("modo frio - latência de recursão (ms)", media_frio, 30.0 + custo_fixo,
+                 max(tolerancia_ms, 30.0 * tolerancia_rel))
+
+    print("\nVerificação concluída:", "sucesso" if tudo_ok else "há medições fora da tolerância")
+    return tudo_ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor DNS local para testes de benchmark.")
+    parser.add_argument('--instancias', type=int, default=1, help="Quantidade de instâncias.")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta-base', type=int, default=PORTA_BASE_PADRAO,
+                        help="Porta da primeira instância; as demais usam as seguintes.")
+    parser.add_argument('--latencia', default="fixa:20",
+                        help="Latência de recursão, ex.: fixa:20, uniforme:10:30, normal:20:5.")
+    parser.add_argument('--latencia-cache', default="fixa:1", help="Latência de nomes já em cache.")
+    parser.add_argument('--perda', type=float, default=0.0, help="Fração de consultas descartadas.")
+    parser.add_argument('--servfail', type=float, default=0.0, help="Fração de respostas SERVFAIL.")
+    parser.add_argument('--ttl-cache', type=float, default=TTL_RESPOSTA, help="Validade do cache em segundos.")
+    parser.add_argument('--nxdomain', help="Zona cujos nomes respondem NXDOMAIN (as demais são curinga).")
+    parser.add_argument('--semente', type=int, help="Semente aleatória para resultados reprodutíveis.")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Roda o benchmark contra instâncias locais e confere os percentis.")
+    args = parser.parse_args()
+
+    if args.verificar:
+        sys.exit(0 if verificar_benchmark() else 1)
+
+    configs = [ConfigInstancia(args.latencia, args.latencia_cache, args.perda, args.servfail,
+                               args.ttl_cache, args.nxdomain,
+                               None if args.semente is None else args.semente + i)
+               for i in range(args.instancias)]
+    servidores = ServidoresLocais(configs, args.host, args.porta_base).iniciar()
+    print("Servidores DNS locais ativos:", ",".join(servidores.enderecos))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidores.parar()
+        for inst in servidores.instancias:
+            print(f"{inst.endereco} - {inst.contadores}")
+
+if __name__ == "__main__":
+    main()
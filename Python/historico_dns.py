@@ -0,0 +1,270 @@
+"""Histórico persistente das medições de servidores DNS.
+
+O 'Benchmark DNS.py', o dns_rout.py e o dns_rout2.py gravam aqui as amostras
+de cada execução (latência de DNS, RTT do ping, saltos e perdas), em lotes,
+num banco SQLite local. A cada lote os agregados por hora e por dia são
+atualizados, então as consultas de tendência leem só os agregados, sem
+varrer as amostras brutas.
+
+Exemplos:
+    python historico_dns.py melhores --dias 7 --metrica dns_ms
+    python historico_dns.py tendencia --servidor 1.1.1.1 --metrica rtt_ms --dias 30
+"""
+import argparse
+import socket
+import sqlite3
+import time
+from collections import defaultdict
+
+DB_PATH_PADRAO = "historico_dns.db"
+TAMANHO_LOTE = 500
+
+# Métricas gravadas pelas ferramentas
+METRICAS = {
+    'dns_ms': "Latência de resolução de nomes (ms)",
+    'dns_frio_ms': "Latência de recursão completa, sem cache (ms)",
+    'dns_falha': "Consulta DNS sem resposta (0 ou 1)",
+    'rtt_ms': "RTT médio do ping (ms)",
+    'ping_perda': "Fração de pings sem resposta",
+    'saltos': "Quantidade de saltos até o servidor",
+}
+
+HORA = 3600
+DIA = 86400
+
+def inicio_periodo(horario, tamanho):
+    """Início da hora ou do dia (no fuso local) que contém o horário."""
+    deslocamento = time.localtime(horario).tm_gmtoff
+    return horario - (horario + deslocamento) % tamanho
+
+def inicializar_banco(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ferramenta TEXT NOT NULL,
+            local TEXT NOT NULL,
+            inicio INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS amostras (
+            execucao_id INTEGER NOT NULL REFERENCES execucoes(id),
+            horario INTEGER NOT NULL,
+            servidor TEXT NOT NULL,
+            metrica TEXT NOT NULL,
+            valor REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_amostras_servidor ON amostras(servidor, metrica, horario)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_amostras_execucao ON amostras(execucao_id)")
+    for tabela in ('agregados_hora', 'agregados_dia'):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                local TEXT NOT NULL,
+                metrica TEXT NOT NULL,
+                periodo INTEGER NOT NULL,
+                servidor TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                soma REAL NOT NULL,
+                soma_quadrados REAL NOT NULL,
+                minimo REAL NOT NULL,
+                maximo REAL NOT NULL,
+                PRIMARY KEY (local, metrica, periodo, servidor)
+            )
+        """)
+    conn.commit()
+
+class HistoricoDNS:
+    """Acumula amostras de uma execução e grava em lotes, com os agregados."""
+    def __init__(self, ferramenta, db_path=DB_PATH_PADRAO, local=None, tamanho_lote=TAMANHO_LOTE):
+        self.ferramenta = ferramenta
+        self.local = local or socket.gethostname()
+        self.tamanho_lote = tamanho_lote
+        self.conn = sqlite3.connect(db_path)
+        inicializar_banco(self.conn)
+        self.execucao_id = None
+        self.lote = []
+
+    def registrar(self, servidor, metrica, valor, horario=None):
+        if valor is None or valor == float('inf'):
+            return
+        self.lote.append((int(horario if horario is not None else time.time()), servidor, metrica, float(valor)))
+        if len(self.lote) >= self.tamanho_lote:
+            self.gravar()
+
+    def gravar(self):
+        """Grava o lote pendente e atualiza os agregados numa única transação."""
+        if not self.lote:
+            return
+        agregados = {'agregados_hora': defaultdict(lambda: [0, 0.0, 0.0, float('inf'), float('-inf')]),
+                     'agregados_dia': defaultdict(lambda: [0, 0.0, 0.0, float('inf'), float('-inf')])}
+        for horario, servidor, metrica, valor in self.lote:
+            for tabela, periodo in (('agregados_hora', inicio_periodo(horario, HORA)),
+                                    ('agregados_dia', inicio_periodo(horario, DIA))):
+                ag = agregados[tabela][(metrica, periodo, servidor)]
+                ag[0] += 1
+                ag[1] += valor
+                ag[2] += valor * valor
+                ag[3] = min(ag[3], valor)
+                ag[4] = max(ag[4], valor)
+
+        with self.conn:
+            if self.execucao_id is None:
+                cursor = self.conn.execute(
+                    "INSERT INTO execucoes (ferramenta, local, inicio) VALUES (?, ?, ?)",
+                    (self.ferramenta, self.local, self.lote[0][0]))
+                self.execucao_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO amostras (execucao_id, horario, servidor, metrica, valor) VALUES (?, ?, ?, ?, ?)",
+                [(self.execucao_id, *amostra) for amostra in self.lote])
+            for tabela, linhas in agregados.items():
+                self.conn.executemany(f"""
+                    INSERT INTO {tabela} (local, metrica, periodo, servidor, n, soma, soma_quadrados, minimo, maximo)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (local, metrica, periodo, servidor) DO UPDATE SET
+                        n = n + excluded.n,
+                        soma = soma + excluded.soma,
+                        soma_quadrados = soma_quadrados + excluded.soma_quadrados,
+                        minimo = MIN(minimo, excluded.minimo),
+                        maximo = MAX(maximo, excluded.maximo)
+                """, [(self.local, metrica, periodo, servidor, *valores)
+                      for (metrica, periodo, servidor), valores in linhas.items()])
+        self.lote = []
+
+    def fechar(self):
+        try:
+            self.gravar()
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar o histórico: {e}")
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+def _agregar_intervalo(conn, local, metrica, inicio, fim, servidor=None):
+    """Soma os agregados no intervalo lendo dias inteiros da tabela diária e as pontas da horária."""
+    primeiro_dia = inicio_periodo(inicio, DIA)
+    if primeiro_dia < inicio:
+        primeiro_dia = inicio_periodo(primeiro_dia + DIA + HORA, DIA)
+    ultimo_dia = inicio_periodo(fim, DIA)
+    filtro_servidor = "AND servidor = ?" if servidor else ""
+    extra = (servidor,) if servidor else ()
+    consultas = []
+    if primeiro_dia < ultimo_dia:
+        consultas.append(("agregados_dia", primeiro_dia, ultimo_dia))
+        consultas.append(("agregados_hora", inicio_periodo(inicio, HORA), primeiro_dia))
+        consultas.append(("agregados_hora", ultimo_dia, fim))
+    else:
+        consultas.append(("agregados_hora", inicio_periodo(inicio, HORA), fim))
+
+    totais = defaultdict(lambda: [0, 0.0, 0.0, float('inf'), float('-inf')])
+    for tabela, de, ate in consultas:
+        linhas = conn.execute(f"""
+            SELECT servidor, SUM(n), SUM(soma), SUM(soma_quadrados), MIN(minimo), MAX(maximo)
+            FROM {tabela}
+            WHERE local = ? AND metrica = ? AND periodo >= ? AND periodo < ? {filtro_servidor}
+            GROUP BY servidor
+        """, (local, metrica, de, ate, *extra))
+        for srv, n, soma, soma_q, minimo, maximo in linhas:
+            t = totais[srv]
+            t[0] += n
+            t[1] += soma
+            t[2] += soma_q
+            t[3] = min(t[3], minimo)
+            t[4] = max(t[4], maximo)
+    return totais
+
+def melhores(db_path=DB_PATH_PADRAO, metrica='dns_ms', dias=7, local=None, amostras_minimas=1):
+    """Ranking dos servidores pela média da métrica nos últimos `dias` dias neste local.
+
+    Devolve [(servidor, média, desvio, mínimo, máximo, n)], do melhor para o pior.
+    """
+    local = local or socket.gethostname()
+    fim = int(time.time()) + 1
+    conn = sqlite3.connect(db_path)
+    try:
+        inicializar_banco(conn)
+        totais = _agregar_intervalo(conn, local, metrica, fim - int(dias * DIA), fim)
+    finally:
+        conn.close()
+    resultado = []
+    for servidor, (n, soma, soma_q, minimo, maximo) in totais.items():
+        if n < amostras_minimas:
+            continue
+        media = soma / n
+        desvio = max(0.0, soma_q / n - media * media) ** 0.5
+        resultado.append((servidor, media, desvio, minimo, maximo, n))
+    resultado.sort(key=lambda x: x[1])
+    return resultado
+
+def tendencia(servidor, db_path=DB_PATH_PADRAO, metrica='dns_ms', dias=7, local=None, por_hora=False):
+    """Série da média da métrica por dia (ou por hora) de um servidor: [(periodo, média, n)]."""
+    local = local or socket.gethostname()
+    tabela, tamanho = ('agregados_hora', HORA) if por_hora else ('agregados_dia', DIA)
+    inicio = inicio_periodo(int(time.time() - dias * DIA), tamanho)
+    conn = sqlite3.connect(db_path)
+    try:
+        inicializar_banco(conn)
+        linhas = conn.execute(f"""
+            SELECT periodo, soma / n, n FROM {tabela}
+            WHERE local = ? AND metrica = ? AND servidor = ? AND periodo >= ?
+            ORDER BY periodo
+        """, (local, metrica, servidor, inicio)).fetchall()
+    finally:
+        conn.close()
+    return linhas
+
+def adicionar_argumentos(parser):
+    """Opções de histórico compartilhadas pelas ferramentas de DNS."""
+    parser.add_argument('--historico', default=DB_PATH_PADRAO,
+                        help=f"Banco SQLite onde as medições são acumuladas (padrão: {DB_PATH_PADRAO}).")
+    parser.add_argument('--sem-historico', action='store_true', help="Não grava as medições desta execução.")
+    parser.add_argument('--local', help="Nome do local da medição (padrão: nome da máquina).")
+
+def abrir(ferramenta, args):
+    """Abre o histórico conforme as opções da linha de comando, ou None se desativado."""
+    if args.sem_historico:
+        return None
+    try:
+        return HistoricoDNS(ferramenta, args.historico, args.local)
+    except sqlite3.Error as e:
+        print(f"Histórico desativado: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas ao histórico de medições de servidores DNS.")
+    parser.add_argument('--historico', default=DB_PATH_PADRAO, help="Banco SQLite do histórico.")
+    parser.add_argument('--local', help="Local das medições (padrão: nome da máquina).")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_melhores = sub.add_parser('melhores', help="Melhores servidores no período.")
+    p_melhores.add_argument('--metrica', choices=sorted(METRICAS), default='dns_ms')
+    p_melhores.add_argument('--dias', type=float, default=7)
+    p_melhores.add_argument('--minimo', type=int, default=1, help="Amostras mínimas para entrar no ranking.")
+
+    p_tendencia = sub.add_parser('tendencia', help="Evolução de um servidor no período.")
+    p_tendencia.add_argument('--servidor', required=True)
+    p_tendencia.add_argument('--metrica', choices=sorted(METRICAS), default='dns_ms')
+    p_tendencia.add_argument('--dias', type=float, default=7)
+    p_tendencia.add_argument('--por-hora', action='store_true', help="Uma linha por hora em vez de por dia.")
+    args = parser.parse_args()
+
+    if args.comando == 'melhores':
+        ranking = melhores(args.historico, args.metrica, args.dias, args.local, args.minimo)
+        print(f"\n{METRICAS[args.metrica]} - últimos {args.dias:g} dias:")
+        for i, (servidor, media, desvio, minimo, maximo, n) in enumerate(ranking, start=1):
+            print(f"{i}. {servidor} - média {media:.2f} ± {desvio:.2f} (min {minimo:.2f}, max {maximo:.2f}, {n} amostras)")
+        print("\n" + ",".join(servidor for servidor, *_ in ranking))
+    else:
+        formato = '%Y-%m-%d %H:00' if args.por_hora else '%Y-%m-%d'
+        print(f"\n{METRICAS[args.metrica]} - {args.servidor}:")
+        for periodo, media, n in tendencia(args.servidor, args.historico, args.metrica, args.dias,
+                                           args.local, args.por_hora):
+            print(f"{time.strftime(formato, time.localtime(periodo))} - {media:.2f} ({n} amostras)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Sondagem distribuída: vários agentes sondam, um coletor decide.
+
+Um único indinet.py não distingue "o alvo caiu" de "o nosso link caiu". Neste
+modo, agentes em outros hosts (ou outros processos) sondam os alvos e mandam
+os resultados em lotes UDP compactos ao coletor, que só considera um alvo
+fora do ar quando a maioria dos pontos de vista que o sondam concorda. O
+veredito consolidado alimenta um MonitorIP comum, então banco, SLA,
+notificações e métricas funcionam como no modo local.
+
+- Cada agente manda um heartbeat a cada INTERVALO_HEARTBEAT segundos; sem
+  heartbeat por TIMEOUT_AGENTE segundos ele é dado como morto.
+- Os alvos são divididos por hashing de rendezvous: cada alvo fica com
+  REPLICAS agentes (ou todos, se houver menos). Quando um agente entra ou
+  morre, só os alvos dele mudam de dono; a nova divisão vai na resposta ao
+  heartbeat.
+- Agente e coletor precisam da mesma lista de alvos (indinet.IPS); os
+  pacotes levam o CRC32 da lista e os de lista diferente são descartados.
+
+Pacotes (little-endian), todos com o cabeçalho '<4sBI' (MAGICO, tipo, CRC dos alvos):
+    HEARTBEAT    agente -> coletor   nome (uint8 tamanho + texto)
+    RESULTADOS   agente -> coletor   nome, seq uint32, n uint16, n x (índice uint16, RTT float32; NaN = perda)
+    ATRIBUICAO   coletor -> agente   geração uint32, n uint16, n x índice uint16
+
+Exemplos:
+    python distribuido.py coletor --porta 9102
+    python distribuido.py agente --coletor 10.0.0.5:9102 --nome filial-sp
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import math
+import signal
+import socket
+import statistics
+import struct
+import time
+import zlib
+
+import indinet
+from sonda_icmp import SondaICMP
+
+PORTA_COLETOR = 9102
+INTERVALO_HEARTBEAT = 1.0
+TIMEOUT_AGENTE = 5.0          # Sem heartbeat por este tempo, o agente é removido da divisão
+INTERVALO_LOTE = 1.0          # Segundos máximos que um resultado espera no agente
+MAX_REGISTROS = 200           # Resultados por datagrama (~1,2 KB, cabe num pacote sem fragmentar)
+REPLICAS = 3                  # Agentes por alvo
+VALIDADE_VOTO = 6.0           # Um voto mais antigo que isso não conta
+FALHAS_VOTO = 2               # Perdas seguidas para um agente votar "fora do ar" (como no indinet.py)
+SUSPEITA_UPLINK = 0.8         # Fração dos alvos de um agente vista fora do ar, contra o quórum, para suspeitar do link dele
+MIN_VOTOS_SUSPEITA = 5
+
+MAGICO = b'IDN1'
+HEARTBEAT, RESULTADOS, ATRIBUICAO = 1, 2, 3
+CABECALHO = struct.Struct('<4sBI')
+REGISTRO = struct.Struct('<Hf')
+
+def versao_alvos(ips):
+    return zlib.crc32('\n'.join(ips).encode('utf-8'))
+
+def _empacotar_nome(nome):
+    dados = nome.encode('utf-8')[:255]
+    return bytes([len(dados)]) + dados
+
+def _ler_nome(dados, pos):
+    tamanho = dados[pos]
+    return dados[pos + 1:pos + 1 + tamanho].decode('utf-8', 'replace'), pos + 1 + tamanho
+
+def pontuacao(agente, ip):
+    # Estável entre processos (o hash() do Python muda a cada execução); o CRC32
+    # é linear demais para rendezvous e deixaria as partes desiguais
+    return int.from_bytes(hashlib.blake2b(f"{agente}|{ip}".encode('utf-8'), digest_size=8).digest(), 'little')
+
+def dividir(agentes, ips, replicas=REPLICAS):
+    """{agente: [índices dos alvos]} por hashing de rendezvous."""
+    divisao = {agente: [] for agente in agentes}
+    if not agentes:
+        return divisao
+    for indice, ip in enumerate(ips):
+        donos = sorted(agentes, key=lambda agente: pontuacao(agente, ip), reverse=True)[:replicas]
+        for agente in donos:
+            divisao[agente].append(indice)
+    return divisao
+
+class _Protocolo(asyncio.DatagramProtocol):
+    def __init__(self, receber):
+        self.receber = receber
+
+    def datagram_received(self, dados, endereco):
+        try:
+            self.receber(dados, endereco)
+        except (struct.error, IndexError, ValueError) as e:
+            logging.debug(f"Datagrama inválido de {endereco}: {e}")
+
+class Agente:
+    """Sonda a parte dos alvos atribuída pelo coletor e manda os resultados em lotes.
+
+    `ping` (opcional) é uma corrotina ip -> RTT ou None usada no lugar do ICMP.
+    """
+    def __init__(self, nome, coletor, ips=None, ping=None):
+        self.nome = nome
+        self.coletor = coletor
+        self.ips = list(indinet.IPS if ips is None else ips)
+        self.versao = versao_alvos(self.ips)
+        self.ping = ping
+        self.sonda = None
+        self.transporte = None
+        self.running = True
+        self.geracao = None
+        self.tarefas = {}           # índice -> tarefa que sonda o alvo
+        self.resultados = []        # (índice, RTT ou NaN) ainda não enviados
+        self.seq = 0
+        self.janela = None
+
+    def receber(self, dados, endereco):
+        magico, tipo, versao = CABECALHO.unpack_from(dados)
+        if magico != MAGICO or tipo != ATRIBUICAO or versao != self.versao:
+            return
+        geracao, n = struct.unpack_from('<IH', dados, CABECALHO.size)
+        if geracao == self.geracao:
+            return
+        self.geracao = geracao
+        indices = set(struct.unpack_from(f'<{n}H', dados, CABECALHO.size + 6))
+        for indice in set(self.tarefas) - indices:
+            self.tarefas.pop(indice).cancel()
+        for indice in indices - set(self.tarefas):
+            self.tarefas[indice] = asyncio.create_task(self.sondar(indice))
+        logging.info(f"Agente {self.nome}: divisão {geracao}, {len(indices)} alvos")
+
+    async def _ping(self, ip):
+        if self.ping is not None:
+            return await self.ping(ip)
+        if self.sonda is not None:
+            return await self.sonda.ping(ip, indinet.PING_TIMEOUT, indinet.PING_PACKET_SIZE)
+        return await asyncio.to_thread(indinet.MonitorIP.fazer_ping, ip)
+
+    async def sondar(self, indice):
+        ip = self.ips[indice]
+        # Fase fixa por IP dentro do intervalo, para as sondas não saírem juntas
+        proxima = time.monotonic() + (pontuacao(self.nome, ip) % 1000) / 1000 * indinet.PING_INTERVAL
+        while self.running:
+            await asyncio.sleep(max(0.0, proxima - time.monotonic()))
+            async with self.janela:
+                rtt = await self._ping(ip)
+            self.resultados.append((indice, math.nan if rtt is None else rtt))
+            if len(self.resultados) >= MAX_REGISTROS:
+                self.enviar_resultados()
+            proxima = max(proxima + indinet.PING_INTERVAL, time.monotonic())
+
+    def enviar_heartbeat(self):
+        self.transporte.sendto(CABECALHO.pack(MAGICO, HEARTBEAT, self.versao) + _empacotar_nome(self.nome))
+
+    def enviar_resultados(self):
+        cabecalho = CABECALHO.pack(MAGICO, RESULTADOS, self.versao) + _empacotar_nome(self.nome)
+        while self.resultados:
+            lote, self.resultados = self.resultados[:MAX_REGISTROS], self.resultados[MAX_REGISTROS:]
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            corpo = b''.join(REGISTRO.pack(indice, rtt) for indice, rtt in lote)
+            self.transporte.sendto(cabecalho + struct.pack('<IH', self.seq, len(lote)) + corpo)
+
+    async def executar(self):
+        loop = asyncio.get_running_loop()
+        self.janela = asyncio.Semaphore(indinet.MAX_SONDAS_EM_VOO)
+        self.transporte, _ = await loop.create_datagram_endpoint(
+            lambda: _Protocolo(self.receber), remote_addr=self.coletor)
+        if self.ping is None:
+            self.sonda = SondaICMP.abrir()
+            if self.sonda is None:
+                logging.info("Socket ICMP indisponível; usando o comando ping do sistema.")
+        proximo_heartbeat = 0.0
+        try:
+            while self.running:
+                if time.monotonic() >= proximo_heartbeat:
+                    self.enviar_heartbeat()
+                    proximo_heartbeat = time.monotonic() + INTERVALO_HEARTBEAT
+                self.enviar_resultados()
+                await asyncio.sleep(min(INTERVALO_LOTE, INTERVALO_HEARTBEAT))
+        finally:
+            for tarefa in self.tarefas.values():
+                tarefa.cancel()
+            await asyncio.gather(*self.tarefas.values(), return_exceptions=True)
+            self.tarefas.clear()
+            self.enviar_resultados()
+            self.transporte.close()
+            if self.sonda is not None:
+                self.sonda.fechar()
+                self.sonda = None
+
+class Voto:
+    __slots__ = ('recebido', 'rtt', 'falhas')
+
+    def __init__(self):
+        self.recebido = 0.0     # time.monotonic() do coletor na chegada
+        self.rtt = None         # Último RTT respondido
+        self.falhas = 0         # Perdas seguidas
+
+class AgenteRemoto:
+    __slots__ = ('nome', 'endereco', 'visto', 'seq', 'lotes_perdidos')
+
+    def __init__(self, nome, endereco):
+        self.nome = nome
+        self.endereco = endereco
+        self.visto = time.monotonic()
+        self.seq = None
+        self.lotes_perdidos = 0
+
+class Coletor:
+    """Recebe os resultados dos agentes e alimenta o MonitorIP com o veredito do quórum."""
+    def __init__(self, porta=PORTA_COLETOR, host='0.0.0.0', monitor=None, replicas=REPLICAS):
+        self.endereco = (host, porta)
+        self.monitor = monitor if monitor is not None else indinet.MonitorIP()
+        self.ips = self.monitor.ips
+        self.versao = versao_alvos(self.ips)
+        self.replicas = replicas
+        self.agentes = {}                          # nome -> AgenteRemoto
+        self.votos = [{} for _ in self.ips]        # por alvo: nome do agente -> Voto
+        self.divisao = {}
+        self.donos = [[] for _ in self.ips]        # por alvo: agentes que devem sondá-lo
+        # Semeada pelo relógio: um coletor reiniciado não repete a geração que o agente guardou
+        self.geracao = int(time.time()) & 0xFFFFFFFF
+        self.ultima_avaliacao = float('-inf')      # time.monotonic() da avaliação anterior
+        self.sem_cobertura = set(range(len(self.ips)))   # Índices de alvos sem voto válido
+        self.suspeitos = set()                     # Agentes que parecem estar sem link
+        self.transporte = None
+        self.running = True
+
+    def receber(self, dados, endereco):
+        magico, tipo, versao = CABECALHO.unpack_from(dados)
+        if magico != MAGICO:
+            return
+        nome, pos = _ler_nome(dados, CABECALHO.size)
+        if versao != self.versao:
+            logging.warning(f"Agente {nome} ({endereco[0]}) com lista de alvos diferente; ignorado")
+            return
+        agente = self.agentes.get(nome)
+        if agente is None:
+            agente = self.agentes[nome] = AgenteRemoto(nome, endereco)
+            logging.info(f"Agente {nome} conectado de {endereco[0]}:{endereco[1]}")
+            self.redividir()
+        agente.visto = time.monotonic()
+        agente.endereco = endereco
+        if tipo == HEARTBEAT:
+            self.enviar_divisao(agente)
+        elif tipo == RESULTADOS:
+            seq, n = struct.unpack_from('<IH', dados, pos)
+            if agente.seq is not None and seq != (agente.seq + 1) & 0xFFFFFFFF:
+                agente.lotes_perdidos += (seq - agente.seq - 1) & 0xFFFFFFFF
+                logging.warning(f"Agente {nome}: {agente.lotes_perdidos} lotes de resultados perdidos até agora")
+            agente.seq = seq
+            agora = agente.visto
+            for indice, rtt in REGISTRO.iter_unpack(dados[pos + 6:pos + 6 + n * REGISTRO.size]):
+                if indice >= len(self.ips):
+                    continue
+                voto = self.votos[indice].get(nome)
+                if voto is None:
+                    voto = self.votos[indice][nome] = Voto()
+                voto.recebido = agora
+                if rtt != rtt:
+                    voto.falhas += 1
+                else:
+                    voto.falhas = 0
+                    voto.rtt = rtt
+
+    def enviar_divisao(self, agente):
+        indices = self.divisao.get(agente.nome, [])
+        self.transporte.sendto(CABECALHO.pack(MAGICO, ATRIBUICAO, self.versao)
+                               + struct.pack(f'<IH{len(indices)}H', self.geracao, len(indices), *indices),
+                               agente.endereco)
+
+    def redividir(self):
+        self.divisao = dividir(sorted(self.agentes), self.ips, self.replicas)
+        self.donos = [[] for _ in self.ips]
+        for nome, indices in self.divisao.items():
+            for indice in indices:
+                self.donos[indice].append(nome)
+        self.geracao = (self.geracao + 1) & 0xFFFFFFFF
+        logging.info(f"Divisão {self.geracao}: " + ', '.join(
+            f"{nome}={len(indices)}" for nome, indices in self.divisao.items()))
+        if self.transporte is not None:
+            for agente in self.agentes.values():
+                self.enviar_divisao(agente)
+
+    def avaliar(self):
+        """Remove agentes mortos e passa o veredito de cada alvo ao monitor."""
+        agora = time.monotonic()
+        mortos = [nome for nome, agente in self.agentes.items() if agora - agente.visto > TIMEOUT_AGENTE]
+        for nome in mortos:
+            logging.warning(f"Agente {nome} sem heartbeat há {TIMEOUT_AGENTE:g}s; alvos redistribuídos")
+            del self.agentes[nome]
+            self.suspeitos.discard(nome)
+        if mortos:
+            self.redividir()
+
+        contra_quorum = {nome: [0, 0] for nome in self.agentes}   # nome -> [votos fora do ar contra o quórum, votos]
+        for indice, ip in enumerate(self.ips):
+            votos = self.votos[indice]
+            validos = [(nome, votos[nome]) for nome in self.donos[indice]
+                       if nome in votos and agora - votos[nome].recebido <= VALIDADE_VOTO]
+            if not validos:
+                if indice not in self.sem_cobertura and self.agentes:
+                    logging.warning(f"Nenhum agente sondando {ip}")
+                self.sem_cobertura.add(indice)
+                continue
+            self.sem_cobertura.discard(indice)
+            # Sem resultado novo desde a avaliação anterior: o último voto já foi contado
+            if all(voto.recebido <= self.ultima_avaliacao for _, voto in validos):
+                continue
+            for nome, _ in validos:
+                contra_quorum[nome][1] += 1
+            # Quórum sobre os donos do alvo, não sobre quem já votou: um dono
+            # recém-atribuído que ainda não respondeu não deixa um voto isolado decidir
+            fora = [nome for nome, voto in validos if voto.falhas >= FALHAS_VOTO]
+            if len(fora) > len(self.donos[indice]) // 2:
+                self.monitor.registrar_resultado(ip, None)
+                continue
+            for nome in fora:
+                contra_quorum[nome][0] += 1
+            rtts = [voto.rtt for _, voto in validos if voto.falhas < FALHAS_VOTO and voto.rtt is not None]
+            if rtts:
+                self.monitor.registrar_resultado(ip, statistics.median(rtts))
+        self.ultima_avaliacao = agora
+
+        # Um agente que vê quase tudo fora do ar enquanto os outros não provavelmente perdeu o próprio link
+        for nome, (contra, votos) in contra_quorum.items():
+            suspeito = votos >= MIN_VOTOS_SUSPEITA and contra >= SUSPEITA_UPLINK * votos
+            if suspeito and nome not in self.suspeitos:
+                logging.warning(f"Agente {nome} vê {contra} de {votos} alvos fora do ar contra o quórum; "
+                                f"provável falha no link do agente")
+                self.suspeitos.add(nome)
+            elif not suspeito and nome in self.suspeitos:
+                logging.info(f"Agente {nome} voltou a concordar com o quórum")
+                self.suspeitos.discard(nome)
+
+    async def servir(self):
+        loop = asyncio.get_running_loop()
+        self.transporte, _ = await loop.create_datagram_endpoint(
+            lambda: _Protocolo(self.receber), local_addr=self.endereco)
+        logging.info(f"Coletor ouvindo em UDP {self.endereco[0]}:{self.endereco[1]}")
+        try:
+            proxima = time.monotonic()
+            while self.running:
+                proxima += indinet.PING_INTERVAL
+                await asyncio.sleep(max(0.0, proxima - time.monotonic()))
+                self.avaliar()
+                if self.monitor.metricas:
+                    self.monitor.metricas.publicar(self.monitor.copiar_estado())
+        finally:
+            self.transporte.close()
+
+    def executar(self):
+        def parar(signum, frame):
+            logging.info("🛑 Recebido sinal de interrupção. Encerrando...")
+            self.running = False
+        signal.signal(signal.SIGINT, parar)
+        signal.signal(signal.SIGTERM, parar)
+        if self.monitor.metricas:
+            self.monitor.metricas.iniciar()
+        try:
+            asyncio.run(self.servir())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.monitor.parar_consumidores()
+            if self.monitor.metricas:
+                self.monitor.metricas.parar()
+
+def _endereco(texto):
+    host, _, porta = texto.rpartition(':')
+    if not host:
+        raise argparse.ArgumentTypeError("use HOST:PORTA")
+    return host, int(porta)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sondagem distribuída do indinet.py (agentes e coletor).")
+    sub = parser.add_subparsers(dest='modo', required=True)
+    coletor = sub.add_parser('coletor', help="Recebe os resultados dos agentes e decide por quórum.")
+    coletor.add_argument('--host', default='0.0.0.0')
+    coletor.add_argument('--porta', type=int, default=PORTA_COLETOR)
+    coletor.add_argument('--replicas', type=int, default=REPLICAS, help="Agentes sondando cada alvo.")
+    coletor.add_argument('--metricas-porta', type=int,
+                         help="Expõe /metrics e /estado.json em 127.0.0.1 nesta porta (padrão: desativado).")
+    agente = sub.add_parser('agente', help="Sonda a parte dos alvos atribuída pelo coletor.")
+    agente.add_argument('--coletor', type=_endereco, required=True, help="HOST:PORTA do coletor")
+    agente.add_argument('--nome', default=socket.gethostname())
+    args = parser.parse_args()
+
+    if args.modo == 'coletor':
+        Coletor(args.porta, args.host, indinet.MonitorIP(args.metricas_porta), args.replicas).executar()
+        return
+    agente = Agente(args.nome, args.coletor)
+
+    def parar(signum, frame):
+        agente.running = False
+    signal.signal(signal.SIGINT, parar)
+    signal.signal(signal.SIGTERM, parar)
+    logging.info(f"🚀 Agente {args.nome} enviando para {args.coletor[0]}:{args.coletor[1]}")
+    try:
+        asyncio.run(agente.executar())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Estatísticas de latência em fluxo, uma amostra por vez.
+
+Cada componente atualiza em O(1) e ocupa memória limitada por alvo:
+
+- EWMA: média móvel exponencial do RTT (alfa 1/8, como o SRTT do TCP);
+- Jitter: variação entre RTTs consecutivos no estilo da RFC 3550
+  (J += (|D| - J) / 16);
+- JanelaPerdas: taxa de perda das últimas N sondas (anel de bytes com
+  contagem corrente);
+- JanelaDeslizante: últimas N sondas num anel de floats com soma, soma dos
+  quadrados e filas monotônicas, para média, desvio, mínimo e máximo da
+  janela sem percorrê-la;
+- SketchQuantis: sketch logarítmico (DDSketch) com erro relativo fixo nos
+  quantis (p50/p95/p99), mesclável: somar sketches de minutos, horas ou
+  dias dá o sketch do período inteiro.
+
+EstatisticasAlvo junta os quatro e é o que o indinet.py e o
+ping_monitor_light.py guardam por IP.
+"""
+import math
+from array import array
+from collections import deque
+
+ALFA_EWMA = 0.125
+GANHO_JITTER = 1 / 16
+JANELA_PERDAS = 300          # Sondas consideradas na taxa de perda
+ERRO_QUANTIS = 0.01          # Erro relativo máximo dos quantis (1%)
+MAX_BALDES = 1024            # Limite de baldes por sketch (os menores são fundidos)
+VALOR_MINIMO = 1e-3          # RTTs abaixo disso (ms) caem no balde zero
+QUANTIS = (0.5, 0.95, 0.99)
+
+class EWMA:
+    __slots__ = ('alfa', 'valor')
+
+    def __init__(self, alfa=ALFA_EWMA):
+        self.alfa = alfa
+        self.valor = None
+
+    def adicionar(self, x):
+        if self.valor is None:
+            self.valor = x
+        else:
+            self.valor += self.alfa * (x - self.valor)
+
+class Jitter:
+    """Jitter entre respostas consecutivas (perdas não entram na diferença)."""
+    __slots__ = ('valor', 'anterior')
+
+    def __init__(self):
+        self.valor = 0.0
+        self.anterior = None
+
+    def adicionar(self, rtt):
+        if self.anterior is not None:
+            self.valor += (abs(rtt - self.anterior) - self.valor) * GANHO_JITTER
+        self.anterior = rtt
+
+class JanelaPerdas:
+    __slots__ = ('anel', 'posicao', 'preenchidas', 'perdas')
+
+    def __init__(self, tamanho=JANELA_PERDAS):
+        self.anel = bytearray(tamanho)
+        self.posicao = 0
+        self.preenchidas = 0
+        self.perdas = 0
+
+    def adicionar(self, perdeu):
+        perdeu = 1 if perdeu else 0
+        if self.preenchidas == len(self.anel):
+            self.perdas -= self.anel[self.posicao]
+        else:
+            self.preenchidas += 1
+        self.anel[self.posicao] = perdeu
+        self.perdas += perdeu
+        self.posicao = (self.posicao + 1) % len(self.anel)
+
+    def taxa(self):
+        """Fração perdida na janela (None sem sondas)."""
+        return self.perdas / self.preenchidas if self.preenchidas else None
+
+class JanelaDeslizante:
+    """Últimas `capacidade` sondas com estatísticas da janela em O(1) por amostra.
+
+    O anel é um array de doubles de tamanho fixo (perda = NaN). Soma e soma
+    dos quadrados andam com a janela, com compensação de Neumaier para o
+    arredondamento não acumular em janelas longas; mínimo e máximo vêm de
+    filas monotônicas com a sequência das amostras candidatas.
+    """
+    __slots__ = ('anel', 'sequencia', 'validas', 'perdas', 'soma', 'soma_quadrados', 'fila_min', 'fila_max')
+
+    def __init__(self, capacidade):
+        self.anel = array('d', [math.nan]) * capacidade
+        self.sequencia = 0      # Amostras já recebidas (a próxima vai em sequencia % capacidade)
+        self.validas = 0
+        self.perdas = 0
+        self.soma = (0.0, 0.0)            # (total, compensação)
+        self.soma_quadrados = (0.0, 0.0)
+        self.fila_min = deque()
+        self.fila_max = deque()
+
+    def __len__(self):
+        return min(self.sequencia, len(self.anel))
+
+    @staticmethod
+    def _somar(soma, x):
+        total, compensacao = soma
+        t = total + x
+        if abs(total) >= abs(x):
+            compensacao += (total - t) + x
+        else:
+            compensacao += (x - t) + total
+        return t, compensacao
+
+    def adicionar(self, valor):
+        """Uma sonda: valor em ms, ou None se perdida."""
+        anel = self.anel
+        capacidade = len(anel)
+        posicao = self.sequencia % capacidade
+        if self.sequencia >= capacidade:
+            antigo = anel[posicao]
+            if antigo != antigo:
+                self.perdas -= 1
+            else:
+                self.validas -= 1
+                self.soma = self._somar(self.soma, -antigo)
+                self.soma_quadrados = self._somar(self.soma_quadrados, -antigo * antigo)
+        # A amostra que sai da janela sai também das filas
+        inicio = self.sequencia + 1 - capacidade
+        if self.fila_min and self.fila_min[0] < inicio:
+            self.fila_min.popleft()
+        if self.fila_max and self.fila_max[0] < inicio:
+            self.fila_max.popleft()
+        if valor is None:
+            anel[posicao] = math.nan
+            self.perdas += 1
+        else:
+            valor = float(valor)
+            anel[posicao] = valor
+            self.validas += 1
+            self.soma = self._somar(self.soma, valor)
+            self.soma_quadrados = self._somar(self.soma_quadrados, valor * valor)
+            sequencia = self.sequencia
+            while self.fila_min and anel[self.fila_min[-1] % capacidade] >= valor:
+                self.fila_min.pop()
+            self.fila_min.append(sequencia)
+            while self.fila_max and anel[self.fila_max[-1] % capacidade] <= valor:
+                self.fila_max.pop()
+            self.fila_max.append(sequencia)
+        self.sequencia += 1
+
+    def minimo(self):
+        return self.anel[self.fila_min[0] % len(self.anel)] if self.fila_min else None
+
+    def maximo(self):
+        return self.anel[self.fila_max[0] % len(self.anel)] if self.fila_max else None
+
+    def media(self):
+        return sum(self.soma) / self.validas if self.validas else None
+
+    def desvio(self):
+        """Desvio padrão populacional das sondas válidas da janela."""
+        if not self.validas:
+            return None
+        media = sum(self.soma) / self.validas
+        return math.sqrt(max(0.0, sum(self.soma_quadrados) / self.validas - media * media))
+
+    def valores(self):
+        """Sondas da janela, da mais antiga à mais nova (None = perda)."""
+        capacidade = len(self.anel)
+        inicio = max(0, self.sequencia - capacidade)
+        return [None if x != x else x
+                for x in (self.anel[i % capacidade] for i in range(inicio, self.sequencia))]
+
+class SketchQuantis:
+    """DDSketch: baldes de largura logarítmica, erro relativo de até `erro` em qualquer quantil.
+
+    O balde i cobre (gama^(i-1), gama^i]; a contagem fica num dicionário
+    esparso (latências de um alvo ocupam poucas dezenas de baldes). Passando
+    de `max_baldes`, os menores baldes são fundidos, o que só afeta a
+    precisão dos quantis mais baixos.
+    """
+    __slots__ = ('erro', 'gama', 'log_gama', 'max_baldes', 'baldes', 'zeros', 'contagem', 'minimo', 'maximo')
+
+    def __init__(self, erro=ERRO_QUANTIS, max_baldes=MAX_BALDES):
+        self.erro = erro
+        self.gama = (1 + erro) / (1 - erro)
+        self.log_gama = math.log(self.gama)
+        self.max_baldes = max_baldes
+        self.baldes = {}
+        self.zeros = 0
+        self.contagem = 0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+
+    def adicionar(self, x, vezes=1):
+        if x <= VALOR_MINIMO:
+            self.zeros += vezes
+        else:
+            indice = math.ceil(math.log(x) / self.log_gama)
+            self.baldes[indice] = self.baldes.get(indice, 0) + vezes
+            if len(self.baldes) > self.max_baldes:
+                self._fundir()
+        self.contagem += vezes
+        if x < self.minimo:
+            self.minimo = x
+        if x > self.maximo:
+            self.maximo = x
+
+    def _fundir(self):
+        indices = sorted(self.baldes)
+        excesso = len(indices) - self.max_baldes
+        destino = indices[excesso]
+        for indice in indices[:excesso]:
+            self.baldes[destino] += self.baldes.pop(indice)
+
+    def mesclar(self, outro):
+        """Soma `outro` (mesmo erro) a este sketch."""
+        if outro.gama != self.gama:
+            raise ValueError("Sketches com erro relativo diferente não podem ser mesclados")
+        for indice, contagem in outro.baldes.items():
+            self.baldes[indice] = self.baldes.get(indice, 0) + contagem
+        if len(self.baldes) > self.max_baldes:
+            self._fundir()
+        self.zeros += outro.zeros
+        self.contagem += outro.contagem
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        return self
+
+    def copiar(self):
+        copia = SketchQuantis(self.erro, self.max_baldes)
+        return copia.mesclar(self)
+
+    def quantis(self, qs=QUANTIS):
+        """Valores dos quantis `qs` (em ordem crescente), ou Nones se vazio."""
+        if not self.contagem:
+            return [None] * len(qs)
+        resultado = []
+        acumulado = self.zeros
+        indice = None
+        indices = sorted(self.baldes)
+        i = 0
+        for q in qs:
+            posto = q * (self.contagem - 1)
+            while acumulado <= posto:
+                indice = indices[i]
+                acumulado += self.baldes[indice]
+                i += 1
+            if indice is None:
+                valor = self.minimo
+            else:
+                valor = 2 * self.gama ** indice / (self.gama + 1)
+            resultado.append(min(max(valor, self.minimo), self.maximo))
+        return resultado
+
+    def quantil(self, q):
+        return self.quantis((q,))[0]
+
+class EstatisticasAlvo:
+    """EWMA, jitter, perda recente e sketch de quantis de um alvo."""
+    __slots__ = ('ewma', 'jitter', 'perdas', 'sketch', '_quantis')
+
+    def __init__(self, janela_perdas=JANELA_PERDAS, erro=ERRO_QUANTIS):
+        self.ewma = EWMA()
+        self.jitter = Jitter()
+        self.perdas = JanelaPerdas(janela_perdas)
+        self.sketch = SketchQuantis(erro)
+        self._quantis = (-1, None)   # (contagem do sketch, quantis) do último resumo
+
+    def registrar(self, rtt):
+        """Uma sonda: RTT em ms, ou None se perdida."""
+        self.perdas.adicionar(rtt is None)
+        if rtt is None:
+            return
+        self.ewma.adicionar(rtt)
+        self.jitter.adicionar(rtt)
+        self.sketch.adicionar(rtt)
+
+    def resumo(self):
+        # Alvos sondados com pouca frequência não mudam entre duas coletas
+        contagem, quantis = self._quantis
+        if contagem != self.sketch.contagem:
+            quantis = self.sketch.quantis(QUANTIS)
+            self._quantis = (self.sketch.contagem, quantis)
+        p50, p95, p99 = quantis
+        taxa = self.perdas.taxa()
+        return {
+            'ewma': self.ewma.valor,
+            'jitter': self.jitter.valor if self.jitter.anterior is not None else None,
+            'perda_janela': 100.0 * taxa if taxa is not None else None,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+        }
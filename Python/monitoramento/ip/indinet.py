@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
+import asyncio
+import heapq
+import math
 import subprocess
 import time
 import platform
@@ -8,11 +12,22 @@ import os
 import sys
 import logging
 import threading
+import queue
+import itertools
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 import signal
 import sqlite3
 import csv
+from collections import namedtuple
+from operator import attrgetter
+
+import relatorio_sla
+import retencao
+import serie_temporal
+from estatisticas_streaming import EstatisticasAlvo
+from metricas_http import ServidorMetricas
+from notificacoes import DespachanteNotificacoes, EnviadorScript
+from sonda_icmp import SondaICMP
 
 # Configuração de logging
 logging.basicConfig(
@@ -39,13 +54,27 @@ PING_INTERVAL = 1.0
 OFFLINE_THRESHOLD = 30
 PING_TIMEOUT = 3
 PING_PACKET_SIZE = 756
+MAX_SONDAS_EM_VOO = 512   # Sondas pendentes ao mesmo tempo
+
+# Cadência adaptativa: hosts estáveis são sondados com menos frequência e a
+# primeira perda dispara uma rajada curta de confirmação.
+ESTAVEL_APOS = 30             # Respostas seguidas para o host ser considerado estável
+INTERVALO_RELAXADO = 5.0      # Segundos entre sondas de um host estável
+SONDAS_CONFIRMACAO = 3        # Sondas da rajada após uma perda
+INTERVALO_CONFIRMACAO = 0.3   # Espaçamento entre as sondas da rajada
+TIMEOUT_CONFIRMACAO = 1.0
+TIMEOUT_MINIMO = 1.0          # Timeout adaptativo: FATOR_TIMEOUT x maior RTT visto, entre este e PING_TIMEOUT
+FATOR_TIMEOUT = 4
+INTERVALO_METRICAS = 1.0  # Segundos entre as cópias do estado publicadas no endpoint
 
 DB_PATH = "monitoramento_ips.db"
 TABLE_NAME = "logs_status"
 CSV_LOG_PATH = "monitoramento_ips.csv"
 
-def inicializar_banco():
-    conn = sqlite3.connect(DB_PATH)
+LOTE_GRAVACAO = 200        # Registros por transação no banco
+INTERVALO_GRAVACAO = 1.0   # Segundos máximos até um registro chegar ao disco
+
+def inicializar_banco(conn):
     cursor = conn.cursor()
     cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
@@ -57,98 +86,232 @@ def inicializar_banco():
     """)
     cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_horario ON {TABLE_NAME}(horario)")
     conn.commit()
-    conn.close()
+    serie_temporal.inicializar_tabelas(conn)
+    relatorio_sla.inicializar_tabelas(conn, TABLE_NAME)
 
-def salvar_log_status(ip, horario, status):
-    status_int = 1 if status == 'Online' else 0
-    try:
-        # SQLite
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            f"INSERT INTO {TABLE_NAME} (servidor, horario, status) VALUES (?, ?, ?)",
-            (ip, horario.strftime('%Y-%m-%d %H:%M:%S'), status_int)
-        )
-        conn.commit()
-        conn.close()
-        # NÃO registra log humano aqui!
+SQL_LOG_STATUS = f"INSERT INTO {TABLE_NAME} (servidor, horario, status) VALUES (?, ?, ?)"
+
+class GravadorStatus:
+    """Única thread que escreve no banco e no CSV.
+
+    As threads de monitoramento só colocam o registro na fila; a gravação
+    acontece em lotes (por quantidade ou por tempo), com uma conexão SQLite
+    aberta uma vez em modo WAL e o CSV mantido aberto com buffer. Além dos
+    status, a fila aceita qualquer (sql, parâmetros), como os agregados da
+    série de latência.
+
+    O CSV é girado por mês e, com `com_retencao`, uma thread de
+    retencao.ManutencaoRetencao arquiva os meses antigos do banco e do CSV.
+    """
+    def __init__(self, db_path=DB_PATH, csv_path=CSV_LOG_PATH,
+                 tamanho_lote=LOTE_GRAVACAO, intervalo=INTERVALO_GRAVACAO, com_retencao=True):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.fila = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._executar, name="gravador-status", daemon=True)
+        self.thread.start()
+        self.retencao = retencao.ManutencaoRetencao(db_path, csv_path) if com_retencao else None
+        if self.retencao:
+            self.retencao.iniciar()
+
+    def salvar_log_status(self, ip, horario, status):
+        """Enfileira o registro; nunca espera pelo disco."""
+        self.enfileirar(SQL_LOG_STATUS, (ip, horario.strftime('%Y-%m-%d %H:%M:%S'), 1 if status == 'Online' else 0))
 
-        # CSV Redundância
+    def enfileirar(self, sql, parametros):
+        self.fila.put((sql, parametros))
+
+    def parar(self):
+        """Grava o que ainda estiver na fila e encerra a thread."""
+        if self.retencao:
+            self.retencao.parar()
+        self.fila.put(None)
+        self.thread.join()
+
+    def _abrir_csv(self):
+        """Abre o CSV do mês corrente; o de um mês anterior vira <nome>_AAAA-MM.csv."""
+        mes = datetime.now().strftime('%Y-%m')
+        if os.path.isfile(self.csv_path) and os.path.getsize(self.csv_path) > 0:
+            mes_arquivo = datetime.fromtimestamp(os.path.getmtime(self.csv_path)).strftime('%Y-%m')
+            if mes_arquivo != mes:
+                base, extensao = os.path.splitext(self.csv_path)
+                os.replace(self.csv_path, f"{base}_{mes_arquivo}{extensao}")
+        arquivo_novo = not os.path.isfile(self.csv_path) or os.path.getsize(self.csv_path) == 0
+        csvfile = open(self.csv_path, mode='a', newline='', encoding='utf-8', buffering=64 * 1024)
+        writer = csv.writer(csvfile)
+        if arquivo_novo:
+            writer.writerow(['servidor', 'horario', 'status'])
+        return csvfile, writer, mes
+
+    def _executar(self):
+        conn = None
+        csvfile = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            # Só tem efeito em banco novo (antes do WAL); um antigo é convertido com 'retencao.py --converter'
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            inicializar_banco(conn)
+        except Exception as e:
+            logging.error(f"Erro ao abrir o banco: {e}")
+            conn = None
         try:
-            arquivo_existe = os.path.isfile(CSV_LOG_PATH)
-            with open(CSV_LOG_PATH, mode='a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                if not arquivo_existe:
-                    writer.writerow(['servidor', 'horario', 'status'])
-                writer.writerow([ip, horario.strftime('%Y-%m-%d %H:%M:%S'), status_int])
+            csvfile, writer, mes_csv = self._abrir_csv()
         except Exception as e_csv:
-            logging.error(f"Erro ao salvar log no CSV: {e_csv}")
+            logging.error(f"Erro ao abrir o CSV: {e_csv}")
+            csvfile = None
 
-    except Exception as e:
-        logging.error(f"Erro ao salvar log no banco: {e}")
+        encerrar = False
+        while not encerrar:
+            lote = [self.fila.get()]
+            limite = time.monotonic() + self.intervalo
+            while lote[-1] is not None and len(lote) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            if lote[-1] is None:
+                lote.pop()
+                encerrar = True
+            if not lote:
+                continue
+            if conn is not None:
+                try:
+                    with conn:
+                        # Um executemany por sequência de registros com o mesmo SQL
+                        for sql, grupo in itertools.groupby(lote, key=lambda item: item[0]):
+                            linhas = [parametros for _, parametros in grupo]
+                            conn.executemany(sql, linhas)
+                            if sql == SQL_LOG_STATUS:
+                                relatorio_sla.registrar_transicoes(conn, linhas)
+                except Exception as e:
+                    logging.error(f"Erro ao salvar log no banco: {e}")
+            # CSV Redundância
+            status = [parametros for sql, parametros in lote if sql == SQL_LOG_STATUS]
+            if csvfile is not None and status:
+                try:
+                    if datetime.now().strftime('%Y-%m') != mes_csv:
+                        csvfile.close()
+                        csvfile, writer, mes_csv = self._abrir_csv()
+                    writer.writerows(status)
+                    csvfile.flush()
+                except Exception as e_csv:
+                    logging.error(f"Erro ao salvar log no CSV: {e_csv}")
+
+        if csvfile is not None:
+            csvfile.close()
+        if conn is not None:
+            conn.close()
 
 def mostrar_evento_terminal(evento: str):
     print(f"\n{evento}")
 
-class MonitorIP:
+class EstadoIP:
+    """Estado de um IP; só a tarefa que sonda o IP altera."""
+    __slots__ = ('min', 'max', 'atual', 'status', 'offline_since', 'online_since',
+                 'notificado_offline', 'notificado_online', 'downtime_total',
+                 'tentativas_consecutivas', 'ultimo_ping_sucesso', 'sondas', 'perdas',
+                 'sucessos_seguidos', 'proxima_sonda', 'fluxo')
+
     def __init__(self):
-        self.estatisticas = {}
-        self.running = True
-        self.lock = threading.Lock()
-        inicializar_banco()
-        for ip in IPS:
-            self.estatisticas[ip] = {
-                'min': float('inf'),
-                'max': 0,
-                'atual': 0,
-                'status': 'Desconhecido',
-                'offline_since': None,
-                'online_since': None,
-                'notificado_offline': False,
-                'notificado_online': False,
-                'downtime_total': timedelta(0),
-                'tentativas_consecutivas': 0,
-                'ultimo_ping_sucesso': None
-            }
+        self.min = float('inf')
+        self.max = 0
+        self.atual = 0
+        self.status = 'Desconhecido'
+        self.offline_since = None
+        self.online_since = None
+        self.notificado_offline = False
+        self.notificado_online = False
+        self.downtime_total = timedelta(0)
+        self.tentativas_consecutivas = 0
+        self.ultimo_ping_sucesso = None
+        self.sondas = 0
+        self.perdas = 0
+        self.sucessos_seguidos = 0
+        self.proxima_sonda = 0.0    # time.monotonic() da próxima sonda agendada
+        self.fluxo = EstatisticasAlvo()   # EWMA, jitter, perda recente e quantis
 
-    def enviar_notificacao_whatsapp(self, message, number):
-        try:
-            python_executable = sys.executable
-            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPT_ENVIO_WHATSAPP)
-            if not os.path.exists(script_path):
-                logging.error(f"CRÍTICO: O script de envio '{script_path}' não foi encontrado.")
-                return False
-            command = [python_executable, script_path, number, message]
-            logging.info(f"Enviando notificação WhatsApp para {number}...")
-            def executar_envio():
-                try:
-                    result = subprocess.run(
-                        command, 
-                        capture_output=True, 
-                        text=True,
-                        timeout=30,
-                        encoding='utf-8',
-                        errors='replace'
-                    )
-                    if result.returncode == 0:
-                        logging.info(f"Notificação enviada com sucesso para {number}")
-                    else:
-                        logging.error(f"Erro no envio para {number}. Código: {result.returncode}")
-                        logging.error(f"Stdout: {result.stdout}")
-                        logging.error(f"Stderr: {result.stderr}")
-                except subprocess.TimeoutExpired:
-                    logging.error(f"Timeout ao enviar notificação para {number}")
-                except Exception as e:
-                    logging.error(f"Erro ao executar script de envio: {e}")
-            thread_envio = threading.Thread(target=executar_envio)
-            thread_envio.daemon = True
-            thread_envio.start()
-            return True
-        except Exception as e:
-            logging.error(f"Falha ao preparar envio do WhatsApp: {e}")
-            return False
+# Transição de estado emitida pelo caminho de sondagem e tratada fora dele.
+# tipo: 'offline', 'online' (primeira resposta), 'recuperado', 'alerta_offline', 'alerta_online'
+Evento = namedtuple('Evento', 'tipo ip horario desde duracao')
+
+class TrechoMedido:
+    """Conta quantas vezes um trecho roda e quanto tempo leva; só mede, não exclui ninguém.
+
+    Cada instância é usada por uma thread só (o loop do asyncio).
+    """
+    def __init__(self):
+        self.vezes = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self._inicio
+        self.vezes += 1
+        self.total += duracao
+        self.maximo = max(self.maximo, duracao)
 
-    def fazer_ping(self, ip):
+    def resumo(self):
+        return {
+            'vezes': self.vezes,
+            'media_us': 1e6 * self.total / (self.vezes or 1),
+            'max_us': 1e6 * self.maximo,
+        }
+
+COPIADOS = ('status', 'atual', 'min', 'max', 'tentativas_consecutivas', 'downtime_total',
+            'offline_since', 'ultimo_ping_sucesso', 'sondas', 'perdas')
+_copiar = attrgetter(*COPIADOS)
+
+class MonitorIP:
+    """Monitor dos IPs.
+
+    Relógio, gravação, notificações e terminal podem ser trocados (ex.: pela
+    reprodução de traços em reproducao.py); `relogio` devolve o horário em
+    segundos epoch, como time.time.
+    """
+    def __init__(self, porta_metricas=None, enviador=None, ips=None, relogio=time.time,
+                 gravador=None, notificacoes=None, terminal=mostrar_evento_terminal):
+        self.ips = list(IPS if ips is None else ips)
+        self.relogio = relogio
+        self.terminal = terminal
+        self.estatisticas = {ip: EstadoIP() for ip in self.ips}
+        self.running = True
+        # Cópia imutável dos campos COPIADOS de cada IP, trocada pelo loop a cada resultado;
+        # quem lê (métricas) pega a tupla inteira, sem lock
+        self.publicado = {ip: _copiar(stats) for ip, stats in self.estatisticas.items()}
+        self.medida_atualizacao = TrechoMedido()
+        self.medida_copia = TrechoMedido()
+        self.eventos = queue.SimpleQueue()
+        self.gravador = gravador if gravador is not None else GravadorStatus()
+        self.series = serie_temporal.SeriesLatencia(self.ips, self.gravador.enfileirar)
+        self.sonda = None
+        self.fila_sondas = []       # heap de (próxima sonda, ordem, ip)
+        self.ordem = {ip: i for i, ip in enumerate(self.ips)}
+        self.despertar = None
+        self.inicio_agenda = 0.0
+        self.metricas = ServidorMetricas(porta=porta_metricas) if porta_metricas else None
+        if notificacoes is None:
+            if enviador is None:
+                script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPT_ENVIO_WHATSAPP)
+                enviador = EnviadorScript(WHATSAPP_NUMBER, script_path)
+            notificacoes = DespachanteNotificacoes(enviador)
+        self.notificacoes = notificacoes
+        self.thread_eventos = threading.Thread(target=self.consumir_eventos, name="eventos", daemon=True)
+        self.thread_eventos.start()
+
+    @staticmethod
+    def fazer_ping(ip):
         try:
             sistema = platform.system().lower()
             if sistema == "windows":
@@ -199,75 +362,273 @@ class MonitorIP:
         minutos, segundos = divmod(resto, 60)
         return f"{dias:02d} {horas:02d}:{minutos:02d}:{segundos:02d}"
 
-    def processar_resultado_ping(self, ip, tempo_ping):
-        agora = datetime.now()
-        with self.lock:
+    def processar_resultado_ping(self, ip, tempo_ping, horario=None):
+        """Atualiza o estado do IP e emite as transições; a E/S fica com consumir_eventos.
+
+        Só o loop do asyncio altera o estado dos IPs, então não há lock: no fim,
+        a cópia publicada do IP é trocada de uma vez.
+        """
+        agora = datetime.fromtimestamp(self.relogio() if horario is None else horario)
+        eventos = []
+        with self.medida_atualizacao:
             stats = self.estatisticas[ip]
-            status_atual = stats['status']
+            status_atual = stats.status
             if tempo_ping is None:
-                stats['tentativas_consecutivas'] += 1
+                stats.tentativas_consecutivas += 1
                 if status_atual in ['Desconhecido', 'Online']:
-                    if stats['tentativas_consecutivas'] >= 2:
-                        stats['status'] = 'Offline'
-                        stats['offline_since'] = agora
-                        stats['notificado_offline'] = False
-                        stats['notificado_online'] = False
-                        salvar_log_status(ip, agora, 'Offline')
-                        mostrar_evento_terminal(f"🔴 {ip} ficou OFFLINE em {agora.strftime('%Y-%m-%d %H:%M:%S')}")
-                        logging.warning(f"🔴 IP {ip} ficou OFFLINE em {agora.strftime('%Y-%m-%d %H:%M:%S')}")
-                if (stats['status'] == 'Offline' and 
-                    stats['offline_since'] and 
-                    not stats['notificado_offline']):
-                    tempo_offline = agora - stats['offline_since']
+                    if stats.tentativas_consecutivas >= 2:
+                        stats.status = 'Offline'
+                        stats.offline_since = agora
+                        stats.notificado_offline = False
+                        stats.notificado_online = False
+                        eventos.append(Evento('offline', ip, agora, None, None))
+                if (stats.status == 'Offline' and
+                    stats.offline_since and
+                    not stats.notificado_offline):
+                    tempo_offline = agora - stats.offline_since
                     if tempo_offline.total_seconds() >= OFFLINE_THRESHOLD:
-                        mensagem = (f"🚨 ALERTA: Servidor {ip} está OFFLINE!\n"
-                                   f"⏰ Desde: {stats['offline_since'].strftime('%d/%m/%Y %H:%M:%S')}\n"
-                                   f"⏱️ Há: {self.formatar_duracao(tempo_offline)} (dd hh:mm:ss)")
-                        self.enviar_notificacao_whatsapp(mensagem, WHATSAPP_NUMBER)
-                        stats['notificado_offline'] = True
-                        logging.critical(f"📱 NOTIFICAÇÃO OFFLINE ENVIADA para {ip}")
+                        eventos.append(Evento('alerta_offline', ip, agora, stats.offline_since, tempo_offline))
+                        stats.notificado_offline = True
 
             else:
-                stats['tentativas_consecutivas'] = 0
-                stats['ultimo_ping_sucesso'] = agora
+                stats.tentativas_consecutivas = 0
+                stats.ultimo_ping_sucesso = agora
                 if status_atual == 'Offline':
-                    tempo_offline = agora - stats['offline_since'] if stats['offline_since'] else timedelta(0)
-                    stats['downtime_total'] += tempo_offline
-                    if tempo_offline.total_seconds() >= OFFLINE_THRESHOLD and not stats['notificado_online']:
-                        duracao_formatada = self.formatar_duracao(tempo_offline)
-                        mensagem = (f"✅ SERVIDOR RECUPERADO: {ip}\n"
-                                   f"⏰ Caiu em: {stats['offline_since'].strftime('%d/%m/%Y %H:%M:%S')}\n"
-                                   f"⏰ Voltou em: {agora.strftime('%d/%m/%Y %H:%M:%S')}\n"
-                                   f"⏱️ Tempo offline: {duracao_formatada} (dd hh:mm:ss)")
-                        self.enviar_notificacao_whatsapp(mensagem, WHATSAPP_NUMBER)
-                        stats['notificado_online'] = True
-                        logging.info(f"📱 NOTIFICAÇÃO RECUPERAÇÃO ENVIADA para {ip}")
-                    stats['status'] = 'Online'
-                    stats['online_since'] = agora
-                    salvar_log_status(ip, agora, 'Online')
-                    mostrar_evento_terminal(f"🟢 {ip} voltou ONLINE em {agora.strftime('%d/%m/%Y %H:%M:%S')}")
-                    logging.info(f"🟢 IP {ip} voltou ONLINE após {self.formatar_duracao(tempo_offline)}")
+                    tempo_offline = agora - stats.offline_since if stats.offline_since else timedelta(0)
+                    stats.downtime_total += tempo_offline
+                    if tempo_offline.total_seconds() >= OFFLINE_THRESHOLD and not stats.notificado_online:
+                        eventos.append(Evento('alerta_online', ip, agora, stats.offline_since, tempo_offline))
+                        stats.notificado_online = True
+                    stats.status = 'Online'
+                    stats.online_since = agora
+                    eventos.append(Evento('recuperado', ip, agora, stats.offline_since, tempo_offline))
                 elif status_atual == 'Desconhecido':
-                    stats['status'] = 'Online'
-                    stats['online_since'] = agora
-                    salvar_log_status(ip, agora, 'Online')
-                    mostrar_evento_terminal(f"🟢 {ip} está ONLINE em {agora.strftime('%d/%m/%Y %H:%M:%S')}")
-                    logging.info(f"🟢 IP {ip} está ONLINE")
-                stats['atual'] = tempo_ping
-                if stats['min'] == float('inf'):
-                    stats['min'] = tempo_ping
+                    stats.status = 'Online'
+                    stats.online_since = agora
+                    eventos.append(Evento('online', ip, agora, None, None))
+                stats.atual = tempo_ping
+                if stats.min == float('inf'):
+                    stats.min = tempo_ping
                 else:
-                    stats['min'] = min(stats['min'], tempo_ping)
-                stats['max'] = max(stats['max'], tempo_ping)
+                    stats.min = min(stats.min, tempo_ping)
+                stats.max = max(stats.max, tempo_ping)
+            self.publicado[ip] = _copiar(stats)
+        for evento in eventos:
+            self.eventos.put(evento)
 
-    def monitorar_ip_individual(self, ip):
-        while self.running:
+    def tratar_evento(self, evento):
+        """Banco, CSV, terminal, log e notificações de uma transição."""
+        ip, agora = evento.ip, evento.horario
+        if evento.tipo == 'offline':
+            self.gravador.salvar_log_status(ip, agora, 'Offline')
+            self.terminal(f"🔴 {ip} ficou OFFLINE em {agora.strftime('%Y-%m-%d %H:%M:%S')}")
+            logging.warning(f"🔴 IP {ip} ficou OFFLINE em {agora.strftime('%Y-%m-%d %H:%M:%S')}")
+        elif evento.tipo == 'alerta_offline':
+            mensagem = (f"🚨 ALERTA: Servidor {ip} está OFFLINE!\n"
+                       f"⏰ Desde: {evento.desde.strftime('%d/%m/%Y %H:%M:%S')}\n"
+                       f"⏱️ Há: {self.formatar_duracao(evento.duracao)} (dd hh:mm:ss)")
+            self.notificacoes.alertar(ip, 'Offline', evento.desde, mensagem)
+            logging.critical(f"📱 NOTIFICAÇÃO OFFLINE enfileirada para {ip}")
+        elif evento.tipo == 'alerta_online':
+            mensagem = (f"✅ SERVIDOR RECUPERADO: {ip}\n"
+                       f"⏰ Caiu em: {evento.desde.strftime('%d/%m/%Y %H:%M:%S')}\n"
+                       f"⏰ Voltou em: {agora.strftime('%d/%m/%Y %H:%M:%S')}\n"
+                       f"⏱️ Tempo offline: {self.formatar_duracao(evento.duracao)} (dd hh:mm:ss)")
+            self.notificacoes.alertar(ip, 'Online', agora, mensagem)
+            logging.info(f"📱 NOTIFICAÇÃO RECUPERAÇÃO enfileirada para {ip}")
+        elif evento.tipo == 'recuperado':
+            self.gravador.salvar_log_status(ip, agora, 'Online')
+            self.terminal(f"🟢 {ip} voltou ONLINE em {agora.strftime('%d/%m/%Y %H:%M:%S')}")
+            logging.info(f"🟢 IP {ip} voltou ONLINE após {self.formatar_duracao(evento.duracao)}")
+        elif evento.tipo == 'online':
+            self.gravador.salvar_log_status(ip, agora, 'Online')
+            self.terminal(f"🟢 {ip} está ONLINE em {agora.strftime('%d/%m/%Y %H:%M:%S')}")
+            logging.info(f"🟢 IP {ip} está ONLINE")
+
+    def consumir_eventos(self):
+        while True:
+            evento = self.eventos.get()
+            if evento is None:
+                return
             try:
-                tempo_ping = self.fazer_ping(ip)
-                self.processar_resultado_ping(ip, tempo_ping)
+                self.tratar_evento(evento)
             except Exception as e:
-                logging.error(f"Erro no monitoramento de {ip}: {e}")
-            time.sleep(PING_INTERVAL)
+                logging.error(f"Erro ao tratar evento {evento.tipo} de {evento.ip}: {e}")
+
+    def parar_consumidores(self):
+        """Esvazia a fila de eventos e encerra quem grava e notifica, nesta ordem."""
+        self.eventos.put(None)
+        self.thread_eventos.join()
+        self.series.fechar()
+        self.gravador.parar()
+        self.notificacoes.parar()
+        logging.info(f"Atualizações do estado: {self.medida_atualizacao.resumo()}; "
+                     f"cópias: {self.medida_copia.resumo()}")
+
+    async def fazer_ping_async(self, ip, timeout=PING_TIMEOUT):
+        if self.sonda is not None:
+            return await self.sonda.ping(ip, timeout, PING_PACKET_SIZE)
+        # Sem socket ICMP: usa o ping do sistema nas threads do executor padrão
+        return await asyncio.to_thread(self.fazer_ping, ip)
+
+    def intervalo_sonda(self, stats):
+        if stats.status == 'Online' and stats.sucessos_seguidos >= ESTAVEL_APOS:
+            return INTERVALO_RELAXADO
+        return PING_INTERVAL
+
+    def timeout_sonda(self, stats):
+        """Timeout proporcional ao maior RTT já visto; o padrão enquanto não há histórico ou há falhas."""
+        if stats.ultimo_ping_sucesso is None or stats.tentativas_consecutivas:
+            return PING_TIMEOUT
+        return min(PING_TIMEOUT, max(TIMEOUT_MINIMO, FATOR_TIMEOUT * stats.max / 1000))
+
+    def registrar_resultado(self, ip, tempo_ping):
+        stats = self.estatisticas[ip]
+        stats.sondas += 1
+        if tempo_ping is None:
+            stats.perdas += 1
+            stats.sucessos_seguidos = 0
+        else:
+            stats.sucessos_seguidos += 1
+        stats.fluxo.registrar(tempo_ping)
+        horario = self.relogio()
+        self.processar_resultado_ping(ip, tempo_ping, horario)
+        self.series.registrar(ip, tempo_ping, horario)
+
+    async def _sonda_atrasada(self, ip, atraso):
+        await asyncio.sleep(atraso)
+        return await self.fazer_ping_async(ip, TIMEOUT_CONFIRMACAO)
+
+    async def confirmar(self, ip):
+        """Rajada de sondas espaçadas após uma perda; para na primeira resposta.
+
+        A rajada só decide o estado: entra na máquina de estados como um único
+        resultado (perda só se todas as sondas falharem) e fica fora dos
+        contadores, das estatísticas e da série, que seguem a cadência normal.
+        """
+        tarefas = [asyncio.create_task(self._sonda_atrasada(ip, k * INTERVALO_CONFIRMACAO))
+                   for k in range(SONDAS_CONFIRMACAO)]
+        tempo_ping = None
+        try:
+            for tarefa in tarefas:
+                tempo_ping = await tarefa
+                if tempo_ping is not None:
+                    break
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+        self.processar_resultado_ping(ip, tempo_ping)
+
+    async def sondar(self, ip, janela):
+        stats = self.estatisticas[ip]
+        try:
+            tempo_ping = await self.fazer_ping_async(ip, self.timeout_sonda(stats))
+            self.registrar_resultado(ip, tempo_ping)
+            if tempo_ping is None and stats.status != 'Offline':
+                await self.confirmar(ip)
+        except Exception as e:
+            logging.error(f"Erro no monitoramento de {ip}: {e}")
+        finally:
+            janela.release()
+            self.reagendar(ip)
+
+    def reagendar(self, ip):
+        """Agenda a próxima sonda na fase do IP dentro do seu intervalo atual.
+
+        A fase é proporcional à posição do IP na lista, então os IPs ficam
+        espalhados pelo intervalo qualquer que seja ele (inclusive quando
+        vários passam para o intervalo relaxado juntos).
+        """
+        stats = self.estatisticas[ip]
+        intervalo = self.intervalo_sonda(stats)
+        fase = self.inicio_agenda + self.ordem[ip] * intervalo / len(self.ips)
+        ciclos = math.floor((time.monotonic() - fase) / intervalo) + 1
+        stats.proxima_sonda = fase + ciclos * intervalo
+        heapq.heappush(self.fila_sondas, (stats.proxima_sonda, self.ordem[ip], ip))
+        if self.despertar is not None:
+            self.despertar.set()
+
+    def copiar_estado(self):
+        """Cópia do estado de todos os IPs para quem só lê (métricas)."""
+        horario = self.relogio()
+        agora = datetime.fromtimestamp(horario)
+        with self.medida_copia:
+            copias = dict(self.publicado)
+        ips = {}
+        for ip, valores in copias.items():
+            # fluxo só é alterado no loop do asyncio, o mesmo que chama este método
+            fluxo = self.estatisticas[ip].fluxo.resumo()
+            stats = dict(zip(COPIADOS, valores))
+            downtime = stats['downtime_total']
+            if stats['status'] == 'Offline' and stats['offline_since']:
+                downtime += agora - stats['offline_since']
+            ips[ip] = {
+                'status': stats['status'],
+                'up': {'Online': 1, 'Offline': 0}.get(stats['status'], float('nan')),
+                'atual': stats['atual'] if stats['ultimo_ping_sucesso'] else None,
+                'min': stats['min'] if stats['min'] != float('inf') else None,
+                'max': stats['max'] if stats['ultimo_ping_sucesso'] else None,
+                'tentativas_consecutivas': stats['tentativas_consecutivas'],
+                'downtime': downtime.total_seconds(),
+                'offline_since': stats['offline_since'].isoformat() if stats['offline_since'] else None,
+                'sondas': stats['sondas'],
+                'perdas': stats['perdas'],
+                **fluxo,
+            }
+        return {'horario': horario, 'ips': ips,
+                'medidas': {'atualizacao': self.medida_atualizacao.resumo(),
+                            'copia': self.medida_copia.resumo()}}
+
+    async def publicar_metricas(self):
+        while self.running:
+            self.metricas.publicar(self.copiar_estado())
+            await asyncio.sleep(INTERVALO_METRICAS)
+
+    async def agendar_sondas(self):
+        """Dispara as sondas na hora marcada de cada IP.
+
+        Os IPs começam distribuídos uniformemente dentro de PING_INTERVAL e
+        cada um mantém sua fase ao ser reagendado, então as sondas não saem
+        todas juntas. Cada IP tem no máximo uma sonda agendada (a próxima só
+        é marcada quando a atual termina) e no máximo MAX_SONDAS_EM_VOO
+        sondas ficam pendentes ao mesmo tempo.
+        """
+        self.sonda = SondaICMP.abrir()
+        if self.sonda is None:
+            logging.info("Socket ICMP indisponível; usando o comando ping do sistema.")
+        janela = asyncio.Semaphore(MAX_SONDAS_EM_VOO)
+        self.despertar = asyncio.Event()
+        self.inicio_agenda = time.monotonic()
+        self.fila_sondas = []
+        for ip, i in self.ordem.items():
+            self.estatisticas[ip].proxima_sonda = self.inicio_agenda + i * PING_INTERVAL / len(self.ips)
+            self.fila_sondas.append((self.estatisticas[ip].proxima_sonda, i, ip))
+        heapq.heapify(self.fila_sondas)
+        tarefas = set()
+        if self.metricas:
+            tarefas.add(asyncio.create_task(self.publicar_metricas()))
+        try:
+            while self.running:
+                while self.fila_sondas and self.fila_sondas[0][0] <= time.monotonic() and self.running:
+                    _, _, ip = heapq.heappop(self.fila_sondas)
+                    await janela.acquire()
+                    tarefa = asyncio.create_task(self.sondar(ip, janela))
+                    tarefas.add(tarefa)
+                    tarefa.add_done_callback(tarefas.discard)
+                # Dorme até a próxima sonda ou até um reagendamento mais cedo
+                espera = self.fila_sondas[0][0] - time.monotonic() if self.fila_sondas else PING_INTERVAL
+                self.despertar.clear()
+                try:
+                    await asyncio.wait_for(self.despertar.wait(), max(0.0, min(espera, PING_INTERVAL)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            if self.sonda is not None:
+                self.sonda.fechar()
+                self.sonda = None
 
     def signal_handler(self, signum, frame):
         logging.info("🛑 Recebido sinal de interrupção. Encerrando...")
@@ -279,23 +640,26 @@ class MonitorIP:
         logging.info("🚀 Iniciando monitoramento de IPs...")
         print("🖥️  Monitor de Servidores Iniciado")
         print("Somente eventos críticos serão exibidos no terminal.")
-        threads = []
-        with ThreadPoolExecutor(max_workers=len(IPS)) as executor:
-            futures = [executor.submit(self.monitorar_ip_individual, ip) for ip in IPS]
-            try:
-                while self.running:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                pass
-            finally:
-                self.running = False
-                for future in futures:
-                    future.cancel()
+        if self.metricas:
+            self.metricas.iniciar()
+        try:
+            asyncio.run(self.agendar_sondas())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            self.parar_consumidores()
+            if self.metricas:
+                self.metricas.parar()
         print("\n🛑 Monitoramento encerrado.")
         logging.info("🛑 Monitoramento encerrado pelo usuário.")
 
 if __name__ == "__main__":
-    monitor = MonitorIP()
+    parser = argparse.ArgumentParser(description="Monitoramento de IPs com alerta por WhatsApp.")
+    parser.add_argument('--metricas-porta', type=int,
+                        help="Expõe /metrics e /estado.json em 127.0.0.1 nesta porta (padrão: desativado).")
+    args = parser.parse_args()
+    monitor = MonitorIP(args.metricas_porta)
     try:
         monitor.executar()
     except Exception as e:
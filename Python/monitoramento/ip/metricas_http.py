@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Endpoint HTTP local com o estado do MonitorIP (Prometheus e JSON).
+
+O monitor publica periodicamente uma cópia do seu estado com publicar(); o
+servidor, na sua própria thread, só lê a última cópia publicada (uma troca
+de referência), então uma coleta nunca atrasa o monitoramento.
+
+    GET /metrics       formato texto do Prometheus
+    GET /estado.json   o mesmo estado em JSON
+"""
+import json
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 9101
+
+# (nome, tipo, ajuda, chave no estado de cada IP)
+METRICAS = [
+    ('indinet_up', 'gauge', "1 se o IP está online, 0 se offline (NaN enquanto desconhecido)", 'up'),
+    ('indinet_rtt_ms', 'gauge', "RTT do último ping respondido em ms", 'atual'),
+    ('indinet_rtt_min_ms', 'gauge', "Menor RTT observado em ms", 'min'),
+    ('indinet_rtt_max_ms', 'gauge', "Maior RTT observado em ms", 'max'),
+    ('indinet_falhas_consecutivas', 'gauge', "Pings sem resposta seguidos", 'tentativas_consecutivas'),
+    ('indinet_downtime_segundos_total', 'counter', "Tempo offline acumulado, incluindo a queda atual", 'downtime'),
+    ('indinet_sondas_total', 'counter', "Pings enviados", 'sondas'),
+    ('indinet_sondas_perdidas_total', 'counter', "Pings sem resposta", 'perdas'),
+    ('indinet_rtt_ewma_ms', 'gauge', "Média móvel exponencial do RTT em ms", 'ewma'),
+    ('indinet_jitter_ms', 'gauge', "Jitter entre respostas consecutivas (RFC 3550) em ms", 'jitter'),
+    ('indinet_perda_recente_percentual', 'gauge', "Perda nas últimas sondas (%)", 'perda_janela'),
+    ('indinet_rtt_p50_ms', 'gauge', "Mediana do RTT desde o início em ms", 'p50'),
+    ('indinet_rtt_p95_ms', 'gauge', "Percentil 95 do RTT desde o início em ms", 'p95'),
+    ('indinet_rtt_p99_ms', 'gauge', "Percentil 99 do RTT desde o início em ms", 'p99'),
+]
+
+def _valor_prometheus(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return 'NaN'
+    if valor == math.inf:
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+def formatar_prometheus(estado):
+    linhas = []
+    for nome, tipo, ajuda, chave in METRICAS:
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for ip, valores in estado['ips'].items():
+            linhas.append(f'{nome}{{ip="{ip}"}} {_valor_prometheus(valores[chave])}')
+    medidas = estado.get('medidas')
+    if medidas:
+        atualizacao, copia = medidas['atualizacao'], medidas['copia']
+        for nome, tipo, ajuda, valor in (
+                ('indinet_estado_atualizacoes_total', 'counter', "Resultados aplicados ao estado dos IPs", atualizacao['vezes']),
+                ('indinet_estado_atualizacao_media_us', 'gauge', "Tempo médio para aplicar um resultado (µs)", atualizacao['media_us']),
+                ('indinet_estado_atualizacao_max_us', 'gauge', "Maior tempo para aplicar um resultado (µs)", atualizacao['max_us']),
+                ('indinet_estado_copias_total', 'counter', "Cópias do estado publicado lidas", copia['vezes']),
+                ('indinet_estado_copia_media_us', 'gauge', "Tempo médio para ler a cópia publicada (µs)", copia['media_us']),
+                ('indinet_estado_copia_max_us', 'gauge', "Maior tempo para ler a cópia publicada (µs)", copia['max_us'])):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.append(f"{nome} {_valor_prometheus(valor)}")
+    linhas.append("# HELP indinet_estado_horario_segundos Momento da cópia do estado (epoch)")
+    linhas.append("# TYPE indinet_estado_horario_segundos gauge")
+    linhas.append(f"indinet_estado_horario_segundos {estado['horario']:.3f}")
+    return '\n'.join(linhas) + '\n'
+
+def formatar_json(estado):
+    def limpar(valor):
+        # JSON não tem NaN/Infinity
+        if isinstance(valor, float) and not math.isfinite(valor):
+            return None
+        return valor
+    return json.dumps({
+        'horario': estado['horario'],
+        'medidas': estado.get('medidas'),
+        'ips': {ip: {chave: limpar(v) for chave, v in valores.items()} for ip, valores in estado['ips'].items()},
+    }, ensure_ascii=False, indent=2)
+
+ROTAS = {
+    '/metrics': (formatar_prometheus, 'text/plain; version=0.0.4; charset=utf-8'),
+    '/estado.json': (formatar_json, 'application/json; charset=utf-8'),
+}
+
+class ServidorMetricas:
+    def __init__(self, host=HOST_PADRAO, porta=PORTA_PADRAO):
+        self.estado = {'horario': time.time(), 'ips': {}}
+        self.renderizados = (None, {})    # (estado, {rota: bytes}) da última coleta
+        self.lock_render = threading.Lock()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ROTAS:
+                    self.send_error(404)
+                    return
+                tipo = ROTAS[self.path][1]
+                dados = servidor.renderizar(self.path)
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, formato, *args):
+                logging.debug(f"metricas_http: {formato % args}")
+
+        self.httpd = ThreadingHTTPServer((host, porta), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metricas-http", daemon=True)
+
+    @property
+    def endereco(self):
+        return self.httpd.server_address
+
+    def iniciar(self):
+        self.thread.start()
+        logging.info(f"Métricas em http://{self.endereco[0]}:{self.endereco[1]}/metrics")
+
+    def renderizar(self, rota):
+        """Corpo da rota para o último estado, formatado uma vez por cópia publicada."""
+        estado = self.estado  # Referência à última cópia; nunca é alterada depois de publicada
+        with self.lock_render:
+            anterior, corpos = self.renderizados
+            if anterior is not estado:
+                corpos = {}
+                self.renderizados = (estado, corpos)
+            if rota not in corpos:
+                corpos[rota] = ROTAS[rota][0](estado).encode('utf-8')
+            return corpos[rota]
+
+    def publicar(self, estado):
+        """Troca o estado servido; `estado` não deve ser alterado depois."""
+        self.estado = estado
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
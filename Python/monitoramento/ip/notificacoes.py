@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Despacho de notificações do monitor com agrupamento e limite de envio.
+
+Os alertas entram numa fila atendida por uma única thread. Alertas que
+chegam dentro de JANELA_AGRUPAMENTO segundos viram uma mensagem só ("37
+servidores OFFLINE desde 14:02"); um alerta igual ao último estado já
+notificado daquele IP é descartado; uma queda ainda retida que recebe a
+recuperação antes do envio sai junto com ela ("caiu e voltou, 14:02–14:05")
+em vez de sumir; e no máximo LIMITE_ENVIOS mensagens
+saem a cada PERIODO_LIMITE segundos (o que exceder espera e é agrupado com
+os próximos alertas).
+
+Quem de fato envia é plugável: EnviadorScript chama o script de WhatsApp e
+EnviadorFalso só guarda as mensagens (testes).
+"""
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+JANELA_AGRUPAMENTO = 10.0   # Segundos esperando mais alertas antes de enviar
+LIMITE_ENVIOS = 5           # Mensagens por período
+PERIODO_LIMITE = 60.0
+IPS_NO_RESUMO = 10          # IPs listados numa mensagem agrupada
+
+# estado: 'Offline', 'Online' ou 'Queda' (caiu e voltou antes do aviso; 'ate' é a volta)
+Alerta = namedtuple('Alerta', 'ip estado desde mensagem ate', defaults=(None,))
+
+class EnviadorScript:
+    """Envia pelo script externo de WhatsApp (um processo por mensagem já agrupada)."""
+    def __init__(self, numero, script_path, timeout=30):
+        self.numero = numero
+        self.script_path = script_path
+        self.timeout = timeout
+
+    def enviar(self, mensagem):
+        if not os.path.exists(self.script_path):
+            logging.error(f"CRÍTICO: O script de envio '{self.script_path}' não foi encontrado.")
+            return False
+        logging.info(f"Enviando notificação WhatsApp para {self.numero}...")
+        try:
+            result = subprocess.run(
+                [sys.executable, self.script_path, self.numero, mensagem],
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+                encoding='utf-8',
+                errors='replace'
+            )
+        except subprocess.TimeoutExpired:
+            logging.error(f"Timeout ao enviar notificação para {self.numero}")
+            return False
+        if result.returncode != 0:
+            logging.error(f"Erro no envio para {self.numero}. Código: {result.returncode}")
+            logging.error(f"Stdout: {result.stdout}")
+            logging.error(f"Stderr: {result.stderr}")
+            return False
+        logging.info(f"Notificação enviada com sucesso para {self.numero}")
+        return True
+
+class EnviadorFalso:
+    """Guarda as mensagens em memória em vez de enviar."""
+    def __init__(self):
+        self.mensagens = []
+
+    def enviar(self, mensagem):
+        self.mensagens.append((time.time(), mensagem))
+        return True
+
+def _lista_ips(alertas):
+    ips = [a.ip for a in alertas]
+    texto = ', '.join(ips[:IPS_NO_RESUMO])
+    if len(ips) > IPS_NO_RESUMO:
+        texto += f" e mais {len(ips) - IPS_NO_RESUMO}"
+    return texto
+
+def _intervalo(alerta):
+    return f"{alerta.desde.strftime('%H:%M')}–{alerta.ate.strftime('%H:%M')}"
+
+def queda(offline, online):
+    """Junta um Offline ainda não enviado com a recuperação que chegou depois."""
+    mensagem = (f"⚠️ Servidor {offline.ip} ficou OFFLINE e já voltou\n"
+                f"⏰ Caiu em: {offline.desde.strftime('%d/%m/%Y %H:%M:%S')}\n"
+                f"⏰ Voltou em: {online.desde.strftime('%d/%m/%Y %H:%M:%S')}")
+    return Alerta(offline.ip, 'Queda', offline.desde, mensagem, online.desde)
+
+def resumir(estado, alertas):
+    """Mensagem de um grupo de alertas do mesmo estado (um alerta só mantém o texto original)."""
+    if len(alertas) == 1:
+        return alertas[0].mensagem
+    if estado == 'Offline':
+        desde = min(a.desde for a in alertas)
+        return (f"🚨 ALERTA: {len(alertas)} servidores OFFLINE desde {desde.strftime('%H:%M')}\n"
+                f"{_lista_ips(alertas)}")
+    if estado == 'Queda':
+        quedas = [f"{a.ip} ({_intervalo(a)})" for a in sorted(alertas, key=lambda a: a.desde)]
+        texto = ', '.join(quedas[:IPS_NO_RESUMO])
+        if len(quedas) > IPS_NO_RESUMO:
+            texto += f" e mais {len(quedas) - IPS_NO_RESUMO}"
+        return f"⚠️ {len(alertas)} servidores CAÍRAM E VOLTARAM\n{texto}"
+    return f"✅ {len(alertas)} servidores RECUPERADOS\n{_lista_ips(alertas)}"
+
+class DespachanteNotificacoes:
+    def __init__(self, enviador, janela=JANELA_AGRUPAMENTO, limite=LIMITE_ENVIOS, periodo=PERIODO_LIMITE):
+        self.enviador = enviador
+        self.janela = janela
+        self.limite = limite
+        self.periodo = periodo
+        self.fila = queue.SimpleQueue()
+        self.pendentes = {}     # ip -> último Alerta ainda não enviado
+        self.notificado = {}    # ip -> último estado notificado
+        self.envios = deque()   # Instantes (monotonic) dos envios dentro do período
+        self.thread = threading.Thread(target=self._executar, name="notificacoes", daemon=True)
+        self.thread.start()
+
+    def alertar(self, ip, estado, desde, mensagem):
+        """Enfileira o alerta; não espera pelo envio."""
+        self.fila.put(Alerta(ip, estado, desde, mensagem))
+
+    def parar(self):
+        """Envia o que estiver pendente (sem esperar a janela nem o limite) e encerra."""
+        self.fila.put(None)
+        self.thread.join()
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            # Com mensagens retidas pelo limite, acorda quando houver vaga de envio
+            espera = None
+            if self.pendentes:
+                espera = max(0.0, self.envios[0] + self.periodo - time.monotonic()) if self.envios else 0.0
+            try:
+                item = self.fila.get(timeout=espera)
+            except queue.Empty:
+                item = False
+            if item is None:
+                encerrar = True
+            elif item:
+                self._reter(item)
+                # Janela de agrupamento a partir do primeiro alerta
+                limite = time.monotonic() + self.janela
+                while True:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        item = self.fila.get(timeout=restante)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        encerrar = True
+                        break
+                    self._reter(item)
+            self._despachar(sem_limite=encerrar)
+
+    def _reter(self, alerta):
+        anterior = self.pendentes.get(alerta.ip)
+        if (alerta.estado == 'Online' and anterior is not None and anterior.estado == 'Offline'
+                and self.notificado.get(alerta.ip) != 'Offline'):
+            # A queda ainda não foi avisada: sai junto com a recuperação em vez de sumir
+            alerta = queda(anterior, alerta)
+        self.pendentes[alerta.ip] = alerta
+
+    def _vaga(self):
+        agora = time.monotonic()
+        while self.envios and self.envios[0] <= agora - self.periodo:
+            self.envios.popleft()
+        return len(self.envios) < self.limite
+
+    def _despachar(self, sem_limite=False):
+        for ip, alerta in list(self.pendentes.items()):
+            anterior = self.notificado.get(ip)
+            # Mesmo estado já notificado, ou recuperação de uma queda que nunca foi avisada
+            if alerta.estado == anterior or (alerta.estado == 'Online' and anterior != 'Offline'):
+                del self.pendentes[ip]
+        for estado in ('Offline', 'Queda', 'Online'):
+            grupo = [a for a in self.pendentes.values() if a.estado == estado]
+            if not grupo:
+                continue
+            if not sem_limite and not self._vaga():
+                logging.warning(f"Limite de {self.limite} notificações por {self.periodo:g}s atingido; "
+                                f"{len(self.pendentes)} alertas aguardando")
+                return
+            try:
+                self.enviador.enviar(resumir(estado, grupo))
+            except Exception as e:
+                logging.error(f"Erro ao enviar notificação: {e}")
+            self.envios.append(time.monotonic())
+            for alerta in grupo:
+                self.notificado[alerta.ip] = 'Online' if estado == 'Queda' else estado
+                del self.pendentes[alerta.ip]
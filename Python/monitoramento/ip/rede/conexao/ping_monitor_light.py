@@ -1,3 +1,10 @@
+"""Monitor de ping com três mostradores (gateway, provedor e internet).
+
+Usa o estatisticas_streaming.py de monitoramento/ip. Rodado direto
+(python ping_monitor_light.py ou clique duplo), o main() procura essa pasta
+a partir do próprio arquivo; quem importa o módulo precisa ter
+monitoramento/ip no caminho de importação.
+"""
 import tkinter as tk
 from tkinter import font, ttk, messagebox
 import threading
@@ -5,6 +12,8 @@ import subprocess
 import re
 import ipaddress
 import math
+import os
+import sys
 import time
 import platform
 import queue
@@ -17,6 +26,23 @@ try:
 except ImportError:
     HAS_PSUTIL = False
 
+# Estatísticas em fluxo compartilhadas com o indinet.py (monitoramento/ip);
+# rodando o script direto, main() carrega de lá com _load_streaming_stats()
+try:
+    from estatisticas_streaming import EstatisticasAlvo, JanelaDeslizante
+except ImportError:
+    EstatisticasAlvo = JanelaDeslizante = None
+
+def _load_streaming_stats():
+    """Importa estatisticas_streaming de monitoramento/ip (dois níveis acima deste arquivo)."""
+    global EstatisticasAlvo, JanelaDeslizante
+    if EstatisticasAlvo is not None:
+        return
+    base = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    if base not in sys.path:
+        sys.path.append(base)
+    from estatisticas_streaming import EstatisticasAlvo, JanelaDeslizante
+
 # --- Configurações Globais e Estilos ---
 COLORS = {
     'bg': "#000000",
@@ -38,6 +64,7 @@ CONFIG = {
     'var_pct_trigger': 10.0, # Variação percentual para considerar instável
     'history_size': 3600   # Histórico para estatísticas (segundos)
 }
+MAX_HISTORY_SIZE = 86400   # 24h a 1 ping por segundo
 
 class PingGauge(tk.Canvas):
     def __init__(self, parent, title, max_scale=200, size=200, **kw):
@@ -49,8 +76,9 @@ class PingGauge(tk.Canvas):
         
         # Dados
         self.current_ping = None
-        self.ping_history = [] # Guarda os últimos 3600 pontos
-        self.recent = []       # Buffer recente para o LED
+        self.ping_history = JanelaDeslizante(CONFIG['history_size']) # Pings respondidos (stats)
+        self.recent = JanelaDeslizante(CONFIG['sample_size'])        # Buffer recente para o LED
+        self.fluxo = EstatisticasAlvo()  # EWMA, jitter, perda e quantis sem guardar as amostras
         
         # Estado interno
         self.min_ping = 9999
@@ -156,18 +184,15 @@ class PingGauge(tk.Canvas):
 
     def update_ping(self, val):
         # Atualiza lista recente para o LED (Sample Size)
-        self.recent.append(val)
-        if len(self.recent) > CONFIG['sample_size']:
-            self.recent.pop(0)
+        self.recent.adicionar(val)
+        self.fluxo.registrar(val)
             
         target_angle = 225
         needle_color = COLORS['scale_high']
 
         if val is not None:
-            # Atualiza histórico LONGO (para o botão Stats - 3600 segundos)
-            self.ping_history.append(val)
-            if len(self.ping_history) > CONFIG['history_size']: 
-                self.ping_history.pop(0)
+            # Atualiza histórico LONGO (para o botão Stats - CONFIG['history_size'] pings)
+            self.ping_history.adicionar(val)
             
             self.min_ping = min(self.min_ping, val)
             self.max_ping = max(self.max_ping, val)
@@ -221,15 +246,13 @@ class PingGauge(tk.Canvas):
         if self.blink_job:
             self.after_cancel(self.blink_job)
 
-        valid_samples = [x for x in self.recent if x is not None]
-        
         is_error_now = current_val is None
-        has_recent_drop = None in self.recent 
+        has_recent_drop = self.recent.perdas > 0
         
         is_jittery = False
-        if len(valid_samples) > 1:
-            v_min = min(valid_samples)
-            v_max = max(valid_samples)
+        if self.recent.validas > 1:
+            v_min = self.recent.minimo()
+            v_max = self.recent.maximo()
             diff_abs = v_max - v_min
             diff_pct = (diff_abs / v_min * 100) if v_min > 0 else 0
             
@@ -276,9 +299,18 @@ class PingGauge(tk.Canvas):
         delay = random.randint(50, 150)
         self.blink_job = self.after(delay, lambda: self._blink_led(count + 1, mode, c_on, c_off))
 
+    def resize_history(self, size):
+        """Troca a capacidade do histórico mantendo os pings mais recentes."""
+        new = JanelaDeslizante(size)
+        for val in self.ping_history.valores()[-size:]:
+            new.adicionar(val)
+        self.ping_history = new
+
     def reset(self):
         self.min_ping, self.max_ping = 9999, 0
-        self.ping_history, self.recent = [], []
+        self.ping_history = JanelaDeslizante(CONFIG['history_size'])
+        self.recent = JanelaDeslizante(CONFIG['sample_size'])
+        self.fluxo = EstatisticasAlvo()
         self.itemconfigure(self.txt_min, text="Min\n---")
         self.itemconfigure(self.txt_max, text="Max\n---")
         self._anim_needle(225, COLORS['scale_low'])
@@ -416,24 +448,27 @@ class PingApp:
         ttk.Button(bf, text="Sair", command=self.close, style='D.TButton', width=6).pack(side=tk.RIGHT, padx=2)
 
     def stats(self):
-        """Mostra estatísticas baseadas nos últimos 3600 segundos de histórico"""
+        """Mostra estatísticas dos últimos CONFIG['history_size'] pings respondidos"""
+        size = CONFIG['history_size']
         w = tk.Toplevel(self.root)
-        w.title("Estatísticas (1h)")
+        w.title(f"Estatísticas ({size / 3600:g}h)")
         w.configure(bg="black")
-        w.geometry("400x200")
+        w.geometry("480x300")
         
-        lbl_header = tk.Label(w, text="Resumo dos últimos 3600 pacotes", bg="black", fg="#00BFFF", font=("Arial", 10, "bold"))
+        lbl_header = tk.Label(w, text=f"Resumo dos últimos {size} pacotes", bg="black", fg="#00BFFF", font=("Arial", 10, "bold"))
         lbl_header.pack(pady=10)
 
         for g, t in zip(self.gauges, self.titles):
             h = g.ping_history
-            if h:
-                avg = sum(h) / len(h)
-                txt = f"{t}: Min={min(h)}ms | Méd={avg:.1f}ms | Max={max(h)}ms"
+            if h.validas:
+                r = g.fluxo.resumo()
+                txt = (f"{t}: Min={h.minimo():.0f}ms | Méd={h.media():.1f}ms | Max={h.maximo():.0f}ms | Desv={h.desvio():.1f}ms\n"
+                       f"EWMA={r['ewma']:.1f}ms | Jitter={r['jitter'] or 0:.1f}ms | Perda={r['perda_janela']:.1f}% | "
+                       f"p50={r['p50']:.0f} p95={r['p95']:.0f} p99={r['p99']:.0f}ms")
             else:
                 txt = f"{t}: Sem dados suficientes"
             
-            tk.Label(w, text=txt, bg="black", fg="white", font=("Arial", 9)).pack(pady=5, padx=10, anchor="w")
+            tk.Label(w, text=txt, bg="black", fg="white", font=("Arial", 9), justify="left").pack(pady=5, padx=10, anchor="w")
 
     def _ping_host(self, ip):
         if ip in [None, "...", "Erro", "?"]:
@@ -556,16 +591,27 @@ class PingApp:
 
         fields = [
             add_field("Min Var (ms):", 'min_ms_trigger'),
-            add_field("Min Var (%):", 'var_pct_trigger')
+            add_field("Min Var (%):", 'var_pct_trigger'),
+            add_field("Histórico (s):", 'history_size')
         ]
 
         def save():
             try:
-                CONFIG['min_ms_trigger'] = int(fields[0][0].get())
-                CONFIG['var_pct_trigger'] = float(fields[1][0].get())
-                w.destroy()
+                min_ms = int(fields[0][0].get())
+                var_pct = float(fields[1][0].get())
+                history = int(fields[2][0].get())
             except ValueError:
                 messagebox.showerror("Erro", "Use apenas números.")
+                return
+            if not 1 <= history <= MAX_HISTORY_SIZE:
+                messagebox.showerror("Erro", f"Histórico entre 1 e {MAX_HISTORY_SIZE} segundos.")
+                return
+            CONFIG['min_ms_trigger'] = min_ms
+            CONFIG['var_pct_trigger'] = var_pct
+            if history != CONFIG['history_size']:
+                CONFIG['history_size'] = history
+                for g in self.gauges: g.resize_history(history)
+            w.destroy()
         
         ttk.Button(w, text="Salvar", command=save).pack(pady=10)
 
@@ -577,7 +623,11 @@ class PingApp:
         self.running = False
         self.root.destroy()
 
-if __name__ == "__main__":
+def main():
+    _load_streaming_stats()
     root = tk.Tk()
     app = PingApp(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
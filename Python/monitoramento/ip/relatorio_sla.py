@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Relatório de disponibilidade (SLA) dos IPs monitorados pelo indinet.py.
+
+Conforme as transições são gravadas em logs_status, o GravadorStatus chama
+registrar_transicoes(), que mantém duas tabelas derivadas na mesma transação:
+
+- quedas: um intervalo (início, fim, duração) por queda, aberto até o IP voltar;
+- disponibilidade_dia: segundos offline por servidor e dia, somados quando a
+  queda termina (quedas que atravessam a meia-noite são divididas).
+
+Os relatórios leem os dias inteiros do agregado diário e só as pontas do
+intervalo nas quedas, pelos índices, sem varrer logs_status. Como os meses
+antigos de logs_status são arquivados (retencao.py), o primeiro registro de
+cada servidor fica guardado em primeiro_registro.
+
+Exemplos:
+    python relatorio_sla.py --inicio 2026-10-01 --fim 2026-11-01
+    python relatorio_sla.py --servidor 186.232.8.22 --inicio 2026-10-18 --fim 2026-10-19 --quedas
+"""
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+
+FORMATO = '%Y-%m-%d %H:%M:%S'
+TABELA_LOGS = "logs_status"
+
+def inicializar_tabelas(conn, tabela_logs=TABELA_LOGS):
+    nova = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quedas'").fetchone() is None
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_servidor_horario ON {tabela_logs}(servidor, horario)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quedas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            servidor TEXT NOT NULL,
+            inicio DATETIME NOT NULL,
+            fim DATETIME,
+            duracao REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quedas_servidor_inicio ON quedas(servidor, inicio)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_quedas_servidor_fim ON quedas(servidor, fim)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS primeiro_registro (
+            servidor TEXT PRIMARY KEY,
+            horario DATETIME NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS disponibilidade_dia (
+            servidor TEXT NOT NULL,
+            dia TEXT NOT NULL,
+            segundos_offline REAL NOT NULL,
+            PRIMARY KEY (servidor, dia)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+    # Banco anterior a este módulo: materializa as quedas a partir do histórico uma única vez
+    if nova and conn.execute(f"SELECT 1 FROM {tabela_logs} LIMIT 1").fetchone() is not None:
+        with conn:
+            linhas = conn.execute(f"SELECT servidor, horario, status FROM {tabela_logs} "
+                                  f"ORDER BY servidor, horario, id")
+            registrar_transicoes(conn, linhas.fetchall())
+
+def _dividir_por_dia(inicio, fim):
+    """[(dia 'AAAA-MM-DD', segundos)] do intervalo, cortado na meia-noite."""
+    partes = []
+    while inicio < fim:
+        meia_noite = datetime.combine(inicio.date() + timedelta(days=1), datetime.min.time())
+        corte = min(fim, meia_noite)
+        partes.append((inicio.strftime('%Y-%m-%d'), (corte - inicio).total_seconds()))
+        inicio = corte
+    return partes
+
+def registrar_transicoes(conn, linhas):
+    """Atualiza quedas e agregados diários a partir de (servidor, horário, status) já gravados.
+
+    Deve ser chamada dentro da transação que gravou as linhas, na ordem em que
+    foram gravadas.
+    """
+    for servidor, horario, status in linhas:
+        aberta = conn.execute("SELECT id, inicio FROM quedas WHERE servidor = ? AND fim IS NULL",
+                              (servidor,)).fetchone()
+        if not status:
+            if aberta is None:
+                conn.execute("INSERT INTO quedas (servidor, inicio) VALUES (?, ?)", (servidor, horario))
+            continue
+        if aberta is None:
+            continue
+        id_queda, inicio = aberta
+        inicio_dt = datetime.strptime(inicio, FORMATO)
+        fim_dt = datetime.strptime(horario, FORMATO)
+        conn.execute("UPDATE quedas SET fim = ?, duracao = ? WHERE id = ?",
+                     (horario, (fim_dt - inicio_dt).total_seconds(), id_queda))
+        conn.executemany("""
+            INSERT INTO disponibilidade_dia (servidor, dia, segundos_offline) VALUES (?, ?, ?)
+            ON CONFLICT (servidor, dia) DO UPDATE SET segundos_offline = segundos_offline + excluded.segundos_offline
+        """, [(servidor, dia, segundos) for dia, segundos in _dividir_por_dia(inicio_dt, fim_dt)])
+
+def guardar_primeiros_registros(conn, tabela_logs=TABELA_LOGS):
+    """Guarda o primeiro registro de cada servidor antes de logs_status perder meses antigos."""
+    conn.execute(f"""
+        INSERT OR IGNORE INTO primeiro_registro (servidor, horario)
+        SELECT servidor, MIN(horario) FROM {tabela_logs} GROUP BY servidor
+    """)
+
+def _primeiro_registro(conn, servidor):
+    return conn.execute(f"""
+        SELECT MIN(horario) FROM (
+            SELECT MIN(horario) AS horario FROM {TABELA_LOGS} WHERE servidor = ?
+            UNION ALL
+            SELECT horario FROM primeiro_registro WHERE servidor = ?
+        )
+    """, (servidor, servidor)).fetchone()[0]
+
+def _quedas_no_intervalo(conn, servidor, inicio, fim, agora):
+    """Quedas que se sobrepõem a [inicio, fim), da mais recente para a mais antiga.
+
+    Percorre o índice (servidor, inicio) de trás para frente e para na
+    primeira queda que terminou antes do intervalo (as quedas de um servidor
+    não se sobrepõem).
+    """
+    cursor = conn.execute("""
+        SELECT inicio, fim, duracao FROM quedas
+        WHERE servidor = ? AND inicio < ?
+        ORDER BY inicio DESC
+    """, (servidor, fim.strftime(FORMATO)))
+    for q_inicio, q_fim, duracao in cursor:
+        q_inicio = datetime.strptime(q_inicio, FORMATO)
+        q_fim = datetime.strptime(q_fim, FORMATO) if q_fim else None
+        if q_fim is not None and q_fim <= inicio:
+            break
+        yield q_inicio, q_fim, duracao
+
+def _sobreposicao(q_inicio, q_fim, inicio, fim):
+    return max(0.0, (min(q_fim, fim) - max(q_inicio, inicio)).total_seconds())
+
+def segundos_offline(conn, servidor, inicio, fim, agora=None):
+    """Segundos offline em [inicio, fim): dias inteiros pelo agregado, pontas pelas quedas."""
+    agora = agora or datetime.now()
+    primeiro_dia = datetime.combine(inicio.date(), datetime.min.time())
+    if primeiro_dia < inicio:
+        primeiro_dia += timedelta(days=1)
+    ultimo_dia = datetime.combine(fim.date(), datetime.min.time())
+    if primeiro_dia >= ultimo_dia:
+        trechos = [(inicio, fim)]
+        total = 0.0
+    else:
+        trechos = [(inicio, primeiro_dia), (ultimo_dia, fim)]
+        total = conn.execute("""
+            SELECT COALESCE(SUM(segundos_offline), 0) FROM disponibilidade_dia
+            WHERE servidor = ? AND dia >= ? AND dia < ?
+        """, (servidor, primeiro_dia.strftime('%Y-%m-%d'), ultimo_dia.strftime('%Y-%m-%d'))).fetchone()[0]
+        # A queda ainda aberta só entra no agregado quando termina
+        aberta = conn.execute("SELECT inicio FROM quedas WHERE servidor = ? AND fim IS NULL",
+                              (servidor,)).fetchone()
+        if aberta:
+            total += _sobreposicao(datetime.strptime(aberta[0], FORMATO), agora, primeiro_dia, ultimo_dia)
+    for de, ate in trechos:
+        if de >= ate:
+            continue
+        for q_inicio, q_fim, _ in _quedas_no_intervalo(conn, servidor, de, ate, agora):
+            total += _sobreposicao(q_inicio, q_fim or agora, de, ate)
+    return total
+
+def relatorio(conn, servidor, inicio, fim, agora=None):
+    """Disponibilidade de um servidor no intervalo.
+
+    O intervalo é limitado ao período em que o servidor foi monitorado (do
+    primeiro registro até agora). Devolve um dicionário com uptime (%),
+    segundos offline, número de quedas e MTTR (s, média das quedas que
+    terminaram no intervalo).
+    """
+    agora = agora or datetime.now()
+    primeiro = _primeiro_registro(conn, servidor)
+    if primeiro is None:
+        return None
+    inicio = max(inicio, datetime.strptime(primeiro, FORMATO))
+    fim = min(fim, agora)
+    if fim <= inicio:
+        return None
+    offline = segundos_offline(conn, servidor, inicio, fim, agora)
+    quedas, mttr = conn.execute("""
+        SELECT COUNT(*), AVG(duracao) FROM quedas
+        WHERE servidor = ? AND fim >= ? AND fim < ?
+    """, (servidor, inicio.strftime(FORMATO), fim.strftime(FORMATO))).fetchone()
+    periodo = (fim - inicio).total_seconds()
+    return {
+        'servidor': servidor,
+        'inicio': inicio,
+        'fim': fim,
+        'uptime': 100.0 * (1 - offline / periodo),
+        'offline': offline,
+        'quedas': quedas,
+        'mttr': mttr,
+    }
+
+def listar_quedas(conn, servidor, inicio, fim, agora=None):
+    """Quedas que tocam o intervalo, em ordem cronológica: [(início, fim ou None, duração em s)]."""
+    agora = agora or datetime.now()
+    quedas = [(q_inicio, q_fim, duracao if duracao is not None else (agora - q_inicio).total_seconds())
+              for q_inicio, q_fim, duracao in _quedas_no_intervalo(conn, servidor, inicio, fim, agora)]
+    quedas.reverse()
+    return quedas
+
+def _formatar_duracao(segundos):
+    duracao = timedelta(seconds=int(segundos))
+    horas, resto = divmod(duracao.seconds, 3600)
+    minutos, segs = divmod(resto, 60)
+    return f"{duracao.days:02d} {horas:02d}:{minutos:02d}:{segs:02d}"
+
+def _data(texto):
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"data inválida: {texto}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Disponibilidade dos IPs monitorados pelo indinet.py.")
+    parser.add_argument('--db', default="monitoramento_ips.db")
+    parser.add_argument('--servidor', help="IP (padrão: todos os que têm registros)")
+    parser.add_argument('--inicio', type=_data, required=True, help="AAAA-MM-DD [HH:MM[:SS]]")
+    parser.add_argument('--fim', type=_data, required=True, help="AAAA-MM-DD [HH:MM[:SS]]")
+    parser.add_argument('--quedas', action='store_true', help="Lista também cada queda.")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        inicializar_tabelas(conn)
+        if args.servidor:
+            servidores = [args.servidor]
+        else:
+            # Percorre o índice (servidor, horario) pulando de servidor em servidor
+            servidores = [linha[0] for linha in conn.execute(
+                f"SELECT DISTINCT servidor FROM {TABELA_LOGS} UNION SELECT servidor FROM primeiro_registro")]
+        for servidor in servidores:
+            r = relatorio(conn, servidor, args.inicio, args.fim)
+            if r is None:
+                print(f"{servidor}: sem registros no intervalo")
+                continue
+            mttr = _formatar_duracao(r['mttr']) if r['mttr'] is not None else "-"
+            print(f"{servidor}: uptime {r['uptime']:.3f}% | offline {_formatar_duracao(r['offline'])} | "
+                  f"{r['quedas']} quedas | MTTR {mttr} (dd hh:mm:ss)")
+            if args.quedas:
+                for q_inicio, q_fim, duracao in listar_quedas(conn, servidor, args.inicio, args.fim):
+                    fim_txt = q_fim.strftime(FORMATO) if q_fim else "em andamento"
+                    print(f"    {q_inicio.strftime(FORMATO)} -> {fim_txt} ({_formatar_duracao(duracao)})")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Reprodução determinística de traços de RTT pela máquina de estados do MonitorIP.
+
+O monitor recebe um relógio controlado pelo traço (cada amostra avança o
+relógio até o seu horário) e destinos em memória no lugar do banco, do
+WhatsApp e do terminal, então um mês de sondas roda em segundos e sempre
+produz as mesmas transições e notificações.
+
+Formatos de traço:
+- CSV com cabeçalho horario,servidor,rtt_ms (horário epoch ou
+  AAAA-MM-DD HH:MM:SS; rtt_ms vazio = sonda perdida);
+- binário: MAGICO, número de IPs (uint16), cada IP (uint8 tamanho + texto)
+  e registros '<dHf' (horário epoch, índice do IP, RTT em ms; NaN = perda).
+
+Exemplos:
+    python reproducao.py gerar mes.trc --ips 4 --dias 30
+    python reproducao.py executar mes.trc --transicoes
+"""
+import argparse
+import csv
+import logging
+import math
+import random
+import struct
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+import indinet
+from notificacoes import Alerta
+
+MAGICO = b'RTT1'
+REGISTRO = struct.Struct('<dHf')
+LOTE_LEITURA = 4096          # Registros lidos do arquivo binário por vez
+FORMATO = '%Y-%m-%d %H:%M:%S'
+
+Transicao = namedtuple('Transicao', 'ip horario status')
+Resultado = namedtuple('Resultado', 'amostras segundos transicoes alertas linhas')
+
+class RelogioReproducao:
+    """Relógio do monitor durante a reprodução: devolve o horário da amostra atual."""
+    def __init__(self, agora=0.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+class GravadorMemoria:
+    """Substitui o GravadorStatus: guarda as transições e conta as linhas agregadas por SQL."""
+    def __init__(self):
+        self.transicoes = []
+        self.linhas = Counter()
+
+    def salvar_log_status(self, ip, horario, status):
+        self.transicoes.append(Transicao(ip, horario, status))
+
+    def enfileirar(self, sql, parametros):
+        self.linhas[sql] += 1
+
+    def parar(self):
+        pass
+
+class NotificacoesMemoria:
+    """Substitui o DespachanteNotificacoes: guarda cada alerta pedido pelo monitor."""
+    def __init__(self):
+        self.alertas = []
+
+    def alertar(self, ip, estado, desde, mensagem):
+        self.alertas.append(Alerta(ip, estado, desde, mensagem))
+
+    def parar(self):
+        pass
+
+def _horario(texto):
+    try:
+        return float(texto)
+    except ValueError:
+        return datetime.strptime(texto, FORMATO).timestamp()
+
+def ler_csv(caminho):
+    """(ips, amostras): IPs na ordem em que aparecem e gerador de (horário, ip, rtt ou None)."""
+    with open(caminho, newline='', encoding='utf-8') as f:
+        ips = list(dict.fromkeys(linha['servidor'] for linha in csv.DictReader(f)))
+
+    def amostras():
+        with open(caminho, newline='', encoding='utf-8') as f:
+            for linha in csv.DictReader(f):
+                rtt = linha['rtt_ms']
+                yield _horario(linha['horario']), linha['servidor'], float(rtt) if rtt else None
+    return ips, amostras()
+
+def ler_binario(caminho):
+    f = open(caminho, 'rb')
+    if f.read(len(MAGICO)) != MAGICO:
+        f.close()
+        raise ValueError(f"{caminho} não é um traço binário")
+    ips = []
+    for _ in range(struct.unpack('<H', f.read(2))[0]):
+        tamanho = f.read(1)[0]
+        ips.append(f.read(tamanho).decode('utf-8'))
+
+    def amostras():
+        with f:
+            while True:
+                bloco = f.read(REGISTRO.size * LOTE_LEITURA)
+                if not bloco:
+                    return
+                for horario, indice, rtt in REGISTRO.iter_unpack(bloco):
+                    yield horario, ips[indice], None if rtt != rtt else rtt
+    return ips, amostras()
+
+def abrir_traco(caminho):
+    with open(caminho, 'rb') as f:
+        binario = f.read(len(MAGICO)) == MAGICO
+    return ler_binario(caminho) if binario else ler_csv(caminho)
+
+def gravar_binario(caminho, ips, amostras):
+    indices = {ip: i for i, ip in enumerate(ips)}
+    total = 0
+    with open(caminho, 'wb') as f:
+        f.write(MAGICO + struct.pack('<H', len(ips)))
+        for ip in ips:
+            dados = ip.encode('utf-8')
+            f.write(bytes([len(dados)]) + dados)
+        lote = bytearray()
+        for horario, ip, rtt in amostras:
+            lote += REGISTRO.pack(horario, indices[ip], math.nan if rtt is None else rtt)
+            total += 1
+            if len(lote) >= REGISTRO.size * LOTE_LEITURA:
+                f.write(lote)
+                lote.clear()
+        f.write(lote)
+    return total
+
+def gerar_sintetico(ips, dias, intervalo=1.0, rtt=20.0, perda=0.001, quedas_por_dia=1.0,
+                    queda_min=10.0, queda_max=900.0, inicio=None, semente=0):
+    """Amostras de `dias` dias para os IPs, uma a cada `intervalo` s por IP, em ordem de horário.
+
+    RTT com ruído log-normal em torno de `rtt`, perdas isoladas com
+    probabilidade `perda` e quedas (sequências de perdas) de duração
+    uniforme entre queda_min e queda_max, em média quedas_por_dia por IP.
+    """
+    aleatorio = random.Random(semente)
+    inicio = datetime(2026, 1, 1).timestamp() if inicio is None else inicio
+    passos = int(dias * 86400 / intervalo)
+    chance_queda = quedas_por_dia * intervalo / 86400
+    fim_queda = {ip: -1.0 for ip in ips}
+    for passo in range(passos):
+        base = inicio + passo * intervalo
+        for i, ip in enumerate(ips):
+            horario = base + i * intervalo / len(ips)
+            if horario < fim_queda[ip]:
+                yield horario, ip, None
+                continue
+            if aleatorio.random() < chance_queda:
+                fim_queda[ip] = horario + aleatorio.uniform(queda_min, queda_max)
+                yield horario, ip, None
+            elif aleatorio.random() < perda:
+                yield horario, ip, None
+            else:
+                yield horario, ip, rtt * aleatorio.lognormvariate(0, 0.2)
+
+def reproduzir(ips, amostras, so_estado=False):
+    """Passa as amostras pelo MonitorIP com relógio do traço e destinos em memória.
+
+    Por padrão cada amostra segue o caminho de uma sonda real
+    (registrar_resultado: contadores, estatísticas, série e estado); com
+    `so_estado` só a máquina de estados online/offline, bem mais rápido. O
+    log do monitor fica desligado durante a reprodução (as transições vão
+    para o Resultado, não para monitoramento_ips.log).
+    """
+    relogio = RelogioReproducao()
+    gravador = GravadorMemoria()
+    notificacoes = NotificacoesMemoria()
+    logging.disable(logging.CRITICAL)
+    try:
+        monitor = indinet.MonitorIP(ips=ips, relogio=relogio, gravador=gravador,
+                                    notificacoes=notificacoes, terminal=lambda texto: None)
+        total = 0
+        inicio = time.perf_counter()
+        if so_estado:
+            processar = monitor.processar_resultado_ping
+            for horario, ip, rtt in amostras:
+                processar(ip, rtt, horario)
+                total += 1
+        else:
+            registrar = monitor.registrar_resultado
+            for horario, ip, rtt in amostras:
+                relogio.agora = horario
+                registrar(ip, rtt)
+                total += 1
+        monitor.parar_consumidores()
+        segundos = time.perf_counter() - inicio
+    finally:
+        logging.disable(logging.NOTSET)
+    return Resultado(total, segundos, gravador.transicoes, notificacoes.alertas, gravador.linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera e reproduz traços de RTT pelo monitor do indinet.py.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    gerar = sub.add_parser('gerar', help="Cria um traço sintético binário.")
+    gerar.add_argument('saida')
+    gerar.add_argument('--ips', type=int, default=4, help="Quantidade de IPs (192.0.2.x)")
+    gerar.add_argument('--dias', type=float, default=30)
+    gerar.add_argument('--intervalo', type=float, default=indinet.PING_INTERVAL)
+    gerar.add_argument('--perda', type=float, default=0.001, help="Probabilidade de perda isolada")
+    gerar.add_argument('--quedas-por-dia', type=float, default=1.0)
+    gerar.add_argument('--semente', type=int, default=0)
+    executar = sub.add_parser('executar', help="Reproduz um traço (CSV ou binário) e mede a vazão.")
+    executar.add_argument('traco')
+    executar.add_argument('--transicoes', action='store_true', help="Lista as transições e alertas.")
+    executar.add_argument('--so-estado', action='store_true',
+                          help="Só a máquina de estados (sem estatísticas nem série de latência).")
+    args = parser.parse_args()
+
+    if args.comando == 'gerar':
+        ips = [f"192.0.2.{i + 1}" for i in range(args.ips)]
+        total = gravar_binario(args.saida, ips, gerar_sintetico(
+            ips, args.dias, args.intervalo, perda=args.perda,
+            quedas_por_dia=args.quedas_por_dia, semente=args.semente))
+        print(f"{total} amostras de {len(ips)} IPs em {args.saida}")
+        return
+
+    ips, amostras = abrir_traco(args.traco)
+    r = reproduzir(ips, amostras, args.so_estado)
+    if args.transicoes:
+        for t in r.transicoes:
+            print(f"{t.horario.strftime(FORMATO)} {t.ip} {t.status}")
+        for a in r.alertas:
+            print(f"ALERTA {a.ip} {a.estado} desde {a.desde.strftime(FORMATO)}")
+    print(f"{r.amostras} amostras de {len(ips)} IPs em {r.segundos:.2f} s "
+          f"({r.amostras / r.segundos:,.0f} amostras/s)")
+    print(f"{len(r.transicoes)} transições, {len(r.alertas)} alertas, "
+          f"{sum(r.linhas.values())} linhas agregadas de latência")
+
+if __name__ == "__main__":
+    main()
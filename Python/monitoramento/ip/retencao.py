@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Retenção do banco e do CSV do indinet.py.
+
+O mês é a unidade de retenção: quando um mês de uma tabela fica mais velho
+que o prazo da tabela (RETENCAO), ele é exportado inteiro para
+arquivo/<tabela>_<AAAA-MM>.csv.gz, registrado em arquivamentos e só então
+apagado do banco, servidor a servidor em transações curtas. As páginas
+liberadas voltam ao sistema por PRAGMA incremental_vacuum, aos poucos.
+
+Exportação, exclusão e vácuo gastam de um orçamento de E/S (bytes por
+segundo), então a manutenção roda em segundo plano sem disputar o disco com
+o monitoramento. Os agregados usados pelos relatórios de SLA (quedas,
+disponibilidade_dia) não expiram, e as consultas da série só varrem os meses
+retidos, então os relatórios continuam rápidos numa instalação de anos.
+
+O CSV de redundância é girado por mês pelo GravadorStatus
+(monitoramento_ips_AAAA-MM.csv); aqui os meses fechados são comprimidos no
+arquivo e os mais velhos que MESES_CSV são apagados (o banco e os arquivos
+têm os mesmos registros).
+
+Execução manual de um ciclo:
+    python retencao.py --db monitoramento_ips.db
+    python retencao.py --listar
+    python retencao.py --converter    (banco criado antes do vácuo incremental; monitor parado)
+"""
+import argparse
+import csv
+import gzip
+import io
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import relatorio_sla
+
+DIR_ARQUIVO = "arquivo"
+# tabela -> (coluna de tempo, 'texto' = DATETIME 'AAAA-MM-DD HH:MM:SS' ou 'epoch', meses retidos)
+RETENCAO = {
+    'logs_status': ('horario', 'texto', 12),
+    'serie_minuto': ('inicio', 'epoch', 2),
+    'serie_hora': ('inicio', 'epoch', 24),
+}
+MESES_CSV = 3                    # Meses de CSV girado mantidos no arquivo
+ORCAMENTO_IO = 2 * 1024 * 1024   # Bytes por segundo para exportar, apagar e aspirar
+PAGINAS_POR_PASSO = 64           # Páginas devolvidas por incremental_vacuum a cada passo
+INTERVALO_RETENCAO = 6 * 3600    # Segundos entre ciclos em segundo plano
+ATRASO_INICIAL = 120             # O primeiro ciclo espera o monitor estabilizar
+
+class Interrompido(Exception):
+    pass
+
+class OrcamentoIO:
+    """Balde de fichas: gastar() dorme o necessário para manter a taxa em bytes/s."""
+    def __init__(self, bytes_por_segundo, parar=None):
+        self.taxa = bytes_por_segundo
+        self.parar = parar or threading.Event()
+        self.saldo = float(bytes_por_segundo)
+        self.ultimo = time.monotonic()
+
+    def gastar(self, n):
+        agora = time.monotonic()
+        self.saldo = min(self.taxa, self.saldo + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+        self.saldo -= n
+        if self.saldo < 0:
+            if self.parar.wait(-self.saldo / self.taxa):
+                raise Interrompido()
+
+def _mes_seguinte(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def _limite(ano, mes, tipo):
+    inicio = datetime(ano, mes, 1)
+    return inicio.strftime('%Y-%m-%d %H:%M:%S') if tipo == 'texto' else int(inicio.timestamp())
+
+def _mes_de(valor, tipo):
+    dt = datetime.strptime(valor[:19], '%Y-%m-%d %H:%M:%S') if tipo == 'texto' else datetime.fromtimestamp(valor)
+    return dt.year, dt.month
+
+def _corte(meses, agora=None):
+    """(ano, mês) do mês mais antigo retido."""
+    agora = agora or datetime.now()
+    total = agora.year * 12 + agora.month - 1 - meses
+    return total // 12, total % 12 + 1
+
+def inicializar_tabelas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS arquivamentos (
+            tabela TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            arquivo TEXT NOT NULL,
+            linhas INTEGER NOT NULL,
+            concluido INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabela, mes)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+def _existe(conn, tabela):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone() is not None
+
+def _servidores(conn, tabela):
+    """Servidores da tabela, pulando de um ao próximo pelo índice (servidor, tempo).
+
+    Um SELECT DISTINCT varreria a tabela inteira; aqui cada passo é uma busca
+    no índice, então o custo depende do número de servidores, não de linhas.
+    """
+    return [linha[0] for linha in conn.execute(f"""
+        WITH RECURSIVE s(servidor) AS (
+            SELECT MIN(servidor) FROM {tabela}
+            UNION ALL
+            SELECT (SELECT MIN(servidor) FROM {tabela} WHERE servidor > s.servidor) FROM s
+            WHERE s.servidor IS NOT NULL
+        )
+        SELECT servidor FROM s WHERE servidor IS NOT NULL
+    """)]
+
+def meses_expirados(conn, tabela, agora=None):
+    """Meses (ano, mês) da tabela mais velhos que o prazo de retenção, do mais antigo ao mais novo."""
+    coluna, tipo, meses = RETENCAO[tabela]
+    if not _existe(conn, tabela):
+        return []
+    # Servidores e MIN por servidor são buscas na chave (servidor, tempo); um MIN global varreria a série
+    minimos = [conn.execute(f"SELECT MIN({coluna}) FROM {tabela} WHERE servidor = ?", (servidor,)).fetchone()[0]
+               for servidor in _servidores(conn, tabela)]
+    minimos = [m for m in minimos if m is not None]
+    if not minimos:
+        return []
+    ano, mes = _mes_de(min(minimos), tipo)
+    corte = _corte(meses, agora)
+    expirados = []
+    while (ano, mes) < corte:
+        expirados.append((ano, mes))
+        ano, mes = _mes_seguinte(ano, mes)
+    return expirados
+
+def _exportar(conn, tabela, ano, mes, servidores, caminho, orcamento):
+    """Grava as linhas do mês em `caminho` (gzip CSV com cabeçalho); devolve o número de linhas."""
+    coluna, tipo, _ = RETENCAO[tabela]
+    inicio, fim = _limite(ano, mes, tipo), _limite(*_mes_seguinte(ano, mes), tipo)
+    linhas = 0
+    temporario = caminho + '.tmp'
+    with gzip.open(temporario, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        cursor = conn.execute(f"SELECT * FROM {tabela} LIMIT 0")
+        writer.writerow([d[0] for d in cursor.description])
+        for servidor in servidores:
+            cursor = conn.execute(f"SELECT * FROM {tabela} WHERE servidor = ? AND {coluna} >= ? AND {coluna} < ? "
+                                  f"ORDER BY {coluna}", (servidor, inicio, fim))
+            while True:
+                bloco = cursor.fetchmany(5000)
+                if not bloco:
+                    break
+                texto = io.StringIO()
+                csv.writer(texto).writerows(bloco)
+                f.write(texto.getvalue())
+                linhas += len(bloco)
+                orcamento.gastar(len(texto.getvalue()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+    return linhas
+
+def arquivar_mes(conn, tabela, ano, mes, diretorio=DIR_ARQUIVO, orcamento=None):
+    """Exporta e apaga um mês da tabela. Retomável: se o arquivo já foi gravado, só termina a exclusão."""
+    orcamento = orcamento or OrcamentoIO(ORCAMENTO_IO)
+    coluna, tipo, _ = RETENCAO[tabela]
+    rotulo = f"{ano:04d}-{mes:02d}"
+    inicio, fim = _limite(ano, mes, tipo), _limite(*_mes_seguinte(ano, mes), tipo)
+    servidores = _servidores(conn, tabela)
+    if tabela == relatorio_sla.TABELA_LOGS:
+        with conn:
+            relatorio_sla.guardar_primeiros_registros(conn, tabela)
+    registro = conn.execute("SELECT arquivo, linhas FROM arquivamentos WHERE tabela = ? AND mes = ?",
+                            (tabela, rotulo)).fetchone()
+    if registro is None:
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f"{tabela}_{rotulo}.csv.gz")
+        linhas = _exportar(conn, tabela, ano, mes, servidores, caminho, orcamento)
+        with conn:
+            conn.execute("INSERT INTO arquivamentos (tabela, mes, arquivo, linhas) VALUES (?, ?, ?, ?)",
+                         (tabela, rotulo, caminho, linhas))
+    else:
+        caminho, linhas = registro
+    # O arquivo tem o mês inteiro; apagar por servidor mantém cada transação curta
+    for servidor in servidores:
+        with conn:
+            apagadas = conn.execute(f"DELETE FROM {tabela} WHERE servidor = ? AND {coluna} >= ? AND {coluna} < ?",
+                                    (servidor, inicio, fim)).rowcount
+        orcamento.gastar(apagadas * 64)
+    with conn:
+        conn.execute("UPDATE arquivamentos SET concluido = 1 WHERE tabela = ? AND mes = ?", (tabela, rotulo))
+    logging.info(f"Retenção: {tabela} {rotulo} arquivado em {caminho} ({linhas} linhas)")
+    return linhas
+
+def aspirar(conn, orcamento):
+    """Devolve as páginas livres ao sistema em passos pequenos; devolve quantas páginas liberou."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logging.info("Retenção: banco sem vácuo incremental; rode 'python retencao.py --converter' "
+                     "com o monitor parado para devolver o espaço ao disco")
+        return 0
+    tamanho_pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+    liberadas = 0
+    while True:
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not livres:
+            break
+        passo = min(livres, PAGINAS_POR_PASSO)
+        # execute() só dá um passo no pragma (uma página); executescript() vai até o fim
+        conn.executescript(f"PRAGMA incremental_vacuum({passo})")
+        liberadas += passo
+        orcamento.gastar(passo * tamanho_pagina)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return liberadas
+
+def converter_vacuo_incremental(conn):
+    """Bancos criados antes deste módulo precisam de um VACUUM completo, uma única vez.
+
+    O VACUUM bloqueia o banco inteiro; por isso só roda pela linha de comando
+    (--converter), com o monitor parado.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    logging.info("Retenção: convertendo o banco para vácuo incremental (VACUUM único, pode demorar)")
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+def girar_csv(csv_path, diretorio=DIR_ARQUIVO, agora=None, meses=MESES_CSV):
+    """Comprime os CSVs de meses fechados e apaga os comprimidos mais velhos que `meses`."""
+    base, extensao = os.path.splitext(os.path.basename(csv_path))
+    pasta = os.path.dirname(os.path.abspath(csv_path))
+    padrao = re.compile(rf"^{re.escape(base)}_(\d{{4}})-(\d{{2}}){re.escape(extensao)}(\.gz)?$")
+    corte = _corte(meses, agora)
+    os.makedirs(diretorio, exist_ok=True)
+    for pasta_atual in (pasta, os.path.abspath(diretorio)):
+        for nome in sorted(os.listdir(pasta_atual)):
+            m = padrao.match(nome)
+            if not m:
+                continue
+            caminho = os.path.join(pasta_atual, nome)
+            if (int(m.group(1)), int(m.group(2))) < corte:
+                os.remove(caminho)
+                logging.info(f"Retenção: {nome} removido")
+            elif not m.group(3):
+                destino = os.path.join(diretorio, nome + '.gz')
+                with open(caminho, 'rb') as origem, gzip.open(destino + '.tmp', 'wb') as saida:
+                    while bloco := origem.read(1 << 20):
+                        saida.write(bloco)
+                os.replace(destino + '.tmp', destino)
+                os.remove(caminho)
+
+def ler_arquivo(caminho):
+    """Linhas de um arquivo exportado: (cabeçalho, iterador de linhas como texto)."""
+    f = gzip.open(caminho, 'rt', newline='', encoding='utf-8')
+    leitor = csv.reader(f)
+    return next(leitor), leitor
+
+def executar_ciclo(db_path, csv_path=None, diretorio=DIR_ARQUIVO, orcamento=None, agora=None):
+    """Um ciclo completo: arquiva os meses expirados, aspira o banco e gira o CSV."""
+    orcamento = orcamento or OrcamentoIO(ORCAMENTO_IO)
+    conn = sqlite3.connect(db_path, timeout=30)
+    arquivados = 0
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        inicializar_tabelas(conn)
+        for tabela in RETENCAO:
+            for ano, mes in meses_expirados(conn, tabela, agora):
+                arquivar_mes(conn, tabela, ano, mes, diretorio, orcamento)
+                arquivados += 1
+        paginas = aspirar(conn, orcamento)
+    finally:
+        conn.close()
+    if csv_path:
+        girar_csv(csv_path, diretorio, agora)
+    if arquivados or paginas:
+        logging.info(f"Retenção: {arquivados} meses arquivados, {paginas} páginas devolvidas")
+    return arquivados, paginas
+
+class ManutencaoRetencao:
+    """Roda executar_ciclo() periodicamente numa thread de baixa prioridade."""
+    def __init__(self, db_path, csv_path=None, diretorio=DIR_ARQUIVO, intervalo=INTERVALO_RETENCAO,
+                 atraso=ATRASO_INICIAL, bytes_por_segundo=ORCAMENTO_IO):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.atraso = atraso
+        self.bytes_por_segundo = bytes_por_segundo
+        self.parado = threading.Event()
+        self.thread = threading.Thread(target=self._executar, name="retencao", daemon=True)
+
+    def iniciar(self):
+        self.thread.start()
+
+    def parar(self):
+        self.parado.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _executar(self):
+        espera = self.atraso
+        while not self.parado.wait(espera):
+            try:
+                executar_ciclo(self.db_path, self.csv_path, self.diretorio,
+                               OrcamentoIO(self.bytes_por_segundo, self.parado))
+            except Interrompido:
+                return
+            except Exception as e:
+                logging.error(f"Erro na retenção: {e}")
+            espera = self.intervalo
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva meses antigos do banco do indinet.py e gira o CSV.")
+    parser.add_argument('--db', default="monitoramento_ips.db")
+    parser.add_argument('--csv', default="monitoramento_ips.csv")
+    parser.add_argument('--arquivo', default=DIR_ARQUIVO, help="Pasta dos arquivos comprimidos")
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_IO / 1024 / 1024, help="MiB/s de E/S")
+    parser.add_argument('--listar', action='store_true', help="Só lista os meses já arquivados.")
+    parser.add_argument('--converter', action='store_true',
+                        help="Converte um banco antigo para vácuo incremental (VACUUM completo; monitor parado).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.listar:
+        conn = sqlite3.connect(args.db)
+        try:
+            inicializar_tabelas(conn)
+            for tabela, mes, arquivo, linhas, concluido in conn.execute(
+                    "SELECT tabela, mes, arquivo, linhas, concluido FROM arquivamentos ORDER BY tabela, mes"):
+                print(f"{tabela:<14} {mes} {linhas:>10} linhas  {arquivo}{'' if concluido else '  (exclusão pendente)'}")
+        finally:
+            conn.close()
+        return
+    if args.converter:
+        conn = sqlite3.connect(args.db)
+        try:
+            converter_vacuo_incremental(conn)
+        finally:
+            conn.close()
+    inicio = time.monotonic()
+    arquivados, paginas = executar_ciclo(args.db, args.csv, args.arquivo,
+                                         OrcamentoIO(args.orcamento * 1024 * 1024))
+    print(f"{arquivados} meses arquivados, {paginas} páginas devolvidas em {time.monotonic() - inicio:.1f}s")
+
+if __name__ == "__main__":
+    main()
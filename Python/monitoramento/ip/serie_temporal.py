@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Série temporal da latência de cada IP monitorado.
+
+Cada IP guarda as amostras mais recentes num anel de tamanho fixo (dois
+array.array: horário e RTT, com NaN para sonda perdida) e acumula os
+agregados do minuto e da hora corrente. Ao virar o minuto/hora, a linha
+agregada (amostras, perdas, min/média/max/p95) é entregue à função de
+gravação, que no indinet.py é a fila do GravadorStatus.
+
+O p95 do minuto é exato (calculado sobre o anel); o da hora vem de um
+histograma logarítmico com erro relativo de até ~5%.
+
+Consulta:
+    python serie_temporal.py --ip 186.232.8.22 --inicio "2026-10-18 14:00" --fim "2026-10-18 15:00"
+"""
+import argparse
+import math
+import sqlite3
+import time
+from array import array
+from datetime import datetime
+
+CAPACIDADE_ANEL = 600      # Amostras brutas mantidas em memória por IP
+MINUTO = 60
+HORA = 3600
+PONTOS_MINIMOS = 24        # Uma consulta usa a tabela horária se ela render pelo menos isso
+
+# Histograma logarítmico do p95 horário: baldes de 5% de 0,1 ms a 60 s
+HIST_MINIMO = 0.1
+HIST_RAZAO = 1.05
+HIST_BALDES = int(math.ceil(math.log(60000 / HIST_MINIMO) / math.log(HIST_RAZAO))) + 1
+
+TABELAS = {MINUTO: 'serie_minuto', HORA: 'serie_hora'}
+
+def inicializar_tabelas(conn):
+    for tabela in TABELAS.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                servidor TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                amostras INTEGER NOT NULL,
+                perdas INTEGER NOT NULL,
+                minimo REAL,
+                media REAL,
+                maximo REAL,
+                p95 REAL,
+                PRIMARY KEY (servidor, inicio)
+            ) WITHOUT ROWID
+        """)
+    conn.commit()
+
+def sql_gravacao(tamanho):
+    """INSERT que soma ao período já gravado (ex.: monitor reiniciado no meio da hora)."""
+    return f"""
+        INSERT INTO {TABELAS[tamanho]} (servidor, inicio, amostras, perdas, minimo, media, maximo, p95)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (servidor, inicio) DO UPDATE SET
+            amostras = amostras + excluded.amostras,
+            perdas = perdas + excluded.perdas,
+            minimo = MIN(COALESCE(minimo, excluded.minimo), COALESCE(excluded.minimo, minimo)),
+            maximo = MAX(COALESCE(maximo, excluded.maximo), COALESCE(excluded.maximo, maximo)),
+            p95 = MAX(COALESCE(p95, excluded.p95), COALESCE(excluded.p95, p95)),
+            media = CASE
+                WHEN excluded.media IS NULL THEN media
+                WHEN media IS NULL THEN excluded.media
+                ELSE (media * (amostras - perdas) + excluded.media * (excluded.amostras - excluded.perdas))
+                     / ((amostras - perdas) + (excluded.amostras - excluded.perdas))
+            END
+    """
+
+SQL_MINUTO = sql_gravacao(MINUTO)
+SQL_HORA = sql_gravacao(HORA)
+
+class _Acumulador:
+    __slots__ = ('inicio', 'amostras', 'perdas', 'soma', 'minimo', 'maximo', 'histograma')
+
+    def __init__(self, com_histograma=False):
+        self.histograma = array('I', bytes(4 * HIST_BALDES)) if com_histograma else None
+        self.reiniciar(None)
+
+    def reiniciar(self, inicio):
+        self.inicio = inicio
+        self.amostras = 0
+        self.perdas = 0
+        self.soma = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        if self.histograma is not None:
+            for i in range(HIST_BALDES):
+                self.histograma[i] = 0
+
+    def adicionar(self, rtt):
+        self.amostras += 1
+        if rtt is None:
+            self.perdas += 1
+            return
+        self.soma += rtt
+        if rtt < self.minimo:
+            self.minimo = rtt
+        if rtt > self.maximo:
+            self.maximo = rtt
+        if self.histograma is not None:
+            balde = 0 if rtt <= HIST_MINIMO else int(math.log(rtt / HIST_MINIMO) / math.log(HIST_RAZAO)) + 1
+            self.histograma[min(balde, HIST_BALDES - 1)] += 1
+
+    def p95_histograma(self):
+        respondidas = self.amostras - self.perdas
+        alvo = math.ceil(0.95 * respondidas)
+        acumulado = 0
+        for balde, contagem in enumerate(self.histograma):
+            acumulado += contagem
+            if acumulado >= alvo:
+                # Meio geométrico do balde, limitado pelos extremos reais
+                valor = HIST_MINIMO * HIST_RAZAO ** (balde - 0.5) if balde else HIST_MINIMO
+                return min(max(valor, self.minimo), self.maximo)
+        return self.maximo
+
+    def linha(self, servidor, p95):
+        respondidas = self.amostras - self.perdas
+        if not respondidas:
+            return (servidor, self.inicio, self.amostras, self.perdas, None, None, None, None)
+        return (servidor, self.inicio, self.amostras, self.perdas,
+                self.minimo, self.soma / respondidas, self.maximo, p95)
+
+class SerieIP:
+    """Anel de amostras brutas e agregados abertos de um IP."""
+    __slots__ = ('servidor', 'horarios', 'valores', 'proximo', 'total', 'minuto', 'hora')
+
+    def __init__(self, servidor, capacidade=CAPACIDADE_ANEL):
+        self.servidor = servidor
+        self.horarios = array('d', bytes(8 * capacidade))
+        self.valores = array('d', [math.nan]) * capacidade
+        self.proximo = 0          # Posição da próxima escrita no anel
+        self.total = 0            # Amostras já registradas (o anel guarda as últimas `capacidade`)
+        self.minuto = _Acumulador()
+        self.hora = _Acumulador(com_histograma=True)
+
+    def registrar(self, horario, rtt, gravar):
+        """Guarda a amostra (rtt None = perda) e fecha minuto/hora que tenham virado."""
+        inicio_minuto = int(horario // MINUTO * MINUTO)
+        if self.minuto.inicio != inicio_minuto:
+            self.fechar_minuto(gravar)
+            self.minuto.reiniciar(inicio_minuto)
+        inicio_hora = int(horario // HORA * HORA)
+        if self.hora.inicio != inicio_hora:
+            self.fechar_hora(gravar)
+            self.hora.reiniciar(inicio_hora)
+
+        self.horarios[self.proximo] = horario
+        self.valores[self.proximo] = math.nan if rtt is None else rtt
+        self.proximo = (self.proximo + 1) % len(self.horarios)
+        self.total += 1
+        self.minuto.adicionar(rtt)
+        self.hora.adicionar(rtt)
+
+    def amostras(self, desde=0.0):
+        """Amostras do anel a partir de `desde`, da mais antiga para a mais nova: [(horário, rtt ou None)]."""
+        capacidade = len(self.horarios)
+        resultado = []
+        for k in range(min(self.total, capacidade)):
+            i = (self.proximo - 1 - k) % capacidade
+            if self.horarios[i] < desde:
+                break
+            valor = self.valores[i]
+            resultado.append((self.horarios[i], None if math.isnan(valor) else valor))
+        resultado.reverse()
+        return resultado
+
+    def fechar_minuto(self, gravar):
+        if self.minuto.inicio is None or not self.minuto.amostras:
+            return
+        rtts = sorted(v for _, v in self.amostras(self.minuto.inicio) if v is not None)
+        p95 = rtts[min(len(rtts) - 1, math.ceil(0.95 * len(rtts)) - 1)] if rtts else None
+        gravar(SQL_MINUTO, self.minuto.linha(self.servidor, p95))
+
+    def fechar_hora(self, gravar):
+        if self.hora.inicio is None or not self.hora.amostras:
+            return
+        p95 = self.hora.p95_histograma() if self.hora.amostras > self.hora.perdas else None
+        gravar(SQL_HORA, self.hora.linha(self.servidor, p95))
+
+class SeriesLatencia:
+    """Séries de todos os IPs; `gravar(sql, parametros)` recebe as linhas agregadas."""
+    def __init__(self, ips, gravar, capacidade=CAPACIDADE_ANEL):
+        self.gravar = gravar
+        self.series = {ip: SerieIP(ip, capacidade) for ip in ips}
+
+    def registrar(self, ip, rtt, horario=None):
+        self.series[ip].registrar(time.time() if horario is None else horario, rtt, self.gravar)
+
+    def recentes(self, ip, segundos):
+        return self.series[ip].amostras(time.time() - segundos)
+
+    def fechar(self):
+        """Entrega os períodos ainda abertos (parciais) para gravação."""
+        for serie in self.series.values():
+            serie.fechar_minuto(self.gravar)
+            serie.fechar_hora(self.gravar)
+            serie.minuto.reiniciar(None)
+            serie.hora.reiniciar(None)
+
+def consultar(conn, servidor, inicio, fim, resolucao=None):
+    """Agregados de um IP entre `inicio` e `fim` (epoch).
+
+    Sem `resolucao`, usa a tabela mais grossa que ainda dá PONTOS_MINIMOS
+    pontos no intervalo. Devolve (resolução em segundos, linhas), cada linha
+    (início, amostras, perda %, mínimo, média, máximo, p95).
+    """
+    if resolucao is None:
+        resolucao = HORA if (fim - inicio) / HORA >= PONTOS_MINIMOS else MINUTO
+    linhas = conn.execute(f"""
+        SELECT inicio, amostras, 100.0 * perdas / amostras, minimo, media, maximo, p95
+        FROM {TABELAS[resolucao]}
+        WHERE servidor = ? AND inicio >= ? AND inicio < ?
+        ORDER BY inicio
+    """, (servidor, int(inicio // resolucao * resolucao), fim)).fetchall()
+    return resolucao, linhas
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta a série de latência gravada pelo indinet.py.")
+    parser.add_argument('--db', default="monitoramento_ips.db")
+    parser.add_argument('--ip', required=True)
+    parser.add_argument('--inicio', required=True, help="AAAA-MM-DD HH:MM (horário local)")
+    parser.add_argument('--fim', required=True, help="AAAA-MM-DD HH:MM (horário local)")
+    parser.add_argument('--resolucao', choices=['minuto', 'hora'])
+    args = parser.parse_args()
+
+    inicio = datetime.strptime(args.inicio, '%Y-%m-%d %H:%M').timestamp()
+    fim = datetime.strptime(args.fim, '%Y-%m-%d %H:%M').timestamp()
+    resolucao = {'minuto': MINUTO, 'hora': HORA}.get(args.resolucao)
+    conn = sqlite3.connect(args.db)
+    try:
+        resolucao, linhas = consultar(conn, args.ip, inicio, fim, resolucao)
+    finally:
+        conn.close()
+    formato = '%Y-%m-%d %H:%M'
+    print(f"{args.ip} - {'por hora' if resolucao == HORA else 'por minuto'}")
+    print(f"{'início':<16} {'amostras':>8} {'perda %':>8} {'min':>8} {'média':>8} {'max':>8} {'p95':>8}")
+    for inicio_p, amostras, perda, minimo, media, maximo, p95 in linhas:
+        valores = ' '.join(f"{v:>8.2f}" if v is not None else f"{'-':>8}" for v in (minimo, media, maximo, p95))
+        print(f"{datetime.fromtimestamp(inicio_p).strftime(formato):<16} {amostras:>8} {perda:>8.2f} {valores}")
+
+if __name__ == "__main__":
+    main()
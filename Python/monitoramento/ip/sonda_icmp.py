@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Ping ICMP assíncrono dentro do processo, sem criar um 'ping' por sonda.
+
+Um único socket atende todos os alvos: cada eco enviado é identificado pelo
+par (IP, sequência) e a resposta resolve o future correspondente no loop do
+asyncio. Usa o socket ICMP sem privilégio do Linux (SOCK_DGRAM, liberado por
+net.ipv4.ping_group_range) e, se não houver, o socket bruto (root). Quando
+nenhum dos dois está disponível, abrir() devolve None e quem chama deve usar
+o ping do sistema.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import struct
+import time
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+BUFFER_RECEPCAO = 1 << 20   # Respostas de milhares de alvos não podem transbordar o socket
+
+def checksum(dados):
+    if len(dados) % 2:
+        dados += b'\x00'
+    soma = sum(struct.unpack(f'!{len(dados) // 2}H', dados))
+    soma = (soma >> 16) + (soma & 0xFFFF)
+    soma += soma >> 16
+    return ~soma & 0xFFFF
+
+class SondaICMP:
+    def __init__(self, sock, bruto, loop):
+        self.sock = sock
+        self.bruto = bruto                   # Socket bruto recebe o cabeçalho IP e todo ICMP da máquina
+        self.loop = loop
+        self.identificador = os.getpid() & 0xFFFF
+        self.sequencias = itertools.cycle(range(65536))
+        self.pendentes = {}                  # (ip, seq) -> (future, instante de envio)
+        loop.add_reader(sock.fileno(), self._ler)
+
+    @classmethod
+    def abrir(cls):
+        """Cria a sonda no loop em execução, ou None se não houver socket ICMP disponível."""
+        loop = asyncio.get_running_loop()
+        for tipo, bruto in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, tipo, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_RECEPCAO)
+            except OSError:
+                pass
+            try:
+                return cls(sock, bruto, loop)
+            except (NotImplementedError, OSError) as e:
+                # O loop do Windows (Proactor) não aceita add_reader
+                logging.debug(f"Socket ICMP indisponível no loop atual: {e}")
+                sock.close()
+                return None
+        return None
+
+    def fechar(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for futuro, _ in self.pendentes.values():
+            futuro.cancel()
+        self.pendentes.clear()
+
+    async def ping(self, ip, timeout, tamanho=56):
+        """Envia um eco e devolve o RTT em ms, ou None se não houver resposta no prazo."""
+        seq = next(self.sequencias)
+        chave = (ip, seq)
+        cabecalho = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.identificador, seq)
+        carga = bytes(tamanho)
+        pacote = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(cabecalho + carga),
+                             self.identificador, seq) + carga
+        futuro = self.loop.create_future()
+        self.pendentes[chave] = (futuro, time.perf_counter())
+        try:
+            self.sock.sendto(pacote, (ip, 0))
+            return await asyncio.wait_for(futuro, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.pendentes.pop(chave, None)
+
+    def _ler(self):
+        while True:
+            try:
+                dados, (ip, _) = self.sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logging.debug(f"Erro ao ler resposta ICMP: {e}")
+                return
+            if self.bruto:
+                dados = dados[(dados[0] & 0x0F) * 4:]
+            if len(dados) < 8:
+                continue
+            tipo, _, _, identificador, seq = struct.unpack('!BBHHH', dados[:8])
+            # No socket sem privilégio o kernel troca o identificador; só o bruto precisa filtrar
+            if tipo != ICMP_ECHO_REPLY or (self.bruto and identificador != self.identificador):
+                continue
+            pendente = self.pendentes.get((ip, seq))
+            if pendente and not pendente[0].done():
+                pendente[0].set_result((time.perf_counter() - pendente[1]) * 1000)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Testes do DespachanteNotificacoes com o EnviadorFalso.
+
+    python -m unittest test_notificacoes
+"""
+import unittest
+from datetime import datetime
+
+from notificacoes import DespachanteNotificacoes, EnviadorFalso
+
+CAIU = datetime(2026, 1, 5, 14, 2)
+VOLTOU = datetime(2026, 1, 5, 14, 5)
+
+class TesteDespachante(unittest.TestCase):
+    def setUp(self):
+        self.enviador = EnviadorFalso()
+        self.despachante = DespachanteNotificacoes(self.enviador, janela=0.2)
+
+    def mensagens(self):
+        self.despachante.parar()
+        return [mensagem for _, mensagem in self.enviador.mensagens]
+
+    def test_queda_e_volta_na_mesma_janela_sai_numa_mensagem(self):
+        self.despachante.alertar('10.0.0.1', 'Offline', CAIU, "OFFLINE 10.0.0.1")
+        self.despachante.alertar('10.0.0.1', 'Online', VOLTOU, "RECUPERADO 10.0.0.1")
+        mensagens = self.mensagens()
+        self.assertEqual(len(mensagens), 1)
+        self.assertIn('10.0.0.1', mensagens[0])
+        self.assertIn('OFFLINE e já voltou', mensagens[0])
+        self.assertIn('14:02', mensagens[0])
+        self.assertIn('14:05', mensagens[0])
+
+    def test_quedas_agrupadas_mostram_o_intervalo(self):
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.despachante.alertar(ip, 'Offline', CAIU, f"OFFLINE {ip}")
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.despachante.alertar(ip, 'Online', VOLTOU, f"RECUPERADO {ip}")
+        self.assertEqual(self.mensagens(), ["⚠️ 2 servidores CAÍRAM E VOLTARAM\n"
+                                            "10.0.0.1 (14:02–14:05), 10.0.0.2 (14:02–14:05)"])
+
+    def test_recuperacao_de_queda_ja_avisada_sai_sozinha(self):
+        self.despachante.alertar('10.0.0.1', 'Offline', CAIU, "OFFLINE 10.0.0.1")
+        while not self.enviador.mensagens:
+            self.despachante.thread.join(0.05)
+        self.despachante.alertar('10.0.0.1', 'Online', VOLTOU, "RECUPERADO 10.0.0.1")
+        self.assertEqual(self.mensagens(), ["OFFLINE 10.0.0.1", "RECUPERADO 10.0.0.1"])
+
+    def test_recuperacao_sem_queda_avisada_e_descartada(self):
+        self.despachante.alertar('10.0.0.1', 'Online', VOLTOU, "RECUPERADO 10.0.0.1")
+        self.assertEqual(self.mensagens(), [])
+
+if __name__ == "__main__":
+    unittest.main()